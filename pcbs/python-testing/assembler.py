@@ -0,0 +1,316 @@
+"""Assembler for SlothPU16 programs.
+
+Each line holds an optional label, then an instruction or directive,
+then an optional comment (starting with ';' or '#'):
+
+    loop:   sub r1, r2, r1      ; r1 = r1 - r2
+            branchzero r4, r1   ; to r4 if r1 is zero
+            set done, r4        ; r4 = done (which must be below 0x100)
+    table:  .word 0x1234, loop
+
+Registers are given in the order A, B, C, as for encode(). The
+operands each instruction takes are in FORMS:
+
+    add/sub/compare/nand/xor/barrel rA, rB, rC
+    loadb/loadw rA, rC        storeb/storew rA, rB
+    loadpc rC                 branchzero rA, rB
+    halt [rC]                 set value, rC
+
+The directives are .org address, .word values, .byte values and
+.space n. Values can be numbers (in any of Python's notations) or
+labels, which may be used before they are defined.
+
+Encoding is done from tables: each instruction becomes a row of
+(opcode, A, B, C), and the rows for a whole program are turned into
+words with one set of array operations (see encode_array()).
+"""
+
+import argparse
+import re
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from constants import INSTRUCTIONS, N_BITS
+
+N_REGISTERS = 16
+MEMORY_SIZE = 2 ** N_BITS
+
+# Bit position of each field of an instruction word
+OPCODE_SHIFT = 0
+R_A_SHIFT = 4
+R_B_SHIFT = 8
+R_C_SHIFT = 12
+
+# The operands taken by each instruction, as the instruction fields
+# they fill. 'imm' is the 8 bit constant of set, which sits where
+# the A and B registers usually are
+_ALU = ("A", "B", "C")
+FORMS = dict(
+    add=_ALU,
+    sub=_ALU,
+    compare=_ALU,
+    nand=_ALU,
+    xor=_ALU,
+    barrel=_ALU,
+    loadb=("A", "C"),
+    loadw=("A", "C"),
+    storeb=("A", "B"),
+    storew=("A", "B"),
+    loadpc=("C",),
+    branchzero=("A", "B"),
+    halt=("C",),
+    set=("imm", "C"),
+)
+# Operands which may be left off
+OPTIONAL = dict(halt=1)
+
+_LINE = re.compile(r"^\s*(?:(?P<label>[A-Za-z_]\w*)\s*:)?\s*(?P<body>.*?)\s*$")
+_REGISTER = re.compile(r"^[rR](\d+)$")
+_LABEL = re.compile(r"^[A-Za-z_]\w*$")
+
+
+class AssemblerError(Exception):
+    pass
+
+
+class Program(NamedTuple):
+    image: bytes
+    labels: Dict[str, int]
+
+
+def encode(opcode: str, r_A: int, r_B: int, r_C: int) -> int:
+    """Instruction word for the given opcode and registers."""
+    for r in (r_A, r_B, r_C):
+        assert r >= 0 and r < N_REGISTERS
+    return (
+        (INSTRUCTIONS[opcode] << OPCODE_SHIFT)
+        | (r_A << R_A_SHIFT)
+        | (r_B << R_B_SHIFT)
+        | (r_C << R_C_SHIFT)
+    )
+
+
+def encode_array(
+    opcodes: Union[Sequence[str], np.ndarray],
+    r_A: Union[Sequence[int], np.ndarray],
+    r_B: Union[Sequence[int], np.ndarray],
+    r_C: Union[Sequence[int], np.ndarray],
+) -> np.ndarray:
+    """Instruction words for whole arrays of fields at once.
+
+    The opcodes can be given by name or number. The arguments are
+    broadcast against each other, so (for example) one opcode can be
+    combined with every register."""
+    opcodes = np.asarray(opcodes)
+    if opcodes.dtype.kind in "US":
+        opcodes = np.array([INSTRUCTIONS[str(op)] for op in opcodes.ravel()]).reshape(
+            opcodes.shape
+        )
+    fields = [np.asarray(r, dtype=np.uint16) for r in (r_A, r_B, r_C)]
+    for f in fields:
+        if np.any(f >= N_REGISTERS):
+            raise AssemblerError("Register out of range")
+    return (
+        (opcodes.astype(np.uint16) << OPCODE_SHIFT)
+        | (fields[0] << R_A_SHIFT)
+        | (fields[1] << R_B_SHIFT)
+        | (fields[2] << R_C_SHIFT)
+    ).astype(np.uint16)
+
+
+def to_image(words: Union[Sequence[int], np.ndarray]) -> bytes:
+    """Lay out instruction words in (little endian) memory order."""
+    return np.asarray(words, dtype="<u2").tobytes()
+
+
+def _register(text: str, line_no: int) -> int:
+    match = _REGISTER.match(text)
+    if match is None or int(match.group(1)) >= N_REGISTERS:
+        raise AssemblerError(f"Line {line_no}: bad register {text!r}")
+    return int(match.group(1))
+
+
+def _operands(text: str) -> List[str]:
+    return [t.strip() for t in text.split(",")] if text else []
+
+
+class _Assembler:
+    def __init__(self):
+        self.memory = bytearray(MEMORY_SIZE)
+        self.end = 0
+        self.location = 0
+        self.labels: Dict[str, int] = dict()
+        # (address, mnemonic fields) rows, encoded together at the end
+        self.rows: List[Tuple[int, int, int, int, int]] = []
+        # (address, label, kind, line) to fill in at the end, where
+        # kind is 'byte', 'word' or 'imm' (the constant of a set)
+        self.fixups: List[Tuple[int, str, str, int]] = []
+
+    def value(self, text: str, line_no: int, kind: Optional[str]) -> int:
+        """A number, or a label (filled in later if need be).
+
+        With no kind, there is nothing to fill in later, so the label
+        must already be defined."""
+        if _LABEL.match(text):
+            if text in self.labels:
+                return self.labels[text]
+            if kind is None:
+                raise AssemblerError(f"Line {line_no}: {text} is not defined yet")
+            self.fixups.append((self.location, text, kind, line_no))
+            return 0
+        try:
+            return int(text, 0)
+        except ValueError:
+            raise AssemblerError(f"Line {line_no}: bad value {text!r}") from None
+
+    def emit(self, data: bytes, line_no: int):
+        if self.location + len(data) > MEMORY_SIZE:
+            raise AssemblerError(f"Line {line_no}: beyond the end of memory")
+        self.memory[self.location : self.location + len(data)] = data
+        self.location += len(data)
+        self.end = max(self.end, self.location)
+
+    def directive(self, name: str, operands: List[str], line_no: int):
+        if name == ".org":
+            if len(operands) != 1:
+                raise AssemblerError(f"Line {line_no}: .org takes one address")
+            location = self.value(operands[0], line_no, None)
+            if not 0 <= location < MEMORY_SIZE:
+                raise AssemblerError(f"Line {line_no}: bad address {operands[0]}")
+            self.location = location
+        elif name == ".space":
+            if len(operands) != 1:
+                raise AssemblerError(f"Line {line_no}: .space takes one size")
+            size = self.value(operands[0], line_no, None)
+            if size < 0:
+                raise AssemblerError(f"Line {line_no}: bad size {operands[0]}")
+            if self.location + size > MEMORY_SIZE:
+                raise AssemblerError(f"Line {line_no}: beyond the end of memory")
+            self.emit(bytes(size), line_no)
+        elif name == ".word":
+            for op in operands:
+                v = self.value(op, line_no, "word")
+                if v < -(2 ** 15) or v >= 2 ** 16:
+                    raise AssemblerError(f"Line {line_no}: {op} does not fit a word")
+                self.emit((v & 0xFFFF).to_bytes(2, "little"), line_no)
+        elif name == ".byte":
+            for op in operands:
+                v = self.value(op, line_no, "byte")
+                if v < -128 or v >= 256:
+                    raise AssemblerError(f"Line {line_no}: {op} does not fit a byte")
+                self.emit(bytes([v & 0xFF]), line_no)
+        else:
+            raise AssemblerError(f"Line {line_no}: unknown directive {name}")
+
+    def instruction(self, mnemonic: str, operands: List[str], line_no: int):
+        if mnemonic not in FORMS:
+            raise AssemblerError(f"Line {line_no}: unknown instruction {mnemonic}")
+        form = FORMS[mnemonic]
+        n_required = len(form) - OPTIONAL.get(mnemonic, 0)
+        if not n_required <= len(operands) <= len(form):
+            raise AssemblerError(
+                f"Line {line_no}: {mnemonic} takes operands {', '.join(form)}"
+            )
+        if self.location & 1:
+            raise AssemblerError(f"Line {line_no}: instruction not word aligned")
+
+        fields = dict(A=0, B=0, C=0)
+        for name, text in zip(form, operands):
+            if name == "imm":
+                v = self.value(text, line_no, "imm")
+                if not 0 <= v < 256:
+                    raise AssemblerError(f"Line {line_no}: {text} does not fit 8 bits")
+                fields["A"] = v & 0xF
+                fields["B"] = v >> 4
+            else:
+                fields[name] = _register(text, line_no)
+        self.rows.append(
+            (
+                self.location,
+                INSTRUCTIONS[mnemonic],
+                fields["A"],
+                fields["B"],
+                fields["C"],
+            )
+        )
+        self.emit(bytes(2), line_no)
+
+    def line(self, text: str, line_no: int):
+        text = re.split(r"[;#]", text, maxsplit=1)[0]
+        match = _LINE.match(text)
+        label, body = match.group("label"), match.group("body")
+        if label:
+            if label in self.labels:
+                raise AssemblerError(f"Line {line_no}: {label} defined twice")
+            self.labels[label] = self.location
+        if not body:
+            return
+        parts = body.split(None, 1)
+        name = parts[0].lower()
+        operands = _operands(parts[1] if len(parts) > 1 else "")
+        if name.startswith("."):
+            self.directive(name, operands, line_no)
+        else:
+            self.instruction(name, operands, line_no)
+
+    def finish(self) -> Program:
+        # All the instructions, encoded in one go
+        if self.rows:
+            rows = np.array(self.rows, dtype=np.int64)
+            words = encode_array(rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4])
+            view = np.frombuffer(self.memory, dtype="<u2")
+            view[rows[:, 0] // 2] = words
+
+        for address, label, kind, line_no in self.fixups:
+            if label not in self.labels:
+                raise AssemblerError(f"Line {line_no}: undefined label {label}")
+            v = self.labels[label]
+            if kind == "word":
+                self.memory[address : address + 2] = v.to_bytes(2, "little")
+            elif kind == "byte":
+                if v >= 256:
+                    raise AssemblerError(f"Line {line_no}: {label} does not fit a byte")
+                self.memory[address] = v
+            else:
+                if v >= 256:
+                    raise AssemblerError(f"Line {line_no}: {label} does not fit 8 bits")
+                word = int.from_bytes(self.memory[address : address + 2], "little")
+                word |= v << R_A_SHIFT
+                self.memory[address : address + 2] = word.to_bytes(2, "little")
+        return Program(bytes(self.memory[: self.end]), dict(self.labels))
+
+
+def assemble_program(source: str) -> Program:
+    """Assemble source text, giving the image and the label addresses.
+
+    The image starts at address 0, and runs to the highest address
+    written."""
+    asm = _Assembler()
+    for line_no, text in enumerate(source.splitlines(), start=1):
+        asm.line(text, line_no)
+    return asm.finish()
+
+
+def assemble(source: str) -> bytes:
+    """Assemble source text into a memory image (from address 0)."""
+    return assemble_program(source).image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="assembly source file")
+    parser.add_argument("-o", "--output", required=True, help="binary image")
+    args = parser.parse_args()
+
+    with open(args.source) as f:
+        program = assemble_program(f.read())
+    with open(args.output, "wb") as f:
+        f.write(program.image)
+    for label, address in sorted(program.labels.items(), key=lambda kv: kv[1]):
+        print(f"{address:#06x} {label}")
+
+
+if __name__ == "__main__":
+    main()
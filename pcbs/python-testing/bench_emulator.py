@@ -0,0 +1,122 @@
+"""Measure the speed of the emulator.
+
+Each workload is run in the fast (instruction level) mode, and for
+a shorter time stepping through every stage of the compute cycle.
+Run with
+    python bench_emulator.py
+"""
+
+import time
+
+from typing import Callable, Tuple
+
+from assembler import assemble
+from emulator import SlothPU16
+
+N_STAGE_INSTRUCTIONS = 20000
+
+
+COUNTDOWN = """
+; Count r1 down from 0xFFFF to zero
+        set 1, r2
+        set loop, r3
+        set done, r4
+        sub r0, r2, r1      ; r1 = 0 - 1
+loop:   sub r1, r2, r1
+        branchzero r4, r1   ; done if r1 == 0
+        branchzero r3, r0   ; else loop
+done:   halt r15
+"""
+
+CHECKSUM = """
+; Sum and xor all the words of memory, a word at a time
+        set 2, r2
+        set loop, r3
+        set done, r4
+        set 0, r1           ; address
+loop:   loadw r1, r5
+        add r6, r5, r6      ; r6 += r5
+        xor r7, r5, r7      ; r7 ^= r5
+        barrel r7, r2, r7   ; r7 <<<= 2
+        add r1, r2, r1
+        branchzero r4, r1   ; done once wrapped
+        branchzero r3, r0   ; else loop
+        halt r15
+done:   halt r15
+"""
+
+MEMCOPY = """
+; Copy the bottom half of memory to the top half, a byte at a time
+        set 1, r2
+        set loop, r3
+        set done, r4
+        set 0x80, r5
+        barrel r5, r8, r5   ; r5 = 0x8000 (r8 = 8)
+        set 0, r1           ; source
+loop:   loadb r1, r6
+        add r1, r5, r7      ; r7 = r1 + 0x8000
+        storeb r7, r6
+        add r1, r2, r1
+        xor r1, r5, r9
+        branchzero r4, r9   ; done at 0x8000
+        branchzero r3, r0   ; else loop
+done:   halt r15
+"""
+
+
+def countdown() -> bytes:
+    return assemble(COUNTDOWN)
+
+
+def checksum() -> bytes:
+    return assemble(CHECKSUM)
+
+
+def memcopy() -> bytes:
+    return assemble(MEMCOPY)
+
+
+def _fresh(image: bytes) -> SlothPU16:
+    emu = SlothPU16(image)
+    # Used by memcopy as a shift count
+    emu.registers[8] = 8
+    return emu
+
+
+def measure(name: str, workload: Callable[[], bytes]) -> Tuple[float, float]:
+    image = workload()
+
+    emu = _fresh(image)
+    start = time.perf_counter()
+    n = emu.run()
+    elapsed = time.perf_counter() - start
+    assert emu.halted
+    fast = n / elapsed
+
+    emu = _fresh(image)
+    start = time.perf_counter()
+    for _ in range(N_STAGE_INSTRUCTIONS):
+        emu.step()
+        if emu.halted:
+            break
+    stepped = emu.n_instructions / (time.perf_counter() - start)
+
+    print(
+        f"{name:12s} {n:10d} instructions"
+        f" {fast / 1e6:8.2f} MIPS fast"
+        f" {stepped / 1e6:8.3f} MIPS stepped"
+    )
+    return fast, stepped
+
+
+def main():
+    for name, workload in [
+        ("countdown", countdown),
+        ("checksum", checksum),
+        ("memcopy", memcopy),
+    ]:
+        measure(name, workload)
+
+
+if __name__ == "__main__":
+    main()
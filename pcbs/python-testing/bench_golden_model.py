@@ -0,0 +1,57 @@
+"""Measure the time taken to generate expected ALU results.
+
+The scalar per-vector functions which test_alu_carrier.py used to
+have are timed on a sample, and extrapolated. Run with
+    python bench_golden_model.py
+"""
+
+import time
+
+import bitarray.util
+import numpy as np
+
+import golden_model
+from constants import N_BITS
+
+N_SAMPLES = 1000000
+N_SCALAR = 20000
+
+
+def _scalar_barrel(A_val: int, B_val: int) -> int:
+    A = bitarray.util.int2ba(A_val, length=N_BITS, endian="little")
+    expected = bitarray.util.zeros(N_BITS, endian="little")
+
+    for i in range(N_BITS):
+        expected[(i + B_val) % N_BITS] = A[i]
+    return bitarray.util.ba2int(expected)
+
+
+def main():
+    n_pairs = 2 ** (2 * N_BITS)
+    rng = np.random.default_rng()
+
+    A, B, _ = golden_model.sample("barrel", N_SCALAR, rng=rng)
+    start = time.perf_counter()
+    for a, b in zip(A.tolist(), B.tolist()):
+        _scalar_barrel(a, b)
+    per_vector = (time.perf_counter() - start) / N_SCALAR
+    print(f"scalar barrel: {n_pairs * per_vector / 3600:.1f} hours for all pairs")
+
+    for op in golden_model.OPERATIONS:
+        start = time.perf_counter()
+        golden_model.sample(op, N_SAMPLES, rng=rng)
+        sampled = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in golden_model.exhaustive(op):
+            pass
+        exhaustive = time.perf_counter() - start
+
+        print(
+            f"{op:8s} {sampled:6.2f} s for {N_SAMPLES} samples"
+            f" {exhaustive:6.1f} s for all pairs"
+        )
+
+
+if __name__ == "__main__":
+    main()
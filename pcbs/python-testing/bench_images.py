@@ -0,0 +1,88 @@
+"""Measure the cost of the pin image hot paths.
+
+For each transaction, reports the time taken and the memory
+allocated (as seen by tracemalloc) while it runs. Run on the rig
+with
+    python bench_images.py
+"""
+
+import time
+import tracemalloc
+
+from typing import Callable
+
+from pi_backplane import _Input, _Output
+from tester_board import TesterBoard
+
+N_ITER = 1000
+
+
+def measure(name: str, transaction: Callable[[], None]):
+    # Warm up, so that caches are populated
+    transaction()
+
+    start = time.perf_counter()
+    for _ in range(N_ITER):
+        transaction()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for _ in range(N_ITER):
+        transaction()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:30s} {1e6 * elapsed / N_ITER:10.1f} us/txn"
+        f" {peak - base:8d} B peak"
+        f" {(current - base) / N_ITER:8.1f} B/txn retained"
+    )
+
+
+def main():
+    output = _Output()
+    input = _Input()
+
+    def backplane_write():
+        output.set_bus("A", 0x1234)
+        output.set_bus("B", 0x5678)
+        output.set_bus("C", 0x9ABC)
+        output.set_bus("Instruction", 0xDEF0)
+        output.set_cycle(2)
+        output.set_clock(True)
+        output.set_reset(False)
+
+    def backplane_read():
+        input.read_bus("A")
+        input.read_bus("B")
+        input.read_bus("C")
+        input.read_bus("Instruction")
+        input.read_cycle()
+        input.read_clock()
+        input.read_reset()
+
+    def backplane_send():
+        # Flip a bit so that the send is not skipped
+        output.set_clock(not output._outputs[output._clock])
+        output.send()
+
+    measure("backplane image write", backplane_write)
+    measure("backplane image read", backplane_read)
+    measure("backplane send", backplane_send)
+    measure("backplane recv", input.recv)
+
+    tb = TesterBoard()
+    frame = tb.recv().copy()
+
+    def tester_send():
+        frame[0] = not frame[0]
+        tb.send(frame)
+
+    measure("tester board send", tester_send)
+    measure("tester board recv", tb.recv)
+
+
+if __name__ == "__main__":
+    main()
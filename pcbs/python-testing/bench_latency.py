@@ -0,0 +1,39 @@
+"""Measure the cost of timing a call with the latency plugin.
+
+Times a call which does nothing, bare and wrapped by
+Profiler.timed(), and a GPIO.output() call with the line counting
+in place (using the simulated backend's functions). The differences
+are what the plugin adds to each transfer. Run with
+    python bench_latency.py
+"""
+
+import timeit
+
+import latency
+import sim_gpio
+
+N_CALLS = 200000
+
+
+def nothing():
+    pass
+
+
+def main():
+    profiler = latency.Profiler()
+    timed = profiler.timed("nothing", nothing)
+    bare = timeit.timeit(nothing, number=N_CALLS)
+    wrapped = timeit.timeit(timed, number=N_CALLS)
+    print(f"timing a call  {1e6 * (wrapped - bare) / N_CALLS:7.3f} us")
+
+    sim_gpio.setmode(sim_gpio.BOARD)
+    sim_gpio.setup(23, sim_gpio.OUT)
+    bare = timeit.timeit(lambda: sim_gpio.output(23, 1), number=N_CALLS)
+    profiler.count_gpio(sim_gpio)
+    counted = timeit.timeit(lambda: sim_gpio.output(23, 1), number=N_CALLS)
+    profiler.uninstall()
+    print(f"counting lines {1e6 * (counted - bare) / N_CALLS:7.3f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare the cost of reading and writing connector board fields.
+
+The legacy board rebuilds its pin map dictionary on every access
+and moves one bit at a time; the current boards use the tables
+compiled by ConnectorBoard. Neither touches the hardware, so only
+the pin image manipulation is timed. Run with
+    python bench_pin_maps.py
+"""
+
+import timeit
+
+from typing import Dict, List, Union
+
+import bitarray
+import bitarray.util
+
+from test_add_subtract import AddSubtractALUBoard, N_BITS
+
+N_CALLS = 20000
+
+
+class _LegacyAddSubtract:
+    def __init__(self):
+        self._outputs = [0 for _ in range(40)]
+        self._inputs = [False for _ in range(40)]
+
+    @property
+    def Output_Pins(self) -> Dict[str, Union[int, List[int]]]:
+        op = dict(
+            A=[0 + i for i in range(N_BITS)],
+            B=[16 + i for i in range(N_BITS)],
+            CarryIn=32,
+            ADD=34,
+            SUB=35,
+        )
+        return op
+
+    @property
+    def Input_Pins(self) -> Dict[str, Union[int, List[int]]]:
+        ip = dict(C=[32 + i for i in range(N_BITS)], CarryOut=15)
+        return ip
+
+    def write_A(self, value: int):
+        assert value >= 0 and value < 2 ** N_BITS
+
+        converted = bitarray.util.int2ba(value, length=N_BITS, endian="little")
+        for i, curr_bit in enumerate(converted):
+            self._outputs[self.Output_Pins["A"][i]] = converted[i]
+
+    def write_CarryIn(self, value: bool):
+        self._outputs[self.Output_Pins["CarryIn"]] = value
+
+    def read_C(self) -> int:
+        result = bitarray.bitarray(N_BITS, endian="little")
+        for i, pin in enumerate(self.Input_Pins["C"]):
+            result[i] = self._inputs[pin]
+
+        return bitarray.util.ba2int(result)
+
+
+class _CompiledAddSubtract(AddSubtractALUBoard):
+    def __init__(self):
+        # Just the pin images, without a TesterBoard
+        self._outputs = bitarray.util.zeros(40, endian="little")
+        self._inputs = bitarray.util.zeros(40, endian="little")
+
+    def send(self):
+        pass
+
+    def recv(self):
+        pass
+
+
+def main():
+    legacy = _LegacyAddSubtract()
+    compiled = _CompiledAddSubtract()
+
+    print(f"{'operation':14s} {'legacy':>12s} {'compiled':>12s} {'speedup':>8s}")
+    for name, call in [
+        ("write_A", lambda b: b.write_A(0xA5)),
+        ("write_CarryIn", lambda b: b.write_CarryIn(True)),
+        ("read_C", lambda b: b.read_C()),
+    ]:
+        times = []
+        for board in [legacy, compiled]:
+            elapsed = timeit.timeit(lambda: call(board), number=N_CALLS)
+            times.append(1e6 * elapsed / N_CALLS)
+        print(
+            f"{name:14s} {times[0]:9.2f} us {times[1]:9.2f} us"
+            f" {times[0] / times[1]:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
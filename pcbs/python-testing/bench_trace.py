@@ -0,0 +1,36 @@
+"""Measure the cost of recording a frame to a trace.
+
+Times Recorder.record() for the tester board and backplane frames
+(written to a temporary file), which is what recording adds to each
+transfer. Run with
+    python bench_trace.py
+"""
+
+import os
+import tempfile
+import timeit
+
+import bitarray.util
+
+import gpio_trace
+
+N_CALLS = 100000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = gpio_trace.Recorder(os.path.join(directory, "bench.trace"))
+        for source, name in gpio_trace.SOURCE_NAMES.items():
+            n_pins = gpio_trace.N_PINS[source]
+            frame = bitarray.util.urandom(n_pins, endian=gpio_trace.ENDIAN[source])
+            for kind, kind_name in gpio_trace.KIND_NAMES.items():
+                elapsed = timeit.timeit(
+                    lambda: recorder.record(source, kind, frame, n_pins),
+                    number=N_CALLS,
+                )
+                print(f"{name:9s} {kind_name:4s} {1e6 * elapsed / N_CALLS:7.3f} us")
+        recorder.close()
+
+
+if __name__ == "__main__":
+    main()
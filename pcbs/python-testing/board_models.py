@@ -0,0 +1,291 @@
+"""Behavioural models of the boards, for use with sim_gpio.
+
+Connector board models sit on a sim_gpio.TesterRig, and are built
+from the same pin maps as the ConnectorBoard classes. Cards sit on a
+sim_gpio.BackplaneRig, and work in terms of bus values.
+"""
+
+from typing import Dict, List, Mapping, Sequence, Union
+
+from constants import INSTRUCTIONS, N_BITS
+from emulator import (
+    COMMIT,
+    EXECUTE,
+    IFETCH,
+    ISTORE,
+    NO_REGISTER_WRITE,
+    PCUPDATE,
+    WORD_MASK,
+    alu,
+)
+
+PinMap = Mapping[str, Union[int, Sequence[int]]]
+
+N_TESTER_PINS = 40
+
+
+def _pin_list(pins: Union[int, Sequence[int]]) -> List[int]:
+    if isinstance(pins, int):
+        return [pins]
+    return list(pins)
+
+
+class ConnectorModel:
+    def __init__(self, output_pins: PinMap, input_pins: PinMap):
+        """Common machinery for a model of a connector board.
+
+        The pin maps are those of the ConnectorBoard (so the board's
+        inputs are our outputs). Subclasses implement respond(),
+        which sets the inputs from the current (and previous)
+        outputs using get() and put()."""
+        self._output_fields = {k: _pin_list(v) for k, v in output_pins.items()}
+        self._input_fields = {k: _pin_list(v) for k, v in input_pins.items()}
+        self._pins = [0 for _ in range(N_TESTER_PINS)]
+        self._previous = list(self._pins)
+        self._response = [0 for _ in range(N_TESTER_PINS)]
+
+    @classmethod
+    def for_board(cls, board) -> "ConnectorModel":
+        """Model the given ConnectorBoard class (or BoardSpec)."""
+        if hasattr(board, "Output_Pins"):
+            return cls(board.Output_Pins, board.Input_Pins)
+        return cls(board.outputs, board.inputs)
+
+    def apply(self, pins: Sequence[int]):
+        self._previous = self._pins
+        self._pins = list(pins)
+        self._response = [0 for _ in range(N_TESTER_PINS)]
+        self.respond()
+
+    def inputs(self) -> List[int]:
+        return self._response
+
+    def get(self, name: str) -> int:
+        value = 0
+        for i, pin in enumerate(self._output_fields[name]):
+            value |= self._pins[pin] << i
+        return value
+
+    def rose(self, name: str) -> bool:
+        pin = self._output_fields[name][0]
+        return self._pins[pin] and not self._previous[pin]
+
+    def width(self, name: str) -> int:
+        return len(self._output_fields[name])
+
+    def put(self, name: str, value: int):
+        for i, pin in enumerate(self._input_fields[name]):
+            self._response[pin] = (value >> i) & 1
+
+    def respond(self):
+        raise NotImplementedError
+
+
+class AddSubtractModel(ConnectorModel):
+    def respond(self):
+        # ADD and SUB are active low, and do nothing together
+        add = not self.get("ADD")
+        sub = not self.get("SUB")
+        if add == sub:
+            return
+
+        n_bits = self.width("A")
+        mask = (1 << n_bits) - 1
+        B = self.get("B") if add else ~self.get("B") & mask
+        total = self.get("A") + B + self.get("CarryIn")
+        self.put("C", total & mask)
+        self.put("CarryOut", total >> n_bits)
+
+
+class NandXorModel(ConnectorModel):
+    def respond(self):
+        # Active low, with an interlock if both are selected
+        nand = not self.get("NAND")
+        xor = not self.get("XOR")
+        if nand == xor:
+            return
+
+        mask = (1 << self.width("A")) - 1
+        A = self.get("A")
+        B = self.get("B")
+        self.put("C", ~(A & B) & mask if nand else A ^ B)
+
+
+class ComparatorModel(ConnectorModel):
+    def respond(self):
+        if not self.get("COMPARE"):
+            self.put("C", alu(INSTRUCTIONS["compare"], self.get("A"), self.get("B")))
+
+
+class BarrelShifterModel(ConnectorModel):
+    def respond(self):
+        if not self.get("OE"):
+            self.put("C", alu(INSTRUCTIONS["barrel"], self.get("A"), self.get("B")))
+
+
+class IncrementerModel(ConnectorModel):
+    def respond(self):
+        if not self.get("OE"):
+            # Increment is one-hot, so its value is the amount
+            self.put("IncOut", (self.get("IncIn") + self.get("Increment")) & WORD_MASK)
+
+
+class RegisterFileModel(ConnectorModel):
+    # Each board holds half of the sixteen registers
+    N_REGISTERS = 8
+
+    def __init__(self, output_pins: PinMap, input_pins: PinMap):
+        super().__init__(output_pins, input_pins)
+        self.registers = [0 for _ in range(self.N_REGISTERS)]
+
+    def respond(self):
+        # Active is active low
+        if self.get("Active"):
+            return
+
+        r_C = self.get("R_C")
+        if self.rose("Clock") and r_C < self.N_REGISTERS:
+            self.registers[r_C] = self.get("C")
+
+        for bus, selector in [("A", "R_A"), ("B", "R_B")]:
+            r = self.get(selector)
+            if r < self.N_REGISTERS:
+                self.put(bus, self.registers[r])
+
+
+class RegisterWithResetModel(ConnectorModel):
+    def __init__(self, output_pins: PinMap, input_pins: PinMap):
+        super().__init__(output_pins, input_pins)
+        self.value = 0
+
+    def respond(self):
+        # Reset is active low, and also inhibits the clock
+        if not self.get("Reset"):
+            self.value = 0
+        elif self.rose("Clock"):
+            self.value = self.get("RegIn")
+
+        # As is OE
+        if not self.get("OE"):
+            self.put("RegOut", self.value)
+
+
+# Models for the boards, by the names given in their BoardSpecs
+CONNECTOR_MODELS = dict(
+    AddSubtractALUBoard=AddSubtractModel,
+    NandXorALUBoard=NandXorModel,
+    ComparatorALUBoard=ComparatorModel,
+    BarrelShifterConnectorBoard=BarrelShifterModel,
+    IncrementerConnectorBoard=IncrementerModel,
+    RegisterFileBoard=RegisterFileModel,
+    RWRBoard=RegisterWithResetModel,
+)
+
+
+Buses = Mapping[str, int]
+
+
+def stage(buses: Buses) -> int:
+    """The stage of the compute cycle, or -1 if none is active."""
+    return buses["Cycle"].bit_length() - 1
+
+
+def entered(before: Buses, after: Buses, step: int) -> bool:
+    """Whether the given stage started with this transition."""
+    bit = 1 << step
+    return not before["Cycle"] & bit and bool(after["Cycle"] & bit)
+
+
+def _fields(instruction: int):
+    return (
+        instruction & 0xF,
+        (instruction >> 4) & 0xF,
+        (instruction >> 8) & 0xF,
+        instruction >> 12,
+    )
+
+
+class Card:
+    """A board plugged into the backplane.
+
+    transition() is called whenever the Pi changes what it drives,
+    with the settled buses from before and the Pi's new values.
+    Anything clocked should latch from the values before. drive()
+    gives the values the card puts on the buses, given their
+    current values; it may be called several times while the buses
+    settle, so must not change any state."""
+
+    def transition(self, before: Buses, after: Buses):
+        pass
+
+    def drive(self, buses: Buses) -> Dict[str, int]:
+        return dict()
+
+
+class ALUCarrierCard(Card):
+    def drive(self, buses: Buses) -> Dict[str, int]:
+        op = buses["Instruction"] & 0xF
+        if stage(buses) in (EXECUTE, COMMIT) and op < 8:
+            return dict(C=alu(op, buses["A"], buses["B"]))
+        return dict()
+
+
+class RegisterCarrierCard(Card):
+    def __init__(self):
+        self.registers = [0 for _ in range(16)]
+
+    def transition(self, before: Buses, after: Buses):
+        if entered(before, after, COMMIT):
+            op, _, _, r_C = _fields(before["Instruction"])
+            if op not in NO_REGISTER_WRITE:
+                self.registers[r_C] = before["C"]
+
+    def drive(self, buses: Buses) -> Dict[str, int]:
+        if stage(buses) in (EXECUTE, COMMIT, PCUPDATE):
+            _, r_A, r_B, _ = _fields(buses["Instruction"])
+            return dict(A=self.registers[r_A], B=self.registers[r_B])
+        return dict()
+
+
+class ProgramCounterCard(Card):
+    def __init__(self):
+        self.pc = 0
+
+    def transition(self, before: Buses, after: Buses):
+        # Built from registers with reset, which is active low
+        if not after["Reset"]:
+            self.pc = 0
+        elif entered(before, after, PCUPDATE):
+            op = before["Instruction"] & 0xF
+            if op == INSTRUCTIONS["halt"]:
+                pass
+            elif op == INSTRUCTIONS["branchzero"] and before["B"] == 0:
+                self.pc = before["A"]
+            else:
+                self.pc = (self.pc + 2) & WORD_MASK
+
+    def drive(self, buses: Buses) -> Dict[str, int]:
+        step = stage(buses)
+        if step in (IFETCH, ISTORE):
+            return dict(A=self.pc)
+        if step >= EXECUTE and buses["Instruction"] & 0xF == INSTRUCTIONS["loadpc"]:
+            return dict(C=self.pc)
+        return dict()
+
+
+class InstructionRegisterCard(Card):
+    def __init__(self):
+        self.ir = 0
+
+    def transition(self, before: Buses, after: Buses):
+        if not after["Reset"]:
+            self.ir = 0
+        elif entered(before, after, ISTORE):
+            # Memory places the instruction on B
+            self.ir = before["B"]
+
+    def drive(self, buses: Buses) -> Dict[str, int]:
+        result = dict(Instruction=self.ir)
+        if stage(buses) >= EXECUTE and self.ir & 0xF == INSTRUCTIONS["set"]:
+            result["C"] = (self.ir >> 4) & 0xFF
+        return result
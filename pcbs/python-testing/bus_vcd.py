@@ -0,0 +1,127 @@
+"""Write the backplane signals the Pi samples as a value change dump.
+
+When the SLOTHPU_VCD environment variable names a file, every
+receive from the Pi backplane (see pi_backplane._Input.recv) adds
+the A, B, C and Instruction buses, the cycle bus (as the raw one-hot
+bits), Clock and Reset to it, for viewing in GTKWave:
+
+    SLOTHPU_VCD=pc.vcd python -m pytest test_program_counter.py -k dobranch
+    gtkwave pc.vcd
+
+Only values which change are written, and they are buffered and
+written out in blocks, so the memory used stays the same however
+long the run. Times are in nanoseconds from the start of the dump.
+A receive which stops partway along the chain only updates the
+signals it clocked in. The backplane fixture (see conftest.py)
+marks the start of each test with a comment.
+"""
+
+import atexit
+import os
+import time
+
+from typing import Dict, List, Optional, Tuple
+
+VCD_ENV = "SLOTHPU_VCD"
+
+# Name and width of each signal, in the order they are declared
+SIGNALS: List[Tuple[str, int]] = [
+    ("A", 16),
+    ("B", 16),
+    ("C", 16),
+    ("Instruction", 16),
+    ("Cycle", 5),
+    ("Clock", 1),
+    ("Reset", 1),
+]
+
+# Lines held before they are written out
+BUFFER_LINES = 4096
+
+
+class VCDWriter:
+    def __init__(self, path: str, scope: str = "backplane"):
+        """Start a dump in the file at path, replacing anything there."""
+        self.path = path
+        self._file = open(path, "w")
+        # Identifier codes are printable characters, from '!'
+        self._codes = {name: chr(33 + i) for i, (name, _) in enumerate(SIGNALS)}
+        self._widths = dict(SIGNALS)
+        self._values: Dict[str, Optional[int]] = {name: None for name, _ in SIGNALS}
+        self._lines: List[str] = []
+        self._start = time.perf_counter_ns()
+        self._time = None
+        self.n_samples = 0
+
+        header = [
+            f"$date {time.strftime('%Y-%m-%d %H:%M:%S')} $end",
+            "$version slothpu16 python-testing $end",
+            "$timescale 1ns $end",
+            f"$scope module {scope} $end",
+        ]
+        for name, width in SIGNALS:
+            header.append(f"$var wire {width} {self._codes[name]} {name} $end")
+        header += ["$upscope $end", "$enddefinitions $end", "$dumpvars"]
+        for name, _ in SIGNALS:
+            header.append(self._change(name, None))
+        header.append("$end")
+        self._file.write("\n".join(header) + "\n")
+        atexit.register(self.close)
+
+    @classmethod
+    def from_environment(cls) -> Optional["VCDWriter"]:
+        """A writer for the file named by SLOTHPU_VCD, if any."""
+        path = os.environ.get(VCD_ENV)
+        return cls(path) if path else None
+
+    def _change(self, name: str, value: Optional[int]) -> str:
+        code = self._codes[name]
+        width = self._widths[name]
+        if width == 1:
+            return f"{'x' if value is None else value}{code}"
+        if value is None:
+            return f"b{'x' * width} {code}"
+        return f"b{value:b} {code}"
+
+    def _stamp(self):
+        now = time.perf_counter_ns() - self._start
+        # Times must increase
+        if self._time is None or now > self._time:
+            self._time = now
+            self._lines.append(f"#{now}")
+
+    def sample(self, values: Dict[str, int]):
+        """Record the values of some of the signals, sampled now."""
+        self.n_samples += 1
+        changed = [
+            name for name, value in values.items() if self._values[name] != value
+        ]
+        if not changed:
+            return
+        self._stamp()
+        for name in changed:
+            value = int(values[name])
+            self._values[name] = value
+            self._lines.append(self._change(name, value))
+        if len(self._lines) >= BUFFER_LINES:
+            self.flush()
+
+    def comment(self, text: str):
+        """Add a comment (such as the name of a test) at the current time."""
+        self._stamp()
+        self._lines.append(f"$comment {text} $end")
+
+    def flush(self):
+        if self._lines:
+            self._file.write("\n".join(self._lines) + "\n")
+            self._lines.clear()
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+# The writer the backplane uses, if dumping
+WRITER = VCDWriter.from_environment()
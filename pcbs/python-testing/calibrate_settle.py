@@ -0,0 +1,237 @@
+"""Measure how long the board signals take to settle on the rig.
+
+The polled signals are exercised with their minimum holds removed,
+and the slowest settle time seen (with a margin) is written out.
+Holds which cannot be polled, such as the charging and recovery of
+the RC networks in the reset logic, are found by halving them for
+as long as the board still behaves (with the same margin on top).
+Run with the board in question plugged in, e.g.
+    python calibrate_settle.py rwr settle.json
+and then point SLOTHPU_SETTLE_CALIBRATION at settle.json. Signals
+not calibrated keep their existing minimums.
+"""
+
+import argparse
+import random
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import settle
+
+N_TRIALS = 50
+# Holds are not shortened beyond this (in seconds)
+MIN_HOLD = 1e-4
+
+
+def calibrate_rwr(n_trials: int):
+    from rwr_connector_board import RWRConnectorBoard
+
+    board = RWRConnectorBoard()
+    for _ in range(n_trials):
+        # Reset is only visible if the register is not already zero
+        board.write_RegIn(random.randrange(1, 2 ** 16))
+        board.write_Clock(True)
+        board.write_Clock(False)
+        board.read_RegOut()
+        board.Reset()
+
+
+def trial_rwr() -> Callable[[], bool]:
+    from rwr_connector_board import RWRConnectorBoard
+
+    board = RWRConnectorBoard()
+
+    def trial() -> bool:
+        # Once recovered, the register can be written again
+        value = random.randrange(1, 2 ** 16)
+        board.Reset()
+        board.write_RegIn(value)
+        board.write_Clock(True)
+        board.write_Clock(False)
+        return board.read_RegOut() == value
+
+    return trial
+
+
+def _backplane():
+    from pi_backplane import _Input, _Output
+
+    return _Output(), _Input()
+
+
+def _reset_timed_out(board: str, reset: Callable[[], None]) -> bool:
+    key = f"{board}.Reset"
+    n_timeouts = settle.ENGINE.n_timeouts[key]
+    reset()
+    return settle.ENGINE.n_timeouts[key] != n_timeouts
+
+
+def load_instruction(output, value: int):
+    # Memory places the instruction on B during ISTORE
+    output.set_bus("B", value)
+    output.set_cycle(0)
+    output.send()
+    output.set_cycle(1)
+    output.send()
+
+
+def calibrate_instruction_register(n_trials: int):
+    from test_instruction_register import prepare_instruction_register
+
+    output, input = _backplane()
+    for _ in range(n_trials):
+        # Load a non-zero instruction, so that the reset can be seen
+        prepare_instruction_register(input, output)
+        load_instruction(output, random.randrange(1, 2 ** 16))
+
+
+def trial_instruction_register() -> Callable[[], bool]:
+    from test_instruction_register import prepare_instruction_register
+
+    output, input = _backplane()
+
+    def trial() -> bool:
+        # Too short a charge, and the reset is never seen
+        prepare_instruction_register(input, output)
+        load_instruction(output, random.randrange(1, 2 ** 16))
+        if _reset_timed_out(
+            "InstructionRegister",
+            lambda: prepare_instruction_register(input, output),
+        ):
+            return False
+        # Once recovered, an instruction can be loaded again
+        value = random.randrange(1, 2 ** 16)
+        load_instruction(output, value)
+        return input.read("Instruction")["Instruction"] == value
+
+    return trial
+
+
+def advance_program_counter(output, input) -> int:
+    """Run one instruction (which is not a branch), and return the new PC."""
+    from assembler import encode
+
+    output.set_bus("Instruction", encode("add", 0, 0, 0))
+    for step in range(5):
+        output.set_cycle(step)
+        output.send()
+    output.set_cycle(0)
+    output.send()
+    return input.read("A")["A"]
+
+
+def calibrate_program_counter(n_trials: int):
+    from test_program_counter import prepare_program_counter
+
+    output, input = _backplane()
+    for _ in range(n_trials):
+        # Move the PC on from zero, so that the reset can be seen
+        prepare_program_counter(input, output)
+        advance_program_counter(output, input)
+
+
+def trial_program_counter() -> Callable[[], bool]:
+    from test_program_counter import prepare_program_counter
+
+    output, input = _backplane()
+
+    def trial() -> bool:
+        # Too short a charge, and the reset is never seen
+        prepare_program_counter(input, output)
+        advance_program_counter(output, input)
+        if _reset_timed_out(
+            "ProgramCounter", lambda: prepare_program_counter(input, output)
+        ):
+            return False
+        # Once recovered, the PC counts again
+        return advance_program_counter(output, input) == 2
+
+    return trial
+
+
+class Calibration(NamedTuple):
+    # Exercises the polled signals
+    calibrate: Callable[[int], None]
+    polled: List[str]
+    # Gives a function which checks the board still works
+    trial: Optional[Callable[[], Callable[[], bool]]] = None
+    held: Sequence[str] = ()
+
+
+CALIBRATIONS = dict(
+    rwr=Calibration(
+        calibrate_rwr, ["RWR.RegOut", "RWR.Reset"], trial_rwr, ["RWR.ResetRecovery"]
+    ),
+    ir=Calibration(
+        calibrate_instruction_register,
+        ["InstructionRegister.Reset"],
+        trial_instruction_register,
+        ["InstructionRegister.ResetCharge", "InstructionRegister.ResetRecovery"],
+    ),
+    pc=Calibration(
+        calibrate_program_counter,
+        ["ProgramCounter.Reset"],
+        trial_program_counter,
+        ["ProgramCounter.ResetCharge", "ProgramCounter.ResetRecovery"],
+    ),
+)
+
+
+def shorten_holds(
+    engine: settle.SettleEngine,
+    keys: Sequence[str],
+    trial: Callable[[], bool],
+    n_trials: int,
+    margin: float = settle.MARGIN,
+) -> Dict[str, float]:
+    """Halve each hold for as long as n_trials trials in a row pass.
+
+    Returns the shortest hold which passed for each key, with the
+    margin added (but never more than the hold started at). The
+    engine is left with these minimums."""
+    result = dict()
+    for key in keys:
+        start = engine.minimums[key]
+        good = start
+        while good / 2 >= MIN_HOLD:
+            engine.minimums[key] = good / 2
+            if not all(trial() for _ in range(n_trials)):
+                break
+            good /= 2
+        result[key] = min(start, margin * good)
+        engine.minimums[key] = result[key]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("board", choices=sorted(CALIBRATIONS))
+    parser.add_argument("path", help="calibration file to write")
+    parser.add_argument("--trials", type=int, default=N_TRIALS)
+    args = parser.parse_args()
+
+    calibration = CALIBRATIONS[args.board]
+    engine = settle.ENGINE
+    for key in calibration.polled:
+        engine.minimums[key] = 0.0
+    calibration.calibrate(args.trials)
+
+    minimums = settle.SettleEngine.from_environment().minimums
+    for key, value in engine.calibration().items():
+        if key in calibration.polled:
+            minimums[key] = value
+    if calibration.trial is not None:
+        # With the polled signals at their calibrated minimums
+        engine.minimums.update(minimums)
+        minimums.update(
+            shorten_holds(
+                engine, calibration.held, calibration.trial(), args.trials
+            )
+        )
+    for line in engine.summary():
+        print(line)
+    engine.save(args.path, minimums)
+
+
+if __name__ == "__main__":
+    main()
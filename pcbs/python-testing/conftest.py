@@ -0,0 +1,256 @@
+"""Shared fixtures for the hardware tests.
+
+Constructing a board sets up the GPIO lines, and (for the connector
+boards) cycles the output enables and does a full send and receive.
+So each board is built once per session, and only its logical state
+is reset between tests.
+
+With the simulated GPIO backend (SLOTHPU_GPIO=sim), behavioural
+models of the board each test module exercises are plugged in, or
+with SLOTHPU_REPLAY, a recorded trace is replayed (see gpio_trace.py).
+
+The total runtime of each test module is reported at the end of the
+session. Use --save-module-times to record them, and
+--compare-module-times to compare a later run against the record.
+Along with them come the settle times observed by settle.ENGINE,
+the number of times each test received the board inputs, the
+number of sends made and skipped in each module, and the
+coverage of the test vectors planned by vectors.py. The latency
+plugin (see latency.py) can break the module times down further.
+"""
+
+import collections
+import json
+import os
+
+import pytest
+
+import gpio_backend
+import gpio_trace
+import settle
+import vectors
+
+pytest_plugins = ["latency"]
+
+# The cards each backplane test module expects to find plugged in
+SIM_BACKPLANE_CARDS = dict(
+    test_pi_backplane=[],
+    test_alu_carrier=["ALUCarrierCard"],
+    test_instruction_register=["InstructionRegisterCard"],
+    test_program_counter=["ProgramCounterCard"],
+    test_register_carrier=["RegisterCarrierCard"],
+    test_memory_server=[
+        "ALUCarrierCard",
+        "RegisterCarrierCard",
+        "ProgramCounterCard",
+        "InstructionRegisterCard",
+    ],
+)
+SIM_BACKPLANE_CARDS["test_lockstep"] = SIM_BACKPLANE_CARDS["test_memory_server"]
+
+_module_times = collections.defaultdict(float)
+# Number of input receives made by each test, by module
+_recv_counts = collections.defaultdict(list)
+# Number of sends performed and skipped (as the outputs were already
+# latched), by module
+_send_counts = collections.defaultdict(lambda: [0, 0])
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("module times")
+    group.addoption(
+        "--save-module-times",
+        metavar="PATH",
+        help="Write the runtime of each test module to a JSON file",
+    )
+    group.addoption(
+        "--compare-module-times",
+        metavar="PATH",
+        help="Compare the runtime of each test module with a saved JSON file",
+    )
+
+
+def pytest_runtest_logreport(report):
+    # Includes setup, so the first test using a session fixture
+    # pays for constructing the board
+    module = os.path.basename(report.nodeid.split("::")[0])
+    _module_times[module] += report.duration
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    settle_lines = settle.ENGINE.summary()
+    if settle_lines:
+        terminalreporter.section("settle times")
+        for line in settle_lines:
+            terminalreporter.write_line(line)
+
+    vector_lines = vectors.summary()
+    if vector_lines:
+        terminalreporter.section("vector coverage")
+        for line in vector_lines:
+            terminalreporter.write_line(line)
+
+    if _recv_counts:
+        terminalreporter.section("receives per test")
+        for module, counts in sorted(_recv_counts.items()):
+            terminalreporter.write_line(
+                f"{module:32s} {sum(counts) / len(counts):9.1f} mean"
+                f" {max(counts):7d} max  ({len(counts)} tests)"
+            )
+
+    if _send_counts:
+        terminalreporter.section("sends per module")
+        for module, (sent, skipped) in sorted(_send_counts.items()):
+            total = sent + skipped
+            terminalreporter.write_line(
+                f"{module:32s} {sent:9d} sent {skipped:9d} skipped"
+                f"  ({100 * skipped / total if total else 0:5.1f}% skipped)"
+            )
+
+    if not _module_times:
+        return
+
+    before = dict()
+    compare_path = config.getoption("compare_module_times")
+    if compare_path:
+        with open(compare_path) as f:
+            before = json.load(f)
+
+    terminalreporter.section("module runtimes")
+    for module, elapsed in sorted(_module_times.items()):
+        line = f"{module:32s} {elapsed:9.2f} s"
+        if module in before and elapsed > 0:
+            line += (
+                f"  (before {before[module]:9.2f} s, {before[module] / elapsed:6.1f}x)"
+            )
+        terminalreporter.write_line(line)
+
+    save_path = config.getoption("save_module_times")
+    if save_path:
+        with open(save_path, "w") as f:
+            json.dump(dict(_module_times), f, indent=2)
+
+
+@pytest.fixture(scope="session")
+def _backplane_session():
+    from pi_backplane import _Input, _Output
+
+    return _Output(), _Input()
+
+
+def _record_recvs(request, n_recvs: int):
+    module = os.path.basename(request.node.nodeid.split("::")[0])
+    _recv_counts[module].append(n_recvs)
+
+
+def _record_sends(request, n_sends: int, n_skipped: int):
+    counts = _send_counts[os.path.basename(request.node.nodeid.split("::")[0])]
+    counts[0] += n_sends
+    counts[1] += n_skipped
+
+
+@pytest.fixture
+def backplane(request, _backplane_session):
+    """The (output, input) pair for the Pi backplane.
+
+    The output image is zeroed and all outputs disabled, just as
+    for a freshly constructed pair. The start of the test is marked
+    in the VCD, if one is being written (see bus_vcd.py)."""
+    output, input = _backplane_session
+    output.clear()
+    input.clear()
+    if input.vcd is not None:
+        input.vcd.comment(request.node.nodeid)
+    n_recvs = input.n_recvs
+    n_sends = output.n_sends, output.n_sends_skipped
+    yield output, input
+    _record_recvs(request, input.n_recvs - n_recvs)
+    _record_sends(
+        request, output.n_sends - n_sends[0], output.n_sends_skipped - n_sends[1]
+    )
+
+
+@pytest.fixture(scope="session")
+def _connector_boards():
+    return dict()
+
+
+@pytest.fixture
+def connector_board(request, _connector_boards):
+    """Function giving the instance of a ConnectorBoard class.
+
+    The instance is created on first use, and reinitialised when
+    it is requested again."""
+    # Receives and sends made by the boards used in this test
+    # (counted from after they were created or reinitialised)
+    n_recvs = dict()
+    n_sends = dict()
+
+    def get(cls):
+        board = _connector_boards.get(cls)
+        if board is None:
+            board = cls()
+            _connector_boards[cls] = board
+        else:
+            board.reinitialise()
+        n_recvs[board] = board.n_recvs
+        n_sends[board] = board.n_sends, board.n_sends_skipped
+        return board
+
+    yield get
+    if n_recvs:
+        _record_recvs(request, sum(b.n_recvs - n for b, n in n_recvs.items()))
+        _record_sends(
+            request,
+            sum(b.n_sends - n for b, (n, _) in n_sends.items()),
+            sum(b.n_sends_skipped - n for b, (_, n) in n_sends.items()),
+        )
+
+
+@pytest.fixture(scope="session")
+def _sim_rigs():
+    return dict()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def simulated_boards(request, _sim_rigs):
+    """Attach models of the boards under test to the simulated GPIO.
+
+    Does nothing unless the simulated backend is in use. The rig
+    (tester board or backplane) persists for the session, and only
+    the boards plugged into it are replaced for each module. When
+    replaying a trace, the rigs play it back in place of the boards."""
+    if gpio_backend.backend_name() != "sim":
+        return None
+
+    import board_models
+    import sim_gpio
+    from connector_board import ConnectorBoard
+
+    replay = os.environ.get(gpio_trace.REPLAY_ENV)
+    if replay and "trace" not in _sim_rigs:
+        trace = gpio_trace.Trace(replay)
+        _sim_rigs["trace"] = trace
+        _sim_rigs["backplane"] = gpio_trace.BackplaneReplayRig(trace)
+        _sim_rigs["tester"] = gpio_trace.TesterReplayRig(trace)
+
+    module = request.module
+    name = module.__name__.split(".")[-1]
+    if name in SIM_BACKPLANE_CARDS:
+        rig = _sim_rigs.setdefault("backplane", sim_gpio.BackplaneRig())
+        if not replay:
+            rig.cards = [getattr(board_models, c)() for c in SIM_BACKPLANE_CARDS[name]]
+        sim_gpio.attach(rig)
+        return rig
+
+    for value in vars(module).values():
+        if isinstance(value, type) and issubclass(value, ConnectorBoard):
+            for cls in value.__mro__:
+                if cls.__name__ in board_models.CONNECTOR_MODELS:
+                    model = board_models.CONNECTOR_MODELS[cls.__name__]
+                    rig = _sim_rigs.setdefault("tester", sim_gpio.TesterRig())
+                    if not replay:
+                        rig.model = model.for_board(value)
+                    sim_gpio.attach(rig)
+                    return rig
+    return None
@@ -0,0 +1,257 @@
+import collections
+import dataclasses
+import types
+
+from typing import Dict, List, Mapping, NamedTuple, Tuple, Type, Union
+
+import bitarray
+import bitarray.util
+
+from tester_board import TesterBoard
+
+PinMap = Mapping[str, Union[int, List[int]]]
+FieldValue = Union[bool, int, bitarray.bitarray]
+
+
+class _Field(NamedTuple):
+    pins: Tuple[int, ...]
+    # When the pins are consecutive (least significant bit first),
+    # the field is just a slice of the image
+    start: int
+    stop: int
+    contiguous: bool
+
+
+def _freeze(pin_map: PinMap) -> Mapping[str, Union[int, Tuple[int, ...]]]:
+    frozen = {k: v if isinstance(v, int) else tuple(v) for k, v in pin_map.items()}
+    return types.MappingProxyType(frozen)
+
+
+def _compile(pin_map: PinMap) -> Dict[str, _Field]:
+    fields = dict()
+    for name, pins in pin_map.items():
+        if isinstance(pins, int):
+            pins = (pins,)
+        pins = tuple(pins)
+        start = pins[0]
+        contiguous = pins == tuple(range(start, start + len(pins)))
+        fields[name] = _Field(pins, start, start + len(pins), contiguous)
+    return fields
+
+
+def _make_writer(name: str):
+    def writer(self, value: FieldValue):
+        self._set(name, value)
+        self.send()
+
+    writer.__name__ = f"write_{name}"
+    writer.__doc__ = f"Set {name} and latch the outputs."
+    return writer
+
+
+def _make_reader(name: str):
+    def reader(self) -> Union[bool, int]:
+        return self.read(name)[name]
+
+    reader.__name__ = f"read_{name}"
+    reader.__doc__ = f"Receive {name} (and as little else as possible) and return it."
+    return reader
+
+
+class ConnectorBoard:
+    """Common machinery for a board plugged into a TesterBoard.
+
+    Subclasses give their pin assignments as the class attributes
+    Output_Pins and Input_Pins. These map names to a single pin, or
+    to a list of pins (least significant bit first). Initial_Outputs
+    gives any outputs which must be set before the outputs are
+    enabled (such as active low selects).
+
+    The maps are frozen and compiled into slices of the pin images
+    once, when the class is created, so reading or writing a field
+    takes a fixed number of bitarray operations. Each output gets a
+    write_<name>() method and each input a read_<name>() method,
+    unless the class (or a base) already has one. A Snapshot record
+    type with one entry per input is also created."""
+
+    Output_Pins: PinMap = dict()
+    Input_Pins: PinMap = dict()
+    Initial_Outputs: Mapping[str, FieldValue] = dict()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.Output_Pins = _freeze(cls.Output_Pins)
+        cls.Input_Pins = _freeze(cls.Input_Pins)
+        cls.Initial_Outputs = types.MappingProxyType(dict(cls.Initial_Outputs))
+        cls._output_fields = _compile(cls.Output_Pins)
+        cls._input_fields = _compile(cls.Input_Pins)
+        for name in cls.Initial_Outputs:
+            assert name in cls._output_fields, f"Unknown output {name}"
+
+        cls.Snapshot = collections.namedtuple(
+            f"{cls.__name__}Snapshot", list(cls.Input_Pins.keys())
+        )
+        for name in cls.Output_Pins:
+            if not hasattr(cls, f"write_{name}"):
+                setattr(cls, f"write_{name}", _make_writer(name))
+        for name in cls.Input_Pins:
+            if not hasattr(cls, f"read_{name}"):
+                setattr(cls, f"read_{name}", _make_reader(name))
+
+    def __init__(self):
+        """Initialise with an internal Testerboard.
+
+        The initial outputs are latched before the outputs are
+        enabled, and then the inputs are read."""
+        self._tb = TesterBoard()
+        self.reinitialise()
+
+    def reinitialise(self):
+        """Return the outputs to their initial state.
+
+        This repeats everything the constructor does, apart from
+        setting up the GPIO lines, so a board can be reused between
+        tests."""
+        # Nothing left over from a batch which was abandoned
+        self._tb.cancel_batch()
+
+        # Start with all outputs disabled
+        self._tb.enable_outputs([False for _ in range(5)])
+
+        self._outputs = bitarray.util.zeros(self._tb.n_pins, endian="little")
+        self._inputs = bitarray.util.zeros(self._tb.n_pins, endian="little")
+
+        # Set all outputs low, except as requested
+        for name, value in self.Initial_Outputs.items():
+            self._set(name, value)
+        self.send()
+        self._tb.enable_outputs([True for _ in range(5)])
+
+        self.recv()
+
+    def recv(self):
+        self._inputs = self._tb.recv()
+
+    def read(self, *names: str) -> Dict[str, Union[bool, int]]:
+        """Receive just the given inputs, and return them by name.
+
+        Only the part of the input chain holding them is clocked
+        in, and the number of clock edges saved is left in
+        clocks_saved. Other inputs are not updated."""
+        lowest_pin = min(min(self._input_fields[name].pins) for name in names)
+        self._inputs = self._tb.recv(lowest_pin)
+        return {name: self._get(name) for name in names}
+
+    @property
+    def n_recvs(self) -> int:
+        """Number of times the inputs have been received."""
+        return self._tb.n_recvs
+
+    @property
+    def n_sends(self) -> int:
+        """Number of times the outputs have been shifted out and latched."""
+        return self._tb.n_sends
+
+    @property
+    def n_sends_skipped(self) -> int:
+        """Number of sends skipped, as the outputs were already latched."""
+        return self._tb.n_sends_skipped
+
+    @property
+    def clocks_saved(self) -> int:
+        """Clock edges saved by the last read() (or recv())."""
+        return self._tb.clocks_saved
+
+    def send(self):
+        self._tb.send(self._outputs)
+
+    def batch(self):
+        """Only latch the outputs once, at the end of the block."""
+        return self._tb.batch()
+
+    def write(self, **values: FieldValue):
+        """Set several outputs, and latch them together."""
+        for name, value in values.items():
+            self._set(name, value)
+        self.send()
+
+    def snapshot(self):
+        """Receive the inputs once, and decode all of them.
+
+        The result is a Snapshot record, so several inputs can be
+        checked for the cost of a single pass along the chain."""
+        self.recv()
+        return self.Snapshot(*[self._get(name) for name in self._input_fields])
+
+    def _set(self, name: str, value: FieldValue):
+        if isinstance(value, bitarray.bitarray):
+            self._set_bits(name, value)
+        elif len(self._output_fields[name].pins) == 1:
+            self._set_pin(name, value)
+        else:
+            self._set_int(name, value)
+
+    def _get(self, name: str) -> Union[bool, int]:
+        if len(self._input_fields[name].pins) == 1:
+            return self._get_pin(name)
+        return self._get_int(name)
+
+    def _set_pin(self, name: str, value: bool):
+        self._outputs[self._output_fields[name].start] = value
+
+    def _set_bits(self, name: str, value: bitarray.bitarray):
+        field = self._output_fields[name]
+        assert len(value) == len(field.pins)
+
+        if field.contiguous:
+            self._outputs[field.start : field.stop] = value
+        else:
+            for pin, bit in zip(field.pins, value):
+                self._outputs[pin] = bit
+
+    def _set_int(self, name: str, value: int):
+        width = len(self._output_fields[name].pins)
+        assert value >= 0 and value < 2 ** width
+
+        self._set_bits(name, bitarray.util.int2ba(value, length=width, endian="little"))
+
+    def _get_pin(self, name: str) -> bool:
+        return self._inputs[self._input_fields[name].start] == 1
+
+    def _get_bits(self, name: str) -> bitarray.bitarray:
+        field = self._input_fields[name]
+
+        if field.contiguous:
+            return self._inputs[field.start : field.stop]
+        result = bitarray.bitarray(len(field.pins), endian="little")
+        for i, pin in enumerate(field.pins):
+            result[i] = self._inputs[pin]
+        return result
+
+    def _get_int(self, name: str) -> int:
+        return bitarray.util.ba2int(self._get_bits(name))
+
+
+@dataclasses.dataclass(frozen=True)
+class BoardSpec:
+    """Declarative description of a board plugged into a TesterBoard.
+
+    The outputs and inputs map names to tester board pins (see
+    ConnectorBoard for the details), and initial gives outputs
+    which must not start low."""
+
+    name: str
+    outputs: PinMap
+    inputs: PinMap
+    initial: Mapping[str, FieldValue] = dataclasses.field(default_factory=dict)
+
+
+def make_board(spec: BoardSpec) -> Type[ConnectorBoard]:
+    """Create a ConnectorBoard class for the given description."""
+    namespace = dict(
+        Output_Pins=spec.outputs,
+        Input_Pins=spec.inputs,
+        Initial_Outputs=spec.initial,
+        __doc__=f"Connector board generated from the {spec.name} description.",
+    )
+    return type(spec.name, (ConnectorBoard,), namespace)
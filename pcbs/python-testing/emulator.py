@@ -0,0 +1,259 @@
+from typing import List, NamedTuple, Optional
+
+from constants import INSTRUCTIONS, N_BITS
+
+MEMORY_SIZE = 2 ** N_BITS
+N_REGISTERS = 16
+WORD_MASK = (2 ** N_BITS) - 1
+
+# The stages of the compute cycle, numbered as on the cycle bus
+IFETCH = 0
+ISTORE = 1
+EXECUTE = 2
+COMMIT = 3
+PCUPDATE = 4
+N_STAGES = 5
+
+ADD = INSTRUCTIONS["add"]
+SUB = INSTRUCTIONS["sub"]
+COMPARE = INSTRUCTIONS["compare"]
+NAND = INSTRUCTIONS["nand"]
+XOR = INSTRUCTIONS["xor"]
+BARREL = INSTRUCTIONS["barrel"]
+LOADB = INSTRUCTIONS["loadb"]
+LOADW = INSTRUCTIONS["loadw"]
+STOREB = INSTRUCTIONS["storeb"]
+STOREW = INSTRUCTIONS["storew"]
+LOADPC = INSTRUCTIONS["loadpc"]
+BRANCHZERO = INSTRUCTIONS["branchzero"]
+HALT = INSTRUCTIONS["halt"]
+SET = INSTRUCTIONS["set"]
+
+# The ALU has i3 = 0
+ALU_MASK = 8
+
+# Instructions which suppress the update of the register file
+NO_REGISTER_WRITE = (STOREB, STOREW, BRANCHZERO)
+
+
+class EmulatorError(Exception):
+    pass
+
+
+class BusState(NamedTuple):
+    cycle: int
+    A: int
+    B: int
+    C: int
+    Instruction: int
+
+
+def alu(op: int, A: int, B: int) -> int:
+    """Compute the value the ALU puts on C bus.
+
+    Unassigned ALU instructions leave C undriven (and so zero)."""
+    if op == ADD:
+        return (A + B) & WORD_MASK
+    elif op == SUB:
+        return (A - B) & WORD_MASK
+    elif op == COMPARE:
+        if A < B:
+            return 1
+        elif A > B:
+            return 4
+        return 2
+    elif op == NAND:
+        return ~(A & B) & WORD_MASK
+    elif op == XOR:
+        return A ^ B
+    elif op == BARREL:
+        n = B & 0xF
+        return ((A << n) | (A >> (N_BITS - n))) & WORD_MASK
+    return 0
+
+
+class SlothPU16:
+    def __init__(self, image: bytes = b"", address: int = 0):
+        """Software model of the machine.
+
+        There are two ways of running it. step_stage() (and step())
+        go through the compute cycle one stage at a time, and give
+        the values on the buses after each one. run() executes
+        whole instructions as fast as it can, and is intended for
+        running real workloads. Both have the same effect on the
+        registers and memory, and they can be mixed between
+        instructions."""
+        self.memory = bytearray(MEMORY_SIZE)
+        self.registers = [0 for _ in range(N_REGISTERS)]
+        self.pc = 0
+        self.ir = 0
+
+        # The next stage of the compute cycle to be entered
+        self.stage = IFETCH
+        self.halted = False
+
+        self.n_instructions = 0
+        self.n_cycles = 0
+
+        self.load(image, address)
+
+    def load(self, image: bytes, address: int = 0):
+        assert address >= 0 and address + len(image) <= MEMORY_SIZE
+        self.memory[address : address + len(image)] = image
+
+    def read_word(self, address: int) -> int:
+        if address & 1:
+            raise EmulatorError(f"Unaligned word address {address:#06x}")
+        return self.memory[address] | (self.memory[address + 1] << 8)
+
+    def write_word(self, address: int, value: int):
+        if address & 1:
+            raise EmulatorError(f"Unaligned word address {address:#06x}")
+        self.memory[address] = value & 0xFF
+        self.memory[address + 1] = (value >> 8) & 0xFF
+
+    def _execute_C(self, A: int, B: int) -> int:
+        """Value on C bus during Decode/Execute and Commit."""
+        op = self.ir & 0xF
+        if not op & ALU_MASK:
+            return alu(op, A, B)
+        elif op == LOADB:
+            return self.memory[A]
+        elif op == LOADW:
+            return self.read_word(A)
+        elif op == LOADPC:
+            return self.pc
+        elif op == SET:
+            return (self.ir >> 4) & 0xFF
+        # Stores, branches and halt do not drive C
+        return 0
+
+    def buses(self) -> BusState:
+        """Values on the buses, once the current stage has settled.
+
+        The instruction is placed on B bus by memory during
+        Instruction Fetch and Store, which is where the instruction
+        register board picks it up."""
+        stage = (self.stage - 1) % N_STAGES
+        if stage in (IFETCH, ISTORE):
+            return BusState(stage, self.pc, self.read_word(self.pc), 0, self.ir)
+
+        A = self.registers[(self.ir >> 4) & 0xF]
+        B = self.registers[(self.ir >> 8) & 0xF]
+        op = self.ir & 0xF
+        if stage == PCUPDATE and not op & ALU_MASK:
+            # The ALU is only active on Decode/Execute and Commit
+            C = 0
+        else:
+            C = self._execute_C(A, B)
+        return BusState(stage, A, B, C, self.ir)
+
+    def step_stage(self) -> BusState:
+        """Enter the next stage of the compute cycle.
+
+        Returns the bus values once the stage has settled."""
+        stage = self.stage
+        if stage == ISTORE:
+            self.ir = self.read_word(self.pc)
+        elif stage == COMMIT:
+            op = self.ir & 0xF
+            A = self.registers[(self.ir >> 4) & 0xF]
+            B = self.registers[(self.ir >> 8) & 0xF]
+            if op == STOREB:
+                self.memory[A] = B & 0xFF
+            elif op == STOREW:
+                self.write_word(A, B)
+            if op not in NO_REGISTER_WRITE:
+                self.registers[self.ir >> 12] = self._execute_C(A, B)
+        elif stage == PCUPDATE:
+            op = self.ir & 0xF
+            A = self.registers[(self.ir >> 4) & 0xF]
+            B = self.registers[(self.ir >> 8) & 0xF]
+            if op == HALT:
+                self.halted = True
+            elif op == BRANCHZERO and B == 0:
+                self.pc = A
+            else:
+                self.pc = (self.pc + 2) & WORD_MASK
+            self.n_instructions += 1
+
+        self.stage = (stage + 1) % N_STAGES
+        self.n_cycles += 1
+        return self.buses()
+
+    def step(self) -> List[BusState]:
+        """Go through a full compute cycle, returning each stage's buses."""
+        assert self.stage == IFETCH, "Not at an instruction boundary"
+        return [self.step_stage() for _ in range(N_STAGES)]
+
+    def run(self, max_instructions: Optional[int] = None) -> int:
+        """Execute instructions until halt (or the limit is reached).
+
+        This does not model the buses, and so is much faster than
+        stepping through the stages. Returns the number of
+        instructions executed."""
+        assert self.stage == IFETCH, "Not at an instruction boundary"
+        if max_instructions is None:
+            max_instructions = -1
+
+        mem = self.memory
+        regs = self.registers
+        pc = self.pc
+        n = 0
+        self.halted = False
+        try:
+            while n != max_instructions:
+                if pc & 1:
+                    raise EmulatorError(f"Unaligned PC {pc:#06x}")
+                w = mem[pc] | (mem[pc + 1] << 8)
+                op = w & 0xF
+                A = regs[(w >> 4) & 0xF]
+                B = regs[(w >> 8) & 0xF]
+                n += 1
+
+                if op < ALU_MASK:
+                    if op == ADD:
+                        regs[w >> 12] = (A + B) & WORD_MASK
+                    elif op == SUB:
+                        regs[w >> 12] = (A - B) & WORD_MASK
+                    elif op == NAND:
+                        regs[w >> 12] = ~(A & B) & WORD_MASK
+                    elif op == XOR:
+                        regs[w >> 12] = A ^ B
+                    else:
+                        regs[w >> 12] = alu(op, A, B)
+                elif op == BRANCHZERO:
+                    if B == 0:
+                        pc = A
+                        continue
+                elif op == SET:
+                    regs[w >> 12] = (w >> 4) & 0xFF
+                elif op == LOADW:
+                    if A & 1:
+                        raise EmulatorError(f"Unaligned word address {A:#06x}")
+                    regs[w >> 12] = mem[A] | (mem[A + 1] << 8)
+                elif op == STOREW:
+                    if A & 1:
+                        raise EmulatorError(f"Unaligned word address {A:#06x}")
+                    mem[A] = B & 0xFF
+                    mem[A + 1] = B >> 8
+                elif op == LOADB:
+                    regs[w >> 12] = mem[A]
+                elif op == STOREB:
+                    mem[A] = B & 0xFF
+                elif op == LOADPC:
+                    regs[w >> 12] = pc
+                elif op == HALT:
+                    # Nothing drives C, but the register file
+                    # still commits it
+                    regs[w >> 12] = 0
+                    self.halted = True
+                    break
+                pc = (pc + 2) & WORD_MASK
+        finally:
+            self.pc = pc
+            if n > 0:
+                self.ir = w
+            self.n_instructions += n
+            self.n_cycles += N_STAGES * n
+        return n
@@ -0,0 +1,99 @@
+import enum
+import types
+
+from typing import Dict, List, Mapping, Optional
+
+
+class Direction(enum.Enum):
+    AS_IS = 1
+    INPUT = 2
+    OUTPUT = 3
+
+
+class Value(enum.Enum):
+    INACTIVE = 0
+    ACTIVE = 1
+
+
+line = types.SimpleNamespace(Direction=Direction, Value=Value)
+
+
+class LineSettings:
+    def __init__(
+        self,
+        direction: Direction = Direction.AS_IS,
+        output_value: Value = Value.INACTIVE,
+    ):
+        self.direction = direction
+        self.output_value = output_value
+
+
+class Chip:
+    def __init__(self, path: str):
+        """Imitate a gpiochip, recording every request made of it.
+
+        The levels of the lines are kept in values. Input lines
+        read whatever is placed there."""
+        self.path = path
+        self.values: Dict[int, Value] = dict()
+        self.requests: List["LineRequest"] = []
+        # Every call into the 'kernel', as (name, argument) pairs
+        self.calls: List[tuple] = []
+
+
+# Chips which have been requested from, by path
+chips: Dict[str, Chip] = dict()
+
+
+def chip(path: str) -> Chip:
+    if path not in chips:
+        chips[path] = Chip(path)
+    return chips[path]
+
+
+class LineRequest:
+    def __init__(self, chip: Chip, consumer: str, settings: Dict[int, LineSettings]):
+        self.chip = chip
+        self.consumer = consumer
+        self.settings = settings
+        self.released = False
+
+        for request in chip.requests:
+            for offset in settings:
+                assert (
+                    request.released or offset not in request.settings
+                ), f"Line {offset} busy"
+        for offset, s in settings.items():
+            if s.direction == Direction.OUTPUT:
+                chip.values[offset] = s.output_value
+        chip.requests.append(self)
+
+    def set_values(self, values: Mapping[int, Value]):
+        assert not self.released, "Request released"
+        self.chip.calls.append(("set_values", dict(values)))
+        for offset, value in values.items():
+            assert self.settings[offset].direction == Direction.OUTPUT
+            self.chip.values[offset] = value
+
+    def get_value(self, offset: int) -> Value:
+        assert not self.released, "Request released"
+        assert offset in self.settings
+        self.chip.calls.append(("get_value", offset))
+        return self.chip.values.get(offset, Value.INACTIVE)
+
+    def release(self):
+        self.released = True
+
+
+def request_lines(
+    path: str, consumer: Optional[str] = None, config: Mapping = None
+) -> LineRequest:
+    """Imitate gpiod.request_lines, with offsets (or tuples of them) as keys."""
+    settings = dict()
+    for key, s in config.items():
+        offsets = key if isinstance(key, tuple) else (key,)
+        for offset in offsets:
+            settings[offset] = s
+    c = chip(path)
+    c.calls.append(("request_lines", sorted(settings)))
+    return LineRequest(c, consumer, settings)
@@ -0,0 +1,46 @@
+from typing import List, Optional
+
+
+class SpiDev:
+    def __init__(self):
+        """Imitate spidev.SpiDev, recording every transfer.
+
+        Whatever is placed in miso is returned (a byte at a time)
+        by subsequent transfers; zeros are returned once it runs
+        out."""
+        self.bus: Optional[int] = None
+        self.device: Optional[int] = None
+        self.mode = 0
+        self.max_speed_hz = 0
+        self.bits_per_word = 8
+
+        self.miso: List[int] = []
+        self.transfers: List[List[int]] = []
+
+    def open(self, bus: int, device: int):
+        assert self.bus is None, "Already open"
+        self.bus = bus
+        self.device = device
+
+    def close(self):
+        self.bus = None
+        self.device = None
+
+    def xfer2(self, values: List[int]) -> List[int]:
+        assert self.bus is not None, "Not open"
+        for v in values:
+            assert v >= 0 and v < 256
+
+        self.transfers.append(list(values))
+        result = self.miso[: len(values)]
+        self.miso = self.miso[len(values) :]
+        return result + [0] * (len(values) - len(result))
+
+    def xfer(self, values: List[int]) -> List[int]:
+        return self.xfer2(values)
+
+    def writebytes(self, values: List[int]):
+        self.xfer2(values)
+
+    def readbytes(self, n: int) -> List[int]:
+        return self.xfer2([0] * n)
@@ -0,0 +1,583 @@
+"""Bit-parallel logic simulation of the boards, from their schematics.
+
+The netlist (see kicad_netlist.py) is turned into elements, one for
+each gate or block of a 74-series part, using the models in MODELS.
+Each net carries one bit per test vector, packed 64 to a word of a
+NumPy array, so a single pass over the elements evaluates thousands
+of vectors at once:
+
+    circuit = Circuit.from_schematic(schematic("Adder Subtractor"))
+    result = circuit.run({"A": a, "B": b, "~{Add}": 0, "~{Sub}": 1, "Carry_{in}": 0})
+    result.bus("C")
+
+Inputs are given by net name (as 0 or 1, or an array of them), or by
+the prefix of a set of numbered nets (as integers). Nets nobody
+drives read as zero, as they do through the tester board's
+pull-downs, and are reported by Result.floating(). Two drivers
+disagreeing is reported by Result.contention().
+
+Only combinational parts are modelled. The registers and shift
+registers (74HC574, 74HC595, 74HC165) are listed in
+Circuit.unsupported, and leave their outputs undriven.
+
+Boards plugged into a carrier's edge connector sockets can be
+simulated together, by joining their netlists with plug(), as
+card() does for the backplane cards and machine() for the backplane.
+"""
+
+import collections
+import os
+import re
+
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from kicad_netlist import Component, Netlist, load_netlist
+
+WORD = np.uint64
+WORD_BITS = 64
+
+# Nets named by power symbols, with their logic levels
+POWER_LEVELS = {"+5V": 1, "+3.3V": 1, "GND": 0}
+
+PCBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# The boards plugged into each card: socket, board, and the board's
+# edge connector
+CARD_BOARDS = {
+    "ALU Carrier": [
+        ("J3001", "Adder Subtractor", "J1"),
+        ("J3002", "Adder Subtractor", "J1"),
+        ("J4001", "Comparator", "J1"),
+        ("J5001", "NAND XOR", "J1"),
+        ("J5002", "NAND XOR", "J1"),
+        ("J6001", "Barrel Shifter", "J101"),
+        ("J6002", "Barrel Shifter", "J101"),
+    ],
+    "Register File Carrier": [
+        (socket, "Register File", "J101")
+        for socket in ["J2001", "J2002", "J2003", "J2004"]
+    ],
+    "Program Counter": [
+        ("J1003", "Register with Reset", "J101"),
+        ("J1004", "Incrementer", "J101"),
+    ],
+    "Instruction Register": [("J1003", "Register with Reset", "J101")],
+}
+
+# The cards on the backplane, each with its two connectors (J1001 and
+# J1002) in a pair of the backplane's
+CARDS = [
+    "ALU Carrier",
+    "Register File Carrier",
+    "Program Counter",
+    "Instruction Register",
+]
+
+# Passes over the elements before giving up on the values settling
+MAX_PASSES = 64
+
+_PART_NUMBER = re.compile(r"^(?:SN)?74[A-Z]*(\d+)[A-Z]*$")
+
+# A value and where it is driven (None when always driven)
+Drive = Tuple[np.ndarray, Optional[np.ndarray]]
+
+
+class SimulationError(Exception):
+    pass
+
+
+class Element(NamedTuple):
+    reference: str
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    # From the words of the inputs to the drive of each output
+    evaluate: Callable[..., List[Drive]]
+    # The pin numbers of the inputs and outputs
+    input_pins: Tuple[str, ...]
+    output_pins: Tuple[str, ...]
+
+
+def pack(bits: np.ndarray) -> np.ndarray:
+    """Pack an array of 0/1 values into words, 64 vectors to a word."""
+    packed = np.packbits(np.asarray(bits, dtype=bool), bitorder="little")
+    padded = np.zeros(-(-len(packed) // 8) * 8, dtype=np.uint8)
+    padded[: len(packed)] = packed
+    return padded.view(WORD)
+
+
+def unpack(words: np.ndarray, n: int) -> np.ndarray:
+    """The first n vectors of packed words, as booleans."""
+    return np.unpackbits(words.view(np.uint8), bitorder="little")[:n].astype(bool)
+
+
+def _element(
+    component: Component,
+    input_pins: Sequence[str],
+    output_pins: Sequence[str],
+    evaluate: Callable[..., List[Drive]],
+) -> List[Element]:
+    """The element for a unit of the part, if it is placed."""
+    if not all(p in component.pins for p in [*input_pins, *output_pins]):
+        return []
+    return [
+        Element(
+            component.reference,
+            tuple(component.pins[p] for p in input_pins),
+            tuple(component.pins[p] for p in output_pins),
+            evaluate,
+            tuple(input_pins),
+            tuple(output_pins),
+        )
+    ]
+
+
+def _gates(
+    component: Component,
+    units: Sequence[Tuple[Sequence[str], str]],
+    function: Callable[..., np.ndarray],
+) -> List[Element]:
+    elements = []
+    for inputs, output in units:
+        elements += _element(
+            component, inputs, [output], lambda *x: [(function(*x), None)]
+        )
+    return elements
+
+
+_QUAD_2_INPUT = [
+    (("1", "2"), "3"),
+    (("4", "5"), "6"),
+    (("9", "10"), "8"),
+    (("12", "13"), "11"),
+]
+_HEX_INVERTER = [
+    (("1",), "2"),
+    (("3",), "4"),
+    (("5",), "6"),
+    (("9",), "8"),
+    (("11",), "10"),
+    (("13",), "12"),
+]
+
+
+def _nand(component: Component) -> List[Element]:
+    return _gates(component, _QUAD_2_INPUT, lambda a, b: ~(a & b))
+
+
+def _and(component: Component) -> List[Element]:
+    return _gates(component, _QUAD_2_INPUT, lambda a, b: a & b)
+
+
+def _xor(component: Component) -> List[Element]:
+    return _gates(component, _QUAD_2_INPUT, lambda a, b: a ^ b)
+
+
+def _inverter(component: Component) -> List[Element]:
+    return _gates(component, _HEX_INVERTER, lambda a: ~a)
+
+
+def _buffer_125(component: Component) -> List[Element]:
+    """Quad buffer, each with an active low output enable."""
+    elements = []
+    for oe, a, y in [
+        ("1", "2", "3"),
+        ("4", "5", "6"),
+        ("10", "9", "8"),
+        ("13", "12", "11"),
+    ]:
+        elements += _element(component, [oe, a], [y], lambda oe, a: [(a, ~oe)])
+    return elements
+
+
+def _adder_283(component: Component) -> List[Element]:
+    """4 bit binary full adder with fast carry."""
+    inputs = ["5", "3", "14", "12", "6", "2", "15", "11", "7"]
+    outputs = ["4", "1", "13", "10", "9"]
+
+    def evaluate(a1, a2, a3, a4, b1, b2, b3, b4, carry):
+        sums = []
+        for a, b in [(a1, b1), (a2, b2), (a3, b3), (a4, b4)]:
+            sums.append((a ^ b ^ carry, None))
+            carry = (a & b) | (carry & (a ^ b))
+        return sums + [(carry, None)]
+
+    return _element(component, inputs, outputs, evaluate)
+
+
+def _comparator_85(component: Component) -> List[Element]:
+    """4 bit magnitude comparator, with cascading inputs."""
+    # A3..A0, B3..B0, then I(A>B), I(A=B), I(A<B)
+    inputs = ["15", "13", "12", "10", "1", "14", "11", "9", "4", "3", "2"]
+    outputs = ["5", "6", "7"]
+
+    def evaluate(a3, a2, a1, a0, b3, b2, b1, b0, i_gt, i_eq, i_lt):
+        gt = np.zeros_like(a0)
+        lt = np.zeros_like(a0)
+        equal = ~gt
+        for a, b in [(a3, b3), (a2, b2), (a1, b1), (a0, b0)]:
+            gt |= equal & a & ~b
+            lt |= equal & ~a & b
+            equal &= ~(a ^ b)
+        # With the words equal, the cascading inputs decide (as in
+        # the function table, including the cases it calls invalid)
+        o_gt = gt | (equal & ~i_eq & ~i_lt)
+        o_lt = lt | (equal & ~i_eq & ~i_gt)
+        o_eq = equal & i_eq
+        return [(o_gt, None), (o_eq, None), (o_lt, None)]
+
+    return _element(component, inputs, outputs, evaluate)
+
+
+def _decoder_138(component: Component) -> List[Element]:
+    """3 to 8 line decoder, with active low outputs."""
+    inputs = ["1", "2", "3", "4", "5", "6"]
+    outputs = ["15", "14", "13", "12", "11", "10", "9", "7"]
+
+    def evaluate(a0, a1, a2, e0, e1, e2):
+        enabled = ~e0 & ~e1 & e2
+        lines = []
+        for i in range(8):
+            match = enabled
+            for bit, a in enumerate([a0, a1, a2]):
+                match = match & (a if i >> bit & 1 else ~a)
+            lines.append((~match, None))
+        return lines
+
+    return _element(component, inputs, outputs, evaluate)
+
+
+def _transceiver(
+    component: Component,
+    direction: str,
+    enable: str,
+    a_pins: Sequence[str],
+    b_pins: Sequence[str],
+) -> List[Element]:
+    """Octal bus transceiver: A to B when direction is high, while the
+    (active low) enable is low."""
+    inputs = [direction, enable, *a_pins, *b_pins]
+    outputs = [*a_pins, *b_pins]
+    n = len(a_pins)
+
+    def evaluate(dir_, oe, *sides):
+        to_b = dir_ & ~oe
+        to_a = ~dir_ & ~oe
+        a, b = sides[:n], sides[n:]
+        return [(v, to_a) for v in b] + [(v, to_b) for v in a]
+
+    return _element(component, inputs, outputs, evaluate)
+
+
+def _transceiver_245(component: Component) -> List[Element]:
+    # The symbol calls ~OE 'CE', and DIR 'A->B'
+    return _transceiver(
+        component,
+        "1",
+        "19",
+        [str(p) for p in range(2, 10)],
+        [str(p) for p in range(18, 10, -1)],
+    )
+
+
+def _transceiver_4245(component: Component) -> List[Element]:
+    return _transceiver(
+        component,
+        "2",
+        "22",
+        [str(p) for p in range(3, 11)],
+        [str(p) for p in range(21, 13, -1)],
+    )
+
+
+def _inverting_buffer_540(component: Component) -> List[Element]:
+    """Octal inverting buffer, enabled when both G1 and G2 are low."""
+    inputs = ["1", "19", *[str(p) for p in range(2, 10)]]
+    outputs = [str(p) for p in range(18, 10, -1)]
+
+    def evaluate(g1, g2, *a):
+        enabled = ~g1 & ~g2
+        return [(~v, enabled) for v in a]
+
+    return _element(component, inputs, outputs, evaluate)
+
+
+# Element builders, by 74-series part number
+MODELS: Dict[str, Callable[[Component], List[Element]]] = {
+    "00": _nand,
+    "04": _inverter,
+    "08": _and,
+    "14": _inverter,
+    "85": _comparator_85,
+    "86": _xor,
+    "125": _buffer_125,
+    "138": _decoder_138,
+    "245": _transceiver_245,
+    "283": _adder_283,
+    "540": _inverting_buffer_540,
+    "4245": _transceiver_4245,
+}
+
+
+def part_number(value: str) -> Optional[str]:
+    """The 74-series part number ('74HC86' -> '86'), or None."""
+    match = _PART_NUMBER.match(value)
+    return match.group(1) if match else None
+
+
+class Result:
+    def __init__(
+        self,
+        n: int,
+        values: Dict[str, np.ndarray],
+        undriven: Dict[str, np.ndarray],
+        contended: Dict[str, np.ndarray],
+    ):
+        self.n = n
+        self._values = values
+        self._undriven = undriven
+        self._contended = contended
+
+    def net(self, name: str) -> np.ndarray:
+        return unpack(self._values[name], self.n)
+
+    def bus(self, prefix: str) -> np.ndarray:
+        """The value of the nets <prefix>0, <prefix>1, ... as integers."""
+        value = np.zeros(self.n, dtype=np.int64)
+        for i, name in enumerate(_bus_nets(self._values, prefix)):
+            value |= self.net(name).astype(np.int64) << i
+        return value
+
+    def floating(self, name: str) -> np.ndarray:
+        """For each vector, whether the net (or any net of the bus) is undriven."""
+        names = [name] if name in self._values else _bus_nets(self._values, name)
+        result = np.zeros(self.n, dtype=bool)
+        for n in names:
+            result |= unpack(self._undriven[n], self.n)
+        return result
+
+    def contention(self) -> Dict[str, np.ndarray]:
+        """The vectors in which drivers of each net disagree."""
+        return {
+            name: unpack(words, self.n)
+            for name, words in self._contended.items()
+            if words.any()
+        }
+
+
+def _bus_nets(nets: Mapping[str, object], prefix: str) -> List[str]:
+    pattern = re.compile(re.escape(prefix) + r"(\d+)$")
+    found = {}
+    for name in nets:
+        match = pattern.match(name)
+        if match:
+            found[int(match.group(1))] = name
+    if not found:
+        raise KeyError(prefix)
+    return [found[i] for i in sorted(found)]
+
+
+class Circuit:
+    def __init__(self, netlist: Netlist):
+        self.netlist = netlist
+        self.elements: List[Element] = []
+        # Parts which may matter to the logic, but have no model
+        self.unsupported: List[str] = []
+        # Nets held high or low through resistors, by net
+        self.pulls: Dict[str, int] = dict()
+
+        for component in netlist.components.values():
+            number = part_number(component.value)
+            if number in MODELS:
+                self.elements += MODELS[number](component)
+            elif number is not None:
+                self.unsupported.append(component.reference)
+            elif component.lib_id == "Device:R" and len(component.pins) == 2:
+                a, b = component.pins.values()
+                if a in POWER_LEVELS and b not in POWER_LEVELS:
+                    self.pulls[b] = POWER_LEVELS[a]
+                elif b in POWER_LEVELS and a not in POWER_LEVELS:
+                    self.pulls[a] = POWER_LEVELS[b]
+        self.elements = self._ordered(self.elements)
+
+    @classmethod
+    def from_schematic(cls, path: str) -> "Circuit":
+        return cls(load_netlist(path))
+
+    @staticmethod
+    def _ordered(elements: List[Element]) -> List[Element]:
+        """Order the elements so that (loops aside) each comes after
+        the elements driving its inputs."""
+        drivers = collections.defaultdict(list)
+        for i, element in enumerate(elements):
+            for net in element.outputs:
+                drivers[net].append(i)
+        order: List[int] = []
+        state = [0] * len(elements)
+        for start in range(len(elements)):
+            stack = [(start, iter(elements[start].inputs))]
+            if state[start]:
+                continue
+            state[start] = 1
+            while stack:
+                i, inputs = stack[-1]
+                for net in inputs:
+                    j = next((j for j in drivers[net] if not state[j]), None)
+                    if j is not None:
+                        state[j] = 1
+                        stack.append((j, iter(elements[j].inputs)))
+                        break
+                else:
+                    stack.pop()
+                    order.append(i)
+        return [elements[i] for i in order]
+
+    def nets(self) -> List[str]:
+        return sorted(self.netlist.nets)
+
+    def _inputs(
+        self, inputs: Mapping[str, object]
+    ) -> Tuple[int, Dict[str, np.ndarray]]:
+        """The number of vectors, and the bits for each input net."""
+        bits: Dict[str, np.ndarray] = dict()
+        for name, value in inputs.items():
+            value = np.asarray(value, dtype=np.int64)
+            if name in self.netlist.nets:
+                bits[name] = value & 1
+            else:
+                for i, net in enumerate(_bus_nets(self.netlist.nets, name)):
+                    bits[net] = (value >> i) & 1
+        n = max([b.size for b in bits.values()] + [1])
+        for name, b in bits.items():
+            if b.size not in (1, n):
+                raise SimulationError(f"{name} has {b.size} values, not {n}")
+            bits[name] = np.broadcast_to(b.ravel(), (n,))
+        return n, bits
+
+    def run(self, inputs: Mapping[str, object]) -> Result:
+        """Evaluate the circuit with the given nets (or buses) driven."""
+        n, bits = self._inputs(inputs)
+        n_words = -(-n // WORD_BITS)
+        zeros = np.zeros(n_words, dtype=WORD)
+        ones = ~zeros
+
+        # The external drive of each net, and that from each element
+        external: Dict[str, Drive] = {
+            name: (ones if level else zeros, None)
+            for name, level in POWER_LEVELS.items()
+        }
+        for name, b in bits.items():
+            external[name] = (pack(b), None)
+        contributions: Dict[str, Dict[int, Drive]] = collections.defaultdict(dict)
+
+        values: Dict[str, np.ndarray] = {net: zeros for net in self.netlist.nets}
+        undriven: Dict[str, np.ndarray] = {net: ones for net in self.netlist.nets}
+        contended: Dict[str, np.ndarray] = dict()
+
+        def resolve(net: str) -> bool:
+            drives = list(contributions[net].values())
+            if net in external:
+                drives.append(external[net])
+            value, driven, conflict = zeros, zeros, zeros
+            for v, enable in drives:
+                enable = ones if enable is None else enable
+                conflict = conflict | (driven & enable & (value ^ v))
+                value = value | (v & enable)
+                driven = driven | enable
+            if net in self.pulls:
+                value = value | (~driven if self.pulls[net] else zeros)
+                floating = zeros
+            else:
+                floating = ~driven
+            contended[net] = conflict
+            changed = not np.array_equal(value, values.get(net, zeros))
+            values[net] = value
+            undriven[net] = floating
+            return changed
+
+        for net in set(external) | set(self.pulls):
+            resolve(net)
+
+        for _ in range(MAX_PASSES):
+            changed = False
+            for i, element in enumerate(self.elements):
+                drives = element.evaluate(
+                    *[values.get(net, zeros) for net in element.inputs]
+                )
+                for net, drive in zip(element.outputs, drives):
+                    contributions[net][i] = drive
+                    changed |= resolve(net)
+            if not changed:
+                break
+        else:
+            raise SimulationError("The circuit did not settle (is there a loop?)")
+        return Result(n, values, undriven, contended)
+
+
+def plug(
+    carrier: Netlist, board: Netlist, name: str, sockets: Mapping[str, str]
+) -> Netlist:
+    """The netlist of a board plugged into the carrier.
+
+    sockets maps each connector of the board to the carrier's socket
+    it plugs into, and their pads join the nets on the same pads of
+    the sockets. The board's other nets, and its components, are
+    renamed under name/, and the power nets are shared."""
+    # Board net to carrier net, where they meet at the connectors
+    joined: Dict[str, str] = {n: n for n in POWER_LEVELS}
+    for plug_ref, socket in sockets.items():
+        socket_pins = carrier.components[socket].pins
+        for pad, net in board.components[plug_ref].pins.items():
+            if pad in socket_pins:
+                joined.setdefault(net, socket_pins[pad])
+
+    def rename(net: str) -> str:
+        return joined.get(net, f"{name}/{net.lstrip('/')}")
+
+    components = dict(carrier.components)
+    nets: Dict[str, List[Tuple[str, str]]] = {
+        k: list(v) for k, v in carrier.nets.items()
+    }
+    for reference, c in board.components.items():
+        if reference in sockets:
+            continue
+        new_ref = f"{name}/{reference}"
+        pins = {pad: rename(net) for pad, net in c.pins.items()}
+        components[new_ref] = Component(new_ref, c.value, c.lib_id, pins, c.pin_names)
+        for pad, net in pins.items():
+            nets.setdefault(net, []).append((new_ref, pad))
+    return Netlist(components, nets)
+
+
+def schematic(board: str) -> str:
+    """The path of the top level schematic of a board."""
+    return os.path.join(PCBS_DIR, board, f"{board}.kicad_sch")
+
+
+def card(name: str) -> Netlist:
+    """A backplane card, with its boards plugged in."""
+    netlist = load_netlist(schematic(name))
+    boards: Dict[str, Netlist] = dict()
+    for socket, board, plug_ref in CARD_BOARDS.get(name, []):
+        if board not in boards:
+            boards[board] = load_netlist(schematic(board))
+        netlist = plug(netlist, boards[board], socket, {plug_ref: socket})
+    return netlist
+
+
+def alu_carrier() -> Netlist:
+    """The ALU carrier, with all its boards plugged in."""
+    return card("ALU Carrier")
+
+
+def machine() -> Netlist:
+    """The backplane, with all the cards plugged in."""
+    netlist = load_netlist(schematic("SlothPU Backplane"))
+    for slot, name in enumerate(CARDS):
+        sockets = {
+            "J1001": f"J{1001 + 2 * slot}",
+            "J1002": f"J{1002 + 2 * slot}",
+        }
+        netlist = plug(netlist, card(name), name, sockets)
+    return netlist
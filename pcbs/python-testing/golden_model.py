@@ -0,0 +1,105 @@
+"""Expected results of the ALU operations, over whole arrays at once.
+
+Each function takes array-likes of operands (which broadcast against
+each other), and returns an array of the values the hardware should
+produce.
+"""
+
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from constants import N_BITS
+
+# Wide enough for a carry out of the top bit
+DTYPE = np.uint32
+
+
+def _operands(A, B) -> Tuple[np.ndarray, np.ndarray]:
+    return np.asarray(A, dtype=DTYPE), np.asarray(B, dtype=DTYPE)
+
+
+def _mask(n_bits: int):
+    return DTYPE((1 << n_bits) - 1)
+
+
+def add(A, B, n_bits: int = N_BITS) -> np.ndarray:
+    A, B = _operands(A, B)
+    return (A + B) & _mask(n_bits)
+
+
+def sub(A, B, n_bits: int = N_BITS) -> np.ndarray:
+    A, B = _operands(A, B)
+    return (A - B) & _mask(n_bits)
+
+
+def compare(A, B, n_bits: int = N_BITS) -> np.ndarray:
+    A, B = _operands(A, B)
+    # Shift one bit left for each of A >= B and A > B
+    return DTYPE(1) << ((A >= B).astype(DTYPE) + (A > B))
+
+
+def nand(A, B, n_bits: int = N_BITS) -> np.ndarray:
+    A, B = _operands(A, B)
+    return ~(A & B) & _mask(n_bits)
+
+
+def xor(A, B, n_bits: int = N_BITS) -> np.ndarray:
+    A, B = _operands(A, B)
+    return A ^ B
+
+
+def barrel(A, B, n_bits: int = N_BITS) -> np.ndarray:
+    """Rotate A left by B places."""
+    A, B = _operands(A, B)
+    shift = B % DTYPE(n_bits)
+    return ((A << shift) | (A >> (DTYPE(n_bits) - shift))) & _mask(n_bits)
+
+
+def add_carry(A, B, carry_in=0, n_bits: int = N_BITS) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum and carry out of an adder with the given width."""
+    A, B = _operands(A, B)
+    total = A + B + np.asarray(carry_in, dtype=DTYPE)
+    return total & _mask(n_bits), (total >> DTYPE(n_bits)).astype(bool)
+
+
+def sub_carry(A, B, carry_in=1, n_bits: int = N_BITS) -> Tuple[np.ndarray, np.ndarray]:
+    """Difference and carry out, computing A + ~B + carry_in.
+
+    With the carry in set, the carry out is set when there is no borrow."""
+    A, B = _operands(A, B)
+    return add_carry(A, ~B & _mask(n_bits), carry_in, n_bits)
+
+
+OPERATIONS: Dict[str, Callable[..., np.ndarray]] = dict(
+    add=add, sub=sub, compare=compare, nand=nand, xor=xor, barrel=barrel
+)
+
+
+def evaluate(op: str, A, B, n_bits: int = N_BITS) -> np.ndarray:
+    return OPERATIONS[op](A, B, n_bits)
+
+
+def exhaustive(
+    op: str, n_bits: int = N_BITS, rows: int = 256
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Every A and B pair, a block of A values at a time.
+
+    Yields (A, B, C) where A has shape (rows, 1), B has shape
+    (1, 2**n_bits) and C has shape (rows, 2**n_bits)."""
+    B = np.arange(2 ** n_bits, dtype=DTYPE)[np.newaxis, :]
+    for start in range(0, 2 ** n_bits, rows):
+        stop = min(start + rows, 2 ** n_bits)
+        A = np.arange(start, stop, dtype=DTYPE)[:, np.newaxis]
+        yield A, B, evaluate(op, A, B, n_bits)
+
+
+def sample(
+    op: str, n: int, n_bits: int = N_BITS, rng: Optional[np.random.Generator] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Random operands and the corresponding results."""
+    if rng is None:
+        rng = np.random.default_rng()
+    A = rng.integers(0, 2 ** n_bits, size=n, dtype=DTYPE)
+    B = rng.integers(0, 2 ** n_bits, size=n, dtype=DTYPE)
+    return A, B, evaluate(op, A, B, n_bits)
@@ -0,0 +1,26 @@
+import importlib
+import os
+
+# Selects the module providing the RPi.GPIO interface
+BACKEND_ENV = "SLOTHPU_GPIO"
+
+BACKENDS = dict(
+    rpi="RPi.GPIO", sim="sim_gpio", gpiomem="gpiomem_gpio", gpiod="gpiod_gpio"
+)
+
+
+def backend_name() -> str:
+    return os.environ.get(BACKEND_ENV, "rpi")
+
+
+def load():
+    """Import the GPIO module chosen by the SLOTHPU_GPIO environment variable.
+
+    This is RPi.GPIO itself unless another backend is requested;
+    'sim' gives sim_gpio, which runs anywhere, 'gpiomem' gives
+    gpiomem_gpio, which writes the GPIO registers directly, and
+    'gpiod' gives gpiod_gpio, which uses the GPIO character device."""
+    name = backend_name()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown GPIO backend {name!r} in {BACKEND_ENV}")
+    return importlib.import_module(BACKENDS[name])
@@ -0,0 +1,306 @@
+"""Record the frames moved through the shift register chains, and replay them.
+
+When the SLOTHPU_TRACE environment variable names a file, every
+frame the tester board or the Pi backplane shifts out or in is
+appended to it, with the time. Sends skipped because the frame was
+already latched move nothing, and are not recorded. Each record is
+the same size, so a trace can be memory mapped as a numpy array
+(see Trace), even while it is still being written.
+
+With the simulated GPIO backend and SLOTHPU_REPLAY naming a trace,
+the test fixtures (see conftest.py) attach replay rigs in place of
+the board models. These feed the recorded inputs back to the
+harness, and stop it at the first frame it sends which differs from
+the recording, so a run on the rig can be reproduced, and the point
+where it went wrong found, without the hardware:
+
+    SLOTHPU_TRACE=run.trace python -m pytest test_alu_carrier.py
+    SLOTHPU_GPIO=sim SLOTHPU_REPLAY=run.trace python -m pytest test_alu_carrier.py
+
+Runs which depend on timing (polling until a deadline, say) may
+take a different path when replayed. A trace is summarised with
+    python gpio_trace.py run.trace
+"""
+
+import argparse
+import atexit
+import os
+import struct
+import time
+
+from typing import List, Optional
+
+import bitarray
+import bitarray.util
+import numpy as np
+
+import sim_gpio
+
+TRACE_ENV = "SLOTHPU_TRACE"
+REPLAY_ENV = "SLOTHPU_REPLAY"
+
+MAGIC = b"SLTRACE1"
+# Magic, record size, and the time (ns since the epoch) the file was created
+HEADER = struct.Struct("<8sQQ")
+# Time (ns since the epoch), source, kind, bits clocked, and the
+# harness's pin image (zero padded)
+RECORD = struct.Struct("<QBBH12s")
+RECORD_DTYPE = np.dtype(
+    [
+        ("time", "<u8"),
+        ("source", "u1"),
+        ("kind", "u1"),
+        ("n_bits", "<u2"),
+        ("frame", "u1", (12,)),
+    ]
+)
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+# Sources
+TESTER = 0
+BACKPLANE = 1
+SOURCE_NAMES = {TESTER: "tester", BACKPLANE: "backplane"}
+N_PINS = {TESTER: 40, BACKPLANE: 80}
+# Bit order of the harness's pin images (see tester_board.py and
+# pi_backplane.py)
+ENDIAN = {TESTER: "little", BACKPLANE: "big"}
+
+# Kinds
+SEND = 0
+RECV = 1
+KIND_NAMES = {SEND: "send", RECV: "recv"}
+
+
+class TraceError(Exception):
+    pass
+
+
+class ReplayError(Exception):
+    pass
+
+
+class Recorder:
+    def __init__(self, path: str):
+        """Append records to the trace at path, creating it if needed."""
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            _read_header(path)
+        self._file = open(path, "ab")
+        if not exists:
+            self._file.write(HEADER.pack(MAGIC, RECORD.size, time.time_ns()))
+        self.n_records = 0
+        atexit.register(self.close)
+
+    @classmethod
+    def from_environment(cls) -> Optional["Recorder"]:
+        """A recorder for the file named by SLOTHPU_TRACE, if any."""
+        path = os.environ.get(TRACE_ENV)
+        return cls(path) if path else None
+
+    def record(self, source: int, kind: int, frame: bitarray.bitarray, n_bits: int):
+        """Record a frame moved through the chains."""
+        self._file.write(
+            RECORD.pack(time.time_ns(), source, kind, n_bits, frame.tobytes())
+        )
+        self.n_records += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def _read_header(path: str) -> int:
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise TraceError(f"{path} is too short to be a trace")
+    magic, record_size, created = HEADER.unpack(header)
+    if magic != MAGIC or record_size != RECORD.size:
+        raise TraceError(f"{path} is not a trace in this format")
+    return created
+
+
+class Trace:
+    def __init__(self, path: str):
+        """The records of the trace at path, memory mapped.
+
+        A partly written record at the end is left out."""
+        self.path = path
+        self.created = _read_header(path)
+        n = (os.path.getsize(path) - HEADER.size) // RECORD.size
+        if n > 0:
+            self.records = np.memmap(path, RECORD_DTYPE, "r", HEADER.size, (n,))
+        else:
+            self.records = np.zeros(0, RECORD_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def select(self, source: int, kind: int) -> np.ndarray:
+        """Indices of the records from source of the given kind."""
+        records = self.records
+        return np.flatnonzero((records["source"] == source) & (records["kind"] == kind))
+
+    def frame(self, index: int) -> bitarray.bitarray:
+        """The pin image recorded, in the harness's bit order."""
+        source = int(self.records["source"][index])
+        result = bitarray.bitarray(endian=ENDIAN[source])
+        result.frombytes(self.records["frame"][index].tobytes())
+        return result[: N_PINS[source]]
+
+    def seconds(self, index: int) -> float:
+        """Time of the record, from the first."""
+        return (int(self.records["time"][index]) - int(self.records["time"][0])) * 1e-9
+
+    def describe(self, index: int) -> str:
+        record = self.records[index]
+        source = int(record["source"])
+        return (
+            f"{index:8d} {self.seconds(index):12.6f} s"
+            f" {SOURCE_NAMES[source]:9s} {KIND_NAMES[int(record['kind'])]}"
+            f" {int(record['n_bits']):3d} bits  {self.frame(index).tobytes().hex()}"
+        )
+
+    def summary(self) -> List[str]:
+        lines = []
+        for source, name in SOURCE_NAMES.items():
+            for kind, kind_name in KIND_NAMES.items():
+                selected = self.select(source, kind)
+                if len(selected) == 0:
+                    continue
+                bits = int(self.records["n_bits"][selected].sum())
+                lines.append(
+                    f"{name:9s} {kind_name:4s} {len(selected):9d} frames"
+                    f" {bits:11d} bits"
+                )
+        if len(self) > 0:
+            lines.append(
+                f"{len(self)} records over {self.seconds(len(self) - 1):.3f} s"
+            )
+        return lines
+
+
+class _Replay:
+    def __init__(self, trace: Trace, source: int):
+        """Step through the frames recorded from one source."""
+        self.trace = trace
+        self.source = source
+        self._sends = trace.select(source, SEND)
+        self._recvs = trace.select(source, RECV)
+        self.n_sends = 0
+        self.n_recvs = 0
+
+    def recv(self) -> bitarray.bitarray:
+        """The next frame received."""
+        if self.n_recvs >= len(self._recvs):
+            raise ReplayError(
+                f"Receive {self.n_recvs} from the {SOURCE_NAMES[self.source]}"
+                " is past the end of the trace"
+            )
+        index = self._recvs[self.n_recvs]
+        self.n_recvs += 1
+        return self.trace.frame(index)
+
+    def send(self, frame: bitarray.bitarray):
+        """Check the next frame sent against the recording."""
+        name = SOURCE_NAMES[self.source]
+        if self.n_sends >= len(self._sends):
+            raise ReplayError(f"Send {self.n_sends} to the {name} is past the end")
+        index = self._sends[self.n_sends]
+        recorded = self.trace.frame(index)
+        if frame != recorded:
+            raise ReplayError(
+                f"Send {self.n_sends} to the {name} differs from record {index}"
+                f" ({self.trace.seconds(index):.6f} s in): sent"
+                f" {frame.tobytes().hex()}, recorded {recorded.tobytes().hex()}"
+            )
+        self.n_sends += 1
+
+
+class _Replaying:
+    """Replay a trace through one of the rigs in sim_gpio.
+
+    Subclasses give the source, the bit order of the image the
+    harness sends (sent()), and that of the one it receives
+    (sample())."""
+
+    source: int
+
+    def __init__(self, trace: Trace):
+        super().__init__()
+        self.replay = _Replay(trace, self.source)
+        self._frame = bitarray.util.zeros(N_PINS[self.source], endian="big")
+        # Shift clocks since the last latch
+        self._n_shifted = 0
+
+    def edge(self, pin: int, level: int):
+        # The inputs are loaded at both ends of the pulse, and the
+        # line may already be low at the start, so move on at the end
+        if pin == self._load_in and level == sim_gpio.HIGH:
+            self._frame = self.replay.recv()
+        elif pin == self._clk_out and level == sim_gpio.HIGH:
+            self._n_shifted += 1
+        super().edge(pin, level)
+        # Setting up the select line latches too, but sends nothing
+        if pin == self._select_out and level == sim_gpio.HIGH and self._n_shifted:
+            self._n_shifted = 0
+            self.replay.send(self.sent())
+
+    def update(self):
+        pass
+
+
+class TesterReplayRig(_Replaying, sim_gpio.TesterRig):
+    """The tester board, with the connector board replaced by a trace."""
+
+    source = TESTER
+
+    def sent(self) -> bitarray.bitarray:
+        return bitarray.bitarray(self.shift_out.latched, endian="little")
+
+    def sample(self) -> List[int]:
+        # The highest pin is the first out
+        return [self._frame[i] for i in reversed(range(self.N_PINS))]
+
+
+class BackplaneReplayRig(_Replaying, sim_gpio.BackplaneRig):
+    """The Pi backplane, with the cards replaced by a trace."""
+
+    source = BACKPLANE
+
+    def sent(self) -> bitarray.bitarray:
+        # The first bit sent ends in the last stage
+        return bitarray.bitarray(self.shift_out.latched[::-1], endian="big")
+
+    def sample(self) -> List[int]:
+        return self._frame.tolist()
+
+
+# The recorder the harness uses, if recording
+RECORDER = Recorder.from_environment()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace", help="trace file to summarise")
+    parser.add_argument(
+        "--records",
+        metavar="START:STOP",
+        help="list the records in the given range (as a Python slice)",
+    )
+    args = parser.parse_args()
+
+    trace = Trace(args.trace)
+    print("\n".join(trace.summary()))
+    if args.records:
+        start, stop = [int(s) if s else None for s in args.records.split(":")]
+        for index in range(len(trace))[start:stop]:
+            print(trace.describe(index))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Stand in for RPi.GPIO using the GPIO character device (libgpiod v2).
+
+All the lines set up are held in a single line request, so setting
+several of them with one output() call is a single set_values()
+request to the kernel. Since a request cannot be extended, it is
+remade (keeping the output levels) the first time a line is used
+after setup() has added to it; the harness does all its setting up
+in the constructors, so this only happens while they run.
+
+The chip is given by the SLOTHPU_GPIOCHIP environment variable (by
+default /dev/gpiochip0). Another module with the gpiod interface
+(such as fake_gpiod) can be used with open_chip(). Only BOARD pin
+numbering is supported.
+"""
+
+import os
+
+from typing import Dict, List, Optional
+
+from gpiomem_gpio import BOARD_TO_BCM
+
+CHIP_ENV = "SLOTHPU_GPIOCHIP"
+DEFAULT_CHIP = "/dev/gpiochip0"
+CONSUMER = "slothpu-testing"
+
+BOARD = 10
+BCM = 11
+
+OUT = 0
+IN = 1
+
+LOW = 0
+HIGH = 1
+
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+
+_mode = None
+_gpiod = None
+_chip_path: Optional[str] = None
+_request = None
+# Direction and (for outputs) level of each line, by BCM number
+_directions: Dict[int, int] = dict()
+_levels: Dict[int, int] = dict()
+
+
+def open_chip(path: Optional[str] = None, gpiod_module=None):
+    """Use the given chip, through the given gpiod module.
+
+    This is done automatically by the first setup(), using the real
+    gpiod module and SLOTHPU_GPIOCHIP."""
+    global _gpiod, _chip_path
+    _release()
+    if gpiod_module is None:
+        import gpiod
+
+        gpiod_module = gpiod
+    if path is None:
+        path = os.environ.get(CHIP_ENV, DEFAULT_CHIP)
+    _gpiod = gpiod_module
+    _chip_path = path
+
+
+def _release():
+    global _request
+    if _request is not None:
+        _request.release()
+    _request = None
+
+
+def _get_request():
+    """The request for every line set up, making it if needs be."""
+    global _request
+    if _request is None:
+        line = _gpiod.line
+        config = dict()
+        for offset, direction in _directions.items():
+            if direction == OUT:
+                value = line.Value.ACTIVE if _levels[offset] else line.Value.INACTIVE
+                settings = _gpiod.LineSettings(
+                    direction=line.Direction.OUTPUT, output_value=value
+                )
+            else:
+                settings = _gpiod.LineSettings(direction=line.Direction.INPUT)
+            config[offset] = settings
+        _request = _gpiod.request_lines(_chip_path, consumer=CONSUMER, config=config)
+    return _request
+
+
+def setwarnings(flag: bool):
+    pass
+
+
+def setmode(mode: int):
+    global _mode
+    if mode != BOARD:
+        raise ValueError("Only BOARD pin numbering is supported")
+    _mode = mode
+
+
+def getmode() -> Optional[int]:
+    return _mode
+
+
+def _channels(channel) -> List[int]:
+    if isinstance(channel, (list, tuple)):
+        return list(channel)
+    return [channel]
+
+
+def _offset(channel: int) -> int:
+    if channel not in BOARD_TO_BCM:
+        raise ValueError(f"The channel sent is invalid on a Raspberry Pi: {channel}")
+    return BOARD_TO_BCM[channel]
+
+
+def setup(channel, direction: int, pull_up_down: int = PUD_OFF, initial=None):
+    if _mode is None:
+        raise RuntimeError("Please set pin numbering mode using GPIO.setmode")
+    if pull_up_down != PUD_OFF:
+        raise ValueError("Pull up/down resistors are not supported")
+    if _gpiod is None:
+        open_chip()
+
+    for ch in _channels(channel):
+        offset = _offset(ch)
+        if _directions.get(offset) != direction:
+            _directions[offset] = direction
+            if direction == OUT:
+                _levels[offset] = LOW
+            else:
+                _levels.pop(offset, None)
+            _release()
+        if direction == OUT and initial is not None:
+            output(ch, initial)
+
+
+def output(channel, value):
+    channels = _channels(channel)
+    if isinstance(value, (list, tuple)):
+        values = value
+        assert len(values) == len(channels)
+    else:
+        values = [value for _ in channels]
+
+    Value = _gpiod.line.Value
+    changes = dict()
+    for ch, v in zip(channels, values):
+        offset = _offset(ch)
+        if _directions.get(offset) != OUT:
+            raise RuntimeError(f"Channel {ch} has not been set up as an OUTPUT")
+        level = HIGH if v else LOW
+        _levels[offset] = level
+        changes[offset] = Value.ACTIVE if level else Value.INACTIVE
+    _get_request().set_values(changes)
+
+
+def input(channel: int) -> int:
+    offset = _offset(channel)
+    if _directions.get(offset) is None:
+        raise RuntimeError(f"You must setup() channel {channel} first")
+    value = _get_request().get_value(offset)
+    return HIGH if value == _gpiod.line.Value.ACTIVE else LOW
+
+
+def cleanup(channel=None):
+    """Release the given channels (or all of them)."""
+    global _mode
+    channels = _channels(channel) if channel is not None else None
+    if channels is None:
+        _directions.clear()
+        _levels.clear()
+        _mode = None
+    else:
+        for ch in channels:
+            offset = _offset(ch)
+            _directions.pop(offset, None)
+            _levels.pop(offset, None)
+    _release()
@@ -0,0 +1,226 @@
+"""Stand in for RPi.GPIO which drives the GPIO registers directly.
+
+/dev/gpiomem maps the BCM283x GPIO register block into user space,
+so a level change is a single store to the GPSET0 or GPCLR0 register,
+with no pin number translation or checking on the way. Masks for
+each combination of channels and values passed to output() are
+worked out once, so that (for example) setting the data line and
+lowering the clock together costs at most one store to each register.
+
+The register block is opened on first use, from the path given by
+the SLOTHPU_GPIOMEM environment variable (by default /dev/gpiomem).
+Any file of at least BLOCK_SIZE bytes will do, which is how this is
+tested without a Pi. Only BOARD pin numbering is supported, and the
+pull up/down resistors are not configured.
+"""
+
+import mmap
+import os
+
+from typing import Dict, List, Optional, Tuple
+
+DEVICE_ENV = "SLOTHPU_GPIOMEM"
+DEFAULT_DEVICE = "/dev/gpiomem"
+
+BOARD = 10
+BCM = 11
+
+OUT = 0
+IN = 1
+
+LOW = 0
+HIGH = 1
+
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+
+BLOCK_SIZE = 4096
+
+# Register offsets (in 32-bit words) within the block
+GPFSEL0 = 0x00 // 4
+GPSET0 = 0x1C // 4
+GPCLR0 = 0x28 // 4
+GPLEV0 = 0x34 // 4
+
+FSEL_BITS = 3
+FSEL_PER_REGISTER = 10
+FSEL_INPUT = 0b000
+FSEL_OUTPUT = 0b001
+
+# BCM GPIO number for each pin on the 40 pin header
+BOARD_TO_BCM = {
+    3: 2,
+    5: 3,
+    7: 4,
+    8: 14,
+    10: 15,
+    11: 17,
+    12: 18,
+    13: 27,
+    15: 22,
+    16: 23,
+    18: 24,
+    19: 10,
+    21: 9,
+    22: 25,
+    23: 11,
+    24: 8,
+    26: 7,
+    27: 0,
+    28: 1,
+    29: 5,
+    31: 6,
+    32: 12,
+    33: 13,
+    35: 19,
+    36: 16,
+    37: 26,
+    38: 20,
+    40: 21,
+}
+
+_mode = None
+_map: Optional[mmap.mmap] = None
+_regs: Optional[memoryview] = None
+_directions: Dict[int, int] = dict()
+# Mask of the lines set up as outputs
+_out_mask = 0
+# (set mask, clear mask) for each (channel, value) given to output()
+_masks: Dict[tuple, Tuple[int, int]] = dict()
+
+
+def open_device(path: Optional[str] = None):
+    """Map the GPIO registers from the given file.
+
+    This is done automatically by setup(), from SLOTHPU_GPIOMEM."""
+    global _map, _regs
+    close_device()
+    if path is None:
+        path = os.environ.get(DEVICE_ENV, DEFAULT_DEVICE)
+    fd = os.open(path, os.O_RDWR | os.O_SYNC)
+    try:
+        _map = mmap.mmap(fd, BLOCK_SIZE)
+    finally:
+        os.close(fd)
+    _regs = memoryview(_map).cast("I")
+
+
+def close_device():
+    global _map, _regs
+    if _regs is not None:
+        _regs.release()
+        _map.close()
+    _map = None
+    _regs = None
+
+
+def setwarnings(flag: bool):
+    pass
+
+
+def setmode(mode: int):
+    global _mode
+    if mode != BOARD:
+        raise ValueError("Only BOARD pin numbering is supported")
+    _mode = mode
+
+
+def getmode() -> Optional[int]:
+    return _mode
+
+
+def _channels(channel) -> List[int]:
+    if isinstance(channel, (list, tuple)):
+        return list(channel)
+    return [channel]
+
+
+def _bit(channel: int) -> int:
+    if channel not in BOARD_TO_BCM:
+        raise ValueError(f"The channel sent is invalid on a Raspberry Pi: {channel}")
+    return 1 << BOARD_TO_BCM[channel]
+
+
+def setup(channel, direction: int, pull_up_down: int = PUD_OFF, initial=None):
+    global _out_mask
+    if _mode is None:
+        raise RuntimeError("Please set pin numbering mode using GPIO.setmode")
+    if pull_up_down != PUD_OFF:
+        raise ValueError("Pull up/down resistors are not supported")
+    if _regs is None:
+        open_device()
+
+    for ch in _channels(channel):
+        bit = _bit(ch)
+        bcm = BOARD_TO_BCM[ch]
+        reg = GPFSEL0 + bcm // FSEL_PER_REGISTER
+        shift = FSEL_BITS * (bcm % FSEL_PER_REGISTER)
+        fsel = FSEL_OUTPUT if direction == OUT else FSEL_INPUT
+        if direction == OUT and initial is not None:
+            # Set the level before driving the line
+            _regs[GPSET0 if initial else GPCLR0] = bit
+        _regs[reg] = (_regs[reg] & ~(0b111 << shift)) | (fsel << shift)
+
+        _directions[ch] = direction
+        if direction == OUT:
+            _out_mask |= bit
+        else:
+            _out_mask &= ~bit
+    _masks.clear()
+
+
+def _compile(channel, value) -> Tuple[int, int]:
+    channels = _channels(channel)
+    if isinstance(value, (list, tuple)):
+        values = value
+        assert len(values) == len(channels)
+    else:
+        values = [value for _ in channels]
+
+    set_mask = 0
+    clear_mask = 0
+    for ch, v in zip(channels, values):
+        bit = _bit(ch)
+        if not bit & _out_mask:
+            raise RuntimeError(f"Channel {ch} has not been set up as an OUTPUT")
+        if v:
+            set_mask |= bit
+        else:
+            clear_mask |= bit
+    return set_mask, clear_mask
+
+
+def output(channel, value):
+    if isinstance(value, list):
+        value = tuple(value)
+    key = (channel if not isinstance(channel, list) else tuple(channel), value)
+    masks = _masks.get(key)
+    if masks is None:
+        masks = _compile(channel, value)
+        _masks[key] = masks
+
+    set_mask, clear_mask = masks
+    if set_mask:
+        _regs[GPSET0] = set_mask
+    if clear_mask:
+        _regs[GPCLR0] = clear_mask
+
+
+def input(channel: int) -> int:
+    if _directions.get(channel) is None:
+        raise RuntimeError(f"You must setup() channel {channel} first")
+    return HIGH if _regs[GPLEV0] & _bit(channel) else LOW
+
+
+def cleanup(channel=None):
+    """Return the given channels (or all) to inputs."""
+    global _mode
+    channels = _channels(channel) if channel is not None else list(_directions)
+    for ch in channels:
+        if ch in _directions:
+            setup(ch, IN)
+            del _directions[ch]
+    if channel is None:
+        _mode = None
+        close_device()
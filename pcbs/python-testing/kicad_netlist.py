@@ -0,0 +1,483 @@
+"""Extract netlists from the KiCad schematics of the boards.
+
+Only the .kicad_sch files are needed: each carries the symbols it
+uses (in its lib_symbols section), so no libraries are looked up.
+Connectivity follows eeschema's rules, as far as the boards use them:
+
+* wires join at their ends, and where an end (or a label or
+  junction) lies on another wire
+* labels with the same name join within a sheet instance, power
+  symbols join everywhere by their value
+* sheet pins join hierarchical labels of the same name in the
+  sheet, and vector names such as A[0..15] join member by member,
+  over bus wires, bus labels and sheet pins, and to the labels
+  named after the members of the bus label (or sheet pin)
+
+Each net is named after a label on it (with the sheet path for nets
+inside sheets), or after a pin if it has none. Run
+    python kicad_netlist.py "../ALU Carrier/ALU Carrier.kicad_sch"
+to print the netlist of a board.
+"""
+
+import argparse
+import collections
+import math
+import os
+import re
+
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Coordinates are rounded to this (in mm) to find coinciding points
+RESOLUTION = 1e-3
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+_VECTOR = re.compile(r"^(.*)\[(\d+)\.\.(\d+)\]$")
+
+
+class NetlistError(Exception):
+    pass
+
+
+class Expr(list):
+    """A parsed s-expression: the head symbol, then the arguments."""
+
+    @property
+    def head(self) -> str:
+        return self[0]
+
+    def all(self, head: str) -> Iterator["Expr"]:
+        for item in self[1:]:
+            if isinstance(item, Expr) and item.head == head:
+                yield item
+
+    def get(self, head: str) -> Optional["Expr"]:
+        return next(self.all(head), None)
+
+    def property(self, name: str) -> Optional[str]:
+        for p in self.all("property"):
+            if p[1] == name:
+                return p[2]
+        return None
+
+
+def parse(text: str) -> Expr:
+    stack: List[Expr] = []
+    result = None
+    for match in _TOKEN.finditer(text):
+        open_, close, string, atom = match.groups()
+        if open_:
+            stack.append(Expr())
+        elif close:
+            expr = stack.pop()
+            if stack:
+                stack[-1].append(expr)
+            else:
+                result = expr
+        elif string is not None:
+            stack[-1].append(re.sub(r"\\(.)", r"\1", string))
+        elif atom is not None and stack:
+            stack[-1].append(atom)
+    if result is None or stack:
+        raise NetlistError("Unbalanced s-expression")
+    return result
+
+
+def vector_members(name: str) -> Optional[List[str]]:
+    """The member names of a vector bus name (A[0..3] -> A0..A3), or None."""
+    match = _VECTOR.match(name)
+    if match is None:
+        return None
+    prefix, first, last = match.group(1), int(match.group(2)), int(match.group(3))
+    step = 1 if last >= first else -1
+    return [f"{prefix}{i}" for i in range(first, last + step, step)]
+
+
+class LibPin(NamedTuple):
+    number: str
+    name: str
+    electrical: str
+    x: float
+    y: float
+    unit: int
+    # Body style (De Morgan alternates), where 0 is common to all
+    style: int
+
+
+class LibSymbol(NamedTuple):
+    name: str
+    power: bool
+    pins: List[LibPin]
+
+
+def _lib_symbols(root: Expr) -> Dict[str, LibSymbol]:
+    symbols = dict()
+    lib = root.get("lib_symbols")
+    for sym in lib.all("symbol") if lib is not None else []:
+        name = sym[1]
+        pins = []
+        for unit in sym.all("symbol"):
+            # Named <symbol>_<unit>_<style>, where unit 0 is common to all
+            unit_no, style = [int(n) for n in unit[1].rsplit("_", 2)[1:]]
+            for pin in unit.all("pin"):
+                at = pin.get("at")
+                pins.append(
+                    LibPin(
+                        pin.get("number")[1],
+                        pin.get("name")[1],
+                        pin[1],
+                        float(at[1]),
+                        float(at[2]),
+                        unit_no,
+                        style,
+                    )
+                )
+        # Power flags are marked as power symbols too, but only those
+        # with power inputs name a net
+        power = sym.get("power") is not None and all(
+            p.electrical == "power_in" for p in pins
+        )
+        symbols[name] = LibSymbol(name, power, pins)
+    return symbols
+
+
+def _transform(
+    x: float, y: float, at: Expr, mirror: Optional[str]
+) -> Tuple[float, float]:
+    """Place a point of a library symbol (y upwards) on the sheet (y down)."""
+    angle = math.radians(float(at[3]) if len(at) > 3 else 0.0)
+    y = -y
+    c, s = round(math.cos(angle)), round(math.sin(angle))
+    x, y = x * c + y * s, -x * s + y * c
+    if mirror == "x":
+        y = -y
+    elif mirror == "y":
+        x = -x
+    return float(at[1]) + x, float(at[2]) + y
+
+
+def _key(x: float, y: float) -> Tuple[int, int]:
+    return round(x / RESOLUTION), round(y / RESOLUTION)
+
+
+def _on_segment(p: Tuple[int, int], a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+    if (p[0] - a[0]) * (b[1] - a[1]) != (p[1] - a[1]) * (b[0] - a[0]):
+        return False
+    return min(a[0], b[0]) <= p[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= p[
+        1
+    ] <= max(a[1], b[1])
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: Dict[tuple, tuple] = dict()
+
+    def find(self, x: tuple) -> tuple:
+        self.parent.setdefault(x, x)
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a: tuple, b: tuple):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+class Component(NamedTuple):
+    reference: str
+    value: str
+    lib_id: str
+    # Net of each pin, by pin number
+    pins: Dict[str, str]
+    # Pin names, by pin number
+    pin_names: Dict[str, str]
+
+    def net(self, pin_name: str) -> str:
+        """The net of the (uniquely named) pin."""
+        numbers = [n for n, name in self.pin_names.items() if name == pin_name]
+        if len(numbers) != 1:
+            raise NetlistError(f"{self.reference} has no single pin {pin_name}")
+        return self.pins[numbers[0]]
+
+
+class Netlist(NamedTuple):
+    components: Dict[str, Component]
+    # (reference, pin number) pairs, by net name
+    nets: Dict[str, List[Tuple[str, str]]]
+
+    def parts(self, value_prefix: str = "") -> List[Component]:
+        return [
+            c
+            for c in self.components.values()
+            if c.value.startswith(value_prefix) or c.lib_id.startswith(value_prefix)
+        ]
+
+
+class _Sheet(NamedTuple):
+    path: str
+    # Sheet names down from the root, for naming the local nets
+    name: str
+    root: Expr
+
+
+class _Extractor:
+    def __init__(self):
+        self.uf = _UnionFind()
+        # Names which could be given to each set of joined nodes,
+        # with a priority (lower is better)
+        self.names: List[Tuple[tuple, int, str]] = []
+        # (reference, value, lib_id, pin number, pin name, node)
+        self.pins: List[Tuple[str, str, str, str, str, tuple]] = []
+        # Bus nodes with vector names, and their number of members
+        self._vectors: List[Tuple[tuple, int]] = []
+        # Of those, the bus labels, and the sheet pins (with the names
+        # of their members)
+        self._labelled: List[tuple] = []
+        self._pin_members: List[Tuple[tuple, str, List[str]]] = []
+
+    def load(self, path: str, sheet_path: str = "", name: str = "", depth: int = 0):
+        if depth > 16:
+            raise NetlistError("Sheets nested too deeply")
+        with open(path) as f:
+            root = parse(f.read())
+        if not sheet_path:
+            sheet_path = "/" + root.get("uuid")[1]
+        sheet = _Sheet(sheet_path, name, root)
+        self._sheet(sheet)
+
+        for child in root.all("sheet"):
+            child_file = child.property("Sheetfile")
+            child_name = child.property("Sheetname")
+            child_path = f"{sheet_path}/{child.get('uuid')[1]}"
+            self.load(
+                os.path.join(os.path.dirname(path), child_file),
+                child_path,
+                f"{name}/{child_name}",
+                depth + 1,
+            )
+
+    def _point(self, sheet: _Sheet, x: float, y: float, bus: bool = False) -> tuple:
+        return ("bus" if bus else "pt", sheet.path) + _key(x, y)
+
+    def _label(self, sheet: _Sheet, name: str) -> tuple:
+        return ("label", sheet.path, name)
+
+    def _sheet(self, sheet: _Sheet):
+        root = sheet.root
+        uf = self.uf
+        symbols = _lib_symbols(root)
+
+        # Wires and buses, and everything which can join one part way
+        segments = dict(pt=[], bus=[])
+        for kind, head in [("pt", "wire"), ("bus", "bus")]:
+            for wire in root.all(head):
+                a, b = [(float(p[1]), float(p[2])) for p in wire.get("pts").all("xy")]
+                na, nb = self._point(sheet, *a, kind == "bus"), self._point(
+                    sheet, *b, kind == "bus"
+                )
+                uf.union(na, nb)
+                segments[kind].append((na, _key(*a), _key(*b)))
+        taps: List[tuple] = [n for n, _, _ in segments["pt"]]
+        bus_taps: List[tuple] = [n for n, _, _ in segments["bus"]]
+
+        for junction in root.all("junction"):
+            at = junction.get("at")
+            taps.append(self._point(sheet, float(at[1]), float(at[2])))
+
+        for label in root.all("label"):
+            at = label.get("at")
+            self._attach_label(
+                sheet, label[1], float(at[1]), float(at[2]), taps, bus_taps
+            )
+
+        for label in root.all("hierarchical_label"):
+            at = label.get("at")
+            name = label[1]
+            members = vector_members(name)
+            node = self._attach_label(
+                sheet, name, float(at[1]), float(at[2]), taps, bus_taps
+            )
+            # Joined to the sheet pin of the same name in the parent
+            if members is None:
+                uf.union(node, ("sheetpin", sheet.path, name))
+            else:
+                for i, member in enumerate(members):
+                    uf.union(
+                        self._label(sheet, member), ("sheetpin", sheet.path, name, i)
+                    )
+
+        for child in root.all("sheet"):
+            self._sheet_pins(sheet, child, taps, bus_taps)
+
+        # Wire ends, labels, junctions and sheet pins on the middle of a wire
+        for kind, points in [("pt", taps), ("bus", bus_taps)]:
+            by_key = collections.defaultdict(list)
+            for node in points:
+                by_key[node[2:]].append(node)
+            for node, a, b in segments[kind]:
+                for key, nodes in by_key.items():
+                    if _on_segment(key, a, b):
+                        for n in nodes:
+                            uf.union(node, n)
+
+        for sym in root.all("symbol"):
+            self._symbol(sheet, sym, symbols)
+
+    def _attach_label(
+        self,
+        sheet: _Sheet,
+        name: str,
+        x: float,
+        y: float,
+        taps: List[tuple],
+        bus_taps: List[tuple],
+    ) -> tuple:
+        members = vector_members(name)
+        if members is None:
+            node = self._point(sheet, x, y)
+            self.uf.union(node, self._label(sheet, name))
+            taps.append(node)
+            self.names.append((node, 0, f"{sheet.name}/{name}" if sheet.name else name))
+            return node
+
+        node = self._point(sheet, x, y, bus=True)
+        bus_taps.append(node)
+        for i, member in enumerate(members):
+            self.uf.union(("member", node, i), self._label(sheet, member))
+            self.names.append(
+                (
+                    self._label(sheet, member),
+                    0,
+                    f"{sheet.name}/{member}" if sheet.name else member,
+                )
+            )
+        self._vectors.append((node, len(members)))
+        self._labelled.append(node)
+        return node
+
+    def _sheet_pins(
+        self, sheet: _Sheet, child: Expr, taps: List[tuple], bus_taps: List[tuple]
+    ):
+        child_path = f"{sheet.path}/{child.get('uuid')[1]}"
+        for pin in child.all("pin"):
+            name = pin[1]
+            at = pin.get("at")
+            members = vector_members(name)
+            if members is None:
+                node = self._point(sheet, float(at[1]), float(at[2]))
+                self.uf.union(node, ("sheetpin", child_path, name))
+                taps.append(node)
+            else:
+                node = self._point(sheet, float(at[1]), float(at[2]), bus=True)
+                for i in range(len(members)):
+                    self.uf.union(
+                        ("member", node, i), ("sheetpin", child_path, name, i)
+                    )
+                self._vectors.append((node, len(members)))
+                self._pin_members.append((node, sheet.path, members))
+                bus_taps.append(node)
+
+    def _symbol(self, sheet: _Sheet, sym: Expr, symbols: Dict[str, LibSymbol]):
+        lib_id = sym.get("lib_id")[1]
+        lib = symbols.get(sym.get("lib_name")[1] if sym.get("lib_name") else lib_id)
+        if lib is None:
+            raise NetlistError(f"No symbol {lib_id} in {sheet.name or '/'}")
+        at = sym.get("at")
+        mirror = sym.get("mirror")
+        mirror = mirror[1] if mirror is not None else None
+        unit = int(sym.get("unit")[1]) if sym.get("unit") is not None else 1
+        style_expr = sym.get("body_style") or sym.get("convert")
+        style = int(style_expr[1]) if style_expr is not None else 1
+        value = sym.property("Value") or ""
+
+        reference = sym.property("Reference") or "?"
+        instances = sym.get("instances")
+        if instances is not None:
+            for project in instances.all("project"):
+                for p in project.all("path"):
+                    if p[1] == sheet.path:
+                        reference = p.get("reference")[1]
+                        unit = int(p.get("unit")[1]) if p.get("unit") else unit
+
+        for pin in lib.pins:
+            if pin.unit not in (0, unit) or pin.style not in (0, style):
+                continue
+            x, y = _transform(pin.x, pin.y, at, mirror)
+            node = self._point(sheet, x, y)
+            if lib.power:
+                # Power symbols name a global net
+                self.uf.union(node, ("power", value))
+                self.names.append((node, -1, value))
+                continue
+            self.pins.append((reference, value, lib_id, pin.number, pin.name, node))
+
+    def extract(self, path: str) -> Netlist:
+        self.load(path)
+
+        # Vector items on the same bus join member by member
+        uf = self.uf
+        first_member: Dict[tuple, tuple] = dict()
+        for node, n in self._vectors:
+            root = uf.find(node)
+            if root in first_member:
+                other = first_member[root]
+                for i in range(n):
+                    uf.union(("member", other, i), ("member", node, i))
+            else:
+                first_member[root] = node
+
+        # A bus with no label is named by its sheet pins, and so joins
+        # the labels named after their members
+        labelled = {uf.find(node) for node in self._labelled}
+        for node, sheet_path, members in self._pin_members:
+            if uf.find(node) not in labelled:
+                for i, member in enumerate(members):
+                    uf.union(("member", node, i), ("label", sheet_path, member))
+
+        best: Dict[tuple, Tuple[int, str]] = dict()
+        for node, priority, name in self.names:
+            root = uf.find(node)
+            current = best.get(root)
+            if current is None or (priority, len(name), name) < (
+                current[0],
+                len(current[1]),
+                current[1],
+            ):
+                best[root] = (priority, name)
+
+        components: Dict[str, Component] = dict()
+        nets: Dict[str, List[Tuple[str, str]]] = collections.defaultdict(list)
+        for reference, value, lib_id, number, pin_name, node in sorted(self.pins):
+            root = uf.find(node)
+            if root not in best:
+                best[root] = (1, f"Net-({reference}-Pad{number})")
+            net = best[root][1]
+            component = components.setdefault(
+                reference, Component(reference, value, lib_id, dict(), dict())
+            )
+            component.pins[number] = net
+            component.pin_names[number] = pin_name
+            nets[net].append((reference, number))
+        return Netlist(components, dict(nets))
+
+
+def load_netlist(path: str) -> Netlist:
+    """The netlist of the schematic (and the sheets within it)."""
+    return _Extractor().extract(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("schematic", help="top level .kicad_sch file")
+    args = parser.parse_args()
+
+    netlist = load_netlist(args.schematic)
+    for name, pins in sorted(netlist.nets.items()):
+        print(f"{name}: {' '.join(f'{r}.{p}' for r, p in pins)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""Measure where the time goes in the harness, as a pytest plugin.
+
+With --latency (or --save-latency/--compare-latency), the transfers
+made by the tester board (TesterBoard.send, recv and
+enable_outputs) and the Pi backplane (_Output.send, _Input.recv and
+pi_backplane.transact), and the sleeps made by settle.ENGINE
+(SettleEngine.hold), are timed call by call. The times go into
+fixed bucket histograms, with about 1.6% resolution from a
+nanosecond up to 18 minutes, so recording a call costs a couple of
+timer reads and a list increment. With --latency-lines, the lines
+written and read through the GPIO module are counted too (transfers
+through spi_transport.SPITransport are not seen). That adds to every
+GPIO call, so slows the transfers it is counting, and is best done
+in a run of its own.
+
+At the end of the session, each test module's time is split into
+transfers, sleeping and the rest (Python overhead and the tests
+themselves), followed by the latency distribution of each call:
+
+    python -m pytest --latency test_alu_carrier.py
+    python -m pytest --save-latency before.json
+    python -m pytest --compare-latency before.json
+
+The JSON file holds the histograms themselves, so any percentile
+can be worked out from it later.
+"""
+
+import collections
+import functools
+import importlib
+import json
+import os
+import sys
+import time
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import gpio_backend
+
+# Values below 2**SUB_BITS ns have a bucket each; above that, each
+# power of two is split into 2**(SUB_BITS - 1) buckets
+SUB_BITS = 7
+LINEAR = 1 << SUB_BITS
+HALF = LINEAR >> 1
+# Longer times all go into the last bucket
+MAX_BITS = 40
+N_BUCKETS = (MAX_BITS - SUB_BITS + 2) * HALF
+
+# The calls timed, as (module, class, method), with no class for
+# functions at module level
+TRANSFERS = [
+    ("tester_board", "TesterBoard", "send"),
+    ("tester_board", "TesterBoard", "recv"),
+    ("tester_board", "TesterBoard", "enable_outputs"),
+    ("pi_backplane", "_Output", "send"),
+    ("pi_backplane", "_Input", "recv"),
+    ("pi_backplane", None, "transact"),
+]
+SLEEPS = [("settle", "SettleEngine", "hold")]
+
+
+def call_name(module: str, cls: Optional[str], method: str) -> str:
+    """The name a call is reported under."""
+    return f"{module if cls is None else cls}.{method}"
+
+
+def bucket(ns: int) -> int:
+    """The index of the bucket holding a time of ns nanoseconds."""
+    if ns < LINEAR:
+        return ns
+    shift = ns.bit_length() - SUB_BITS
+    return min(shift * HALF + (ns >> shift), N_BUCKETS - 1)
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """The lowest and highest times (in ns) held by a bucket."""
+    if index < LINEAR:
+        return index, index
+    shift = index // HALF - 1
+    top = index - shift * HALF
+    return top << shift, ((top + 1) << shift) - 1
+
+
+class Histogram:
+    def __init__(self):
+        """The distribution of the latency of one kind of call."""
+        self.counts = [0] * N_BUCKETS
+        self.n_calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        # GPIO lines written or read during the calls
+        self.n_edges = 0
+
+    def record(self, ns: int, n_edges: int = 0):
+        self.counts[bucket(ns)] += 1
+        self.n_calls += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.n_edges += n_edges
+
+    def merge(self, other: "Histogram"):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.n_calls += other.n_calls
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        self.n_edges += other.n_edges
+
+    def mean(self) -> float:
+        """Mean latency, in ns."""
+        return self.total_ns / self.n_calls if self.n_calls else 0.0
+
+    def percentile(self, percent: float) -> int:
+        """Latency (in ns) which the given percentage of calls took at most.
+
+        This is the top of the bucket it falls in, so may be a
+        little over the true value."""
+        if self.n_calls == 0:
+            return 0
+        wanted = percent / 100 * self.n_calls
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= wanted:
+                return min(bucket_bounds(i)[1], self.max_ns)
+        return self.max_ns
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            n_calls=self.n_calls,
+            total_ns=self.total_ns,
+            max_ns=self.max_ns,
+            n_edges=self.n_edges,
+            # Lowest time in each bucket used, with its count
+            buckets=[
+                [bucket_bounds(i)[0], count]
+                for i, count in enumerate(self.counts)
+                if count
+            ],
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Histogram":
+        result = cls()
+        for low, count in data["buckets"]:
+            result.counts[bucket(low)] += count
+        result.n_calls = data["n_calls"]
+        result.total_ns = data["total_ns"]
+        result.max_ns = data["max_ns"]
+        result.n_edges = data["n_edges"]
+        return result
+
+
+class Profiler:
+    def __init__(self):
+        """Histograms of the calls made, by test module and call."""
+        self.histograms: Dict[str, Dict[str, Histogram]] = collections.defaultdict(
+            lambda: collections.defaultdict(Histogram)
+        )
+        # Time spent in each test module, in seconds
+        self.module_times: Dict[str, float] = collections.defaultdict(float)
+        # GPIO lines written and read so far, in total and by module
+        self._edges = [0, 0]
+        self.module_edges: Dict[str, List[int]] = collections.defaultdict(
+            lambda: [0, 0]
+        )
+        self.module = ""
+        self._current = self.histograms[self.module]
+        self._module_start = list(self._edges)
+        # (owner, attribute, original) of everything replaced
+        self._installed: List[tuple] = []
+        self.counting = False
+
+    def start_module(self, module: str):
+        """Attribute the calls from now on to the given test module."""
+        if module == self.module:
+            return
+        self._end_module()
+        self.module = module
+        self._current = self.histograms[module]
+
+    def _end_module(self):
+        edges = self.module_edges[self.module]
+        for i in range(len(edges)):
+            edges[i] += self._edges[i] - self._module_start[i]
+        self._module_start = list(self._edges)
+
+    def timed(self, name: str, function: Callable) -> Callable:
+        """Wrap function, to record each call's latency under name."""
+        edges = self._edges
+        clock = time.perf_counter_ns
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            n_edges = edges[0] + edges[1]
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                self._current[name].record(elapsed, edges[0] + edges[1] - n_edges)
+
+        return wrapper
+
+    def _replace(self, owner, attribute: str, replacement):
+        self._installed.append((owner, attribute, getattr(owner, attribute)))
+        setattr(owner, attribute, replacement)
+
+    def install(self, count_lines: bool = False):
+        """Time the transfers and sleeps, and count the GPIO lines if asked."""
+        for module, cls, method in TRANSFERS + SLEEPS:
+            owner = importlib.import_module(module)
+            name = call_name(module, cls, method)
+            if cls is not None:
+                owner = getattr(owner, cls)
+                self._replace(owner, method, self.timed(name, getattr(owner, method)))
+                continue
+            # Functions may also have been imported by name (as the
+            # tests do with transact), so replace those too
+            function = getattr(owner, method)
+            timed = self.timed(name, function)
+            for loaded in list(sys.modules.values()):
+                if vars(loaded).get(method) is function:
+                    self._replace(loaded, method, timed)
+
+        if count_lines:
+            # Every harness module shares the one backend module
+            self.count_gpio(gpio_backend.load())
+
+    def count_gpio(self, gpio):
+        """Count the lines written and read through the given GPIO module."""
+        self.counting = True
+        edges = self._edges
+        output = gpio.output
+        input = gpio.input
+
+        def counted_output(channel, value, *args, **kwargs):
+            edges[0] += len(channel) if isinstance(channel, (list, tuple)) else 1
+            return output(channel, value, *args, **kwargs)
+
+        def counted_input(channel):
+            edges[1] += 1
+            return input(channel)
+
+        self._replace(gpio, "output", counted_output)
+        self._replace(gpio, "input", counted_input)
+
+    def uninstall(self):
+        while self._installed:
+            owner, attribute, original = self._installed.pop()
+            setattr(owner, attribute, original)
+
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        """How each module's time splits between transfers, sleeps and the rest."""
+        self._end_module()
+        transfers = [call_name(*call) for call in TRANSFERS]
+        sleeps = [call_name(*call) for call in SLEEPS]
+        result = dict()
+        for module, elapsed in sorted(self.module_times.items()):
+            histograms = self.histograms.get(module, dict())
+            moving = sum(histograms[n].total_ns for n in transfers if n in histograms)
+            sleeping = sum(histograms[n].total_ns for n in sleeps if n in histograms)
+            edges = self.module_edges.get(module, [0, 0])
+            result[module] = dict(
+                total=elapsed,
+                transfers=1e-9 * moving,
+                sleeping=1e-9 * sleeping,
+                other=elapsed - 1e-9 * (moving + sleeping),
+                lines_written=edges[0],
+                lines_read=edges[1],
+            )
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = dict()
+        for module, split in self.breakdown().items():
+            result[module] = dict(
+                split,
+                calls={
+                    name: h.to_dict()
+                    for name, h in sorted(self.histograms[module].items())
+                },
+            )
+        return result
+
+    def summary(self, before: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Lines reporting the breakdown and latencies, by module.
+
+        Given the to_dict() of an earlier run, the mean latencies
+        are compared with it."""
+        if before is None:
+            before = dict()
+        lines = []
+        for module, split in self.breakdown().items():
+            total = split["total"]
+            line = f"{module:32s} {total:9.2f} s:" + "".join(
+                f" {split[k]:8.2f} s {k}" for k in ["transfers", "sleeping", "other"]
+            )
+            if self.counting:
+                line += (
+                    f"  ({split['lines_written']} lines written,"
+                    f" {split['lines_read']} read)"
+                )
+            lines.append(line)
+            earlier = before.get(module, dict()).get("calls", dict())
+            for name, h in sorted(self.histograms[module].items()):
+                line = (
+                    f"    {name:28s} {h.n_calls:9d} calls"
+                    f" {1e-3 * h.mean():10.2f} us mean"
+                    f" {1e-3 * h.percentile(50):10.2f} p50"
+                    f" {1e-3 * h.percentile(99):10.2f} p99"
+                    f" {1e-3 * h.max_ns:10.2f} max"
+                )
+                if self.counting:
+                    line += f" {h.n_edges / h.n_calls:7.1f} lines/call"
+                if name in earlier and h.n_calls:
+                    mean = Histogram.from_dict(earlier[name]).mean()
+                    line += f"  (before {1e-3 * mean:10.2f} us, {mean / h.mean():6.2f}x)"
+                lines.append(line)
+        return lines
+
+
+# The profiler in use, if any
+PROFILER: Optional[Profiler] = None
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("latency")
+    group.addoption(
+        "--latency",
+        action="store_true",
+        help="Time the board transfers, and report where each module's time goes",
+    )
+    group.addoption(
+        "--latency-lines",
+        action="store_true",
+        help="Also count the GPIO lines written and read (implies --latency)",
+    )
+    group.addoption(
+        "--save-latency",
+        metavar="PATH",
+        help="Write the latency histograms to a JSON file (implies --latency)",
+    )
+    group.addoption(
+        "--compare-latency",
+        metavar="PATH",
+        help="Compare the mean latencies with a saved JSON file (implies --latency)",
+    )
+
+
+def pytest_configure(config):
+    global PROFILER
+    options = ["latency", "latency_lines", "save_latency", "compare_latency"]
+    if any(config.getoption(o) for o in options):
+        PROFILER = Profiler()
+        PROFILER.install(count_lines=config.getoption("latency_lines"))
+
+
+def pytest_unconfigure(config):
+    global PROFILER
+    if PROFILER is not None:
+        PROFILER.uninstall()
+        PROFILER = None
+
+
+def _module_name(nodeid: str) -> str:
+    return os.path.basename(nodeid.split("::")[0])
+
+
+def pytest_runtest_logstart(nodeid, location):
+    if PROFILER is not None:
+        PROFILER.start_module(_module_name(nodeid))
+
+
+def pytest_runtest_logreport(report):
+    if PROFILER is not None:
+        PROFILER.module_times[_module_name(report.nodeid)] += report.duration
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if PROFILER is None:
+        return
+
+    before = None
+    compare_path = config.getoption("compare_latency")
+    if compare_path:
+        with open(compare_path) as f:
+            before = json.load(f)
+
+    terminalreporter.section("harness latency")
+    for line in PROFILER.summary(before):
+        terminalreporter.write_line(line)
+
+    save_path = config.getoption("save_latency")
+    if save_path:
+        with open(save_path, "w") as f:
+            json.dump(PROFILER.to_dict(), f, indent=2)
@@ -0,0 +1,120 @@
+"""Run a program on the backplane and the emulator side by side.
+
+The backplane is driven by a MemoryServer, and after each stage of
+the compute cycle the buses are compared with those the emulator
+gives for the same stage. The expected values cost no I/O; the
+only extra work on the link is one snapshot of the inputs per
+stage. At the first difference, LockstepDivergence is raised with
+a dump of the emulator state and the last few stages.
+"""
+
+import collections
+
+from typing import Deque, List, Optional, Tuple
+
+from emulator import BusState, SlothPU16
+from memory_server import MemoryServer, RunStats
+from pi_backplane import _Input, _Output
+
+# How many stages are kept for the dump
+N_HISTORY = 10
+
+STAGE_NAMES = ["IFETCH", "ISTORE", "EXECUTE", "COMMIT", "PCUPDATE"]
+
+
+class LockstepDivergence(Exception):
+    def __init__(
+        self,
+        message: str,
+        expected: Optional[BusState],
+        actual: Optional[BusState],
+    ):
+        super().__init__(message)
+        self.expected = expected
+        self.actual = actual
+
+
+def _format_buses(state: BusState) -> str:
+    stage = STAGE_NAMES[state.cycle] if 0 <= state.cycle < len(STAGE_NAMES) else "-"
+    return (
+        f"{stage:8s} A={state.A:#06x} B={state.B:#06x}"
+        f" C={state.C:#06x} Instruction={state.Instruction:#06x}"
+    )
+
+
+class Lockstep:
+    def __init__(
+        self,
+        output: _Output,
+        input: _Input,
+        image: bytes = b"",
+        address: int = 0,
+        n_history: int = N_HISTORY,
+    ):
+        self.emulator = SlothPU16(image, address)
+        self.server = MemoryServer(output, input, image, address, self._check)
+        # (expected, actual) for the most recent stages
+        self.history: Deque[Tuple[BusState, BusState]] = collections.deque(
+            maxlen=n_history
+        )
+
+    def _check(self, stage: int):
+        expected = self.emulator.step_stage()
+        assert expected.cycle == stage
+
+        snapshot = self.server.input.snapshot()
+        actual = BusState(
+            snapshot.Cycle, snapshot.A, snapshot.B, snapshot.C, snapshot.Instruction
+        )
+        self.history.append((expected, actual))
+        if actual != expected:
+            raise LockstepDivergence(self.dump(), expected, actual)
+
+    def dump(self) -> str:
+        """Describe the emulator state and recent buses."""
+        emu = self.emulator
+        lines: List[str] = [
+            f"After {emu.n_instructions} instructions ({emu.n_cycles} cycles):",
+            f"  PC={emu.pc:#06x} IR={emu.ir:#06x} halted={emu.halted}",
+            "  " + " ".join(f"r{i}={v:#06x}" for i, v in enumerate(emu.registers[:8])),
+            "  "
+            + " ".join(
+                f"r{i}={v:#06x}" for i, v in enumerate(emu.registers[8:], start=8)
+            ),
+            "Recent stages (expected / actual):",
+        ]
+        for expected, actual in self.history:
+            marker = "  " if expected == actual else "!!"
+            lines.append(f"{marker} {_format_buses(expected)}")
+            lines.append(f"{marker} {_format_buses(actual)}")
+        return "\n".join(lines)
+
+    def run(self, max_instructions: Optional[int] = None) -> RunStats:
+        """Reset the machine, and run until halt (or the limit).
+
+        The registers are cleared first, to match the emulator, and
+        the memory images are compared at the end."""
+        self.server.reset()
+        on_stage = self.server.on_stage
+        self.server.on_stage = None
+        try:
+            self.server.clear_registers()
+        finally:
+            self.server.on_stage = on_stage
+        stats = self.server.run(max_instructions)
+        if self.server.memory != self.emulator.memory:
+            address = next(
+                i
+                for i, (a, b) in enumerate(
+                    zip(self.server.memory, self.emulator.memory)
+                )
+                if a != b
+            )
+            # No stages have been checked if nothing was run
+            expected, actual = self.history[-1] if self.history else (None, None)
+            raise LockstepDivergence(
+                f"Memory differs first at {address:#06x}\n" + self.dump(),
+                expected,
+                actual,
+            )
+        return stats
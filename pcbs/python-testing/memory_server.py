@@ -0,0 +1,264 @@
+"""Run programs on the backplane, with the Pi acting as memory.
+
+The Pi steps the compute cycle bus, and serves the 64 KiB of RAM
+from a Python image:
+
+* Instruction Fetch: the PC is read from A bus, and the word there
+  is placed on B bus, where the instruction register picks it up on
+  entering Instruction Store.
+* Decode/Execute to PC Update: for loadb and loadw, the address is
+  read from A bus and the value placed on C bus.
+* Commit: for storeb and storew, the address and value are read from
+  A and B buses and written to the image.
+
+Everything else is done by the cards. Only the buses needed are
+read (see _Input.read()), and each stage is a single send apart
+from those serving memory. Stages last at least the stage time
+(see timing.py) given by the settle calibration, if any. Run a
+program with
+    python memory_server.py program.bin
+"""
+
+import argparse
+import time
+
+from typing import Callable, NamedTuple, Optional
+
+from assembler import encode
+from emulator import (
+    COMMIT,
+    EXECUTE,
+    HALT,
+    IFETCH,
+    ISTORE,
+    LOADB,
+    LOADW,
+    MEMORY_SIZE,
+    N_REGISTERS,
+    PCUPDATE,
+    STOREB,
+    STOREW,
+)
+from pi_backplane import _Input, _Output
+from settle import ENGINE, pulse_reset
+
+# How often (in instructions) progress is reported by run()
+PROGRESS_INTERVAL = 1000
+
+
+class MemoryServerError(Exception):
+    pass
+
+
+class RunStats(NamedTuple):
+    # Cycles count each stage of the compute cycle, as for the emulator
+    n_instructions: int
+    n_cycles: int
+    elapsed: float
+
+    @property
+    def cycles_per_second(self) -> float:
+        return self.n_cycles / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class MemoryServer:
+    def __init__(
+        self,
+        output: _Output,
+        input: _Input,
+        image: bytes = b"",
+        address: int = 0,
+        on_stage: Optional[Callable[[int], None]] = None,
+        stage_time: Optional[float] = None,
+    ):
+        """Act as the memory of the machine plugged into the backplane.
+
+        If given, on_stage is called with the stage number once the
+        Pi has finished driving the buses for each stage. Each stage
+        lasts at least stage_time seconds, by default the calibrated
+        "Backplane.Stage" minimum."""
+        self.output = output
+        self.input = input
+        self.on_stage = on_stage
+        if stage_time is None:
+            stage_time = ENGINE.minimum("Backplane", "Stage")
+        self.stage_time = stage_time
+        # When the last stage was entered
+        self._entered = 0.0
+        self.memory = bytearray(MEMORY_SIZE)
+        self.load(image, address)
+
+        # The instruction served on the last fetch
+        self.ir = 0
+        self.halted = False
+        self.n_instructions = 0
+        self.n_cycles = 0
+
+    def load(self, image: bytes, address: int = 0):
+        assert address >= 0 and address + len(image) <= MEMORY_SIZE
+        self.memory[address : address + len(image)] = image
+
+    def _read_word(self, address: int) -> int:
+        if address & 1:
+            raise MemoryServerError(f"Unaligned word address {address:#06x}")
+        return self.memory[address] | (self.memory[address + 1] << 8)
+
+    def reset(self):
+        """Take control of the backplane, and reset the machine.
+
+        The Pi drives the cycle and reset lines, and leaves the other
+        buses to the cards except when serving memory."""
+        output = self.output
+        for bus in ["A", "B", "C", "Instruction", "Clock"]:
+            output.set_oe(bus, True)
+        output.set_oe("Cycle", False)
+        output.set_oe("Reset", False)
+
+        # The PC drives the A bus during instruction fetch, so the
+        # reset can be watched for there
+        def read_pc() -> int:
+            return self.input.read("A")["A"]
+
+        output.set_cycle(IFETCH)
+        pulse_reset(output, "ProgramCounter", observe=read_pc)
+        output.set_cycle(-1)
+        output.send()
+        self.halted = False
+
+    def clear_registers(self):
+        """Set all the registers to zero, and reset the machine again.
+
+        The register file has no reset, so this gives a known state
+        to start from."""
+        for r in range(N_REGISTERS):
+            self.step(encode("set", 0, 0, r))
+        self.reset()
+
+    def _enter(self, stage: int):
+        # Far too short to sleep for, so spin
+        while time.perf_counter() - self._entered < self.stage_time:
+            pass
+        self.output.set_cycle(stage)
+        self.output.send()
+        self._entered = time.perf_counter()
+        self.n_cycles += 1
+
+    def _served(self, stage: int):
+        if self.on_stage is not None:
+            self.on_stage(stage)
+
+    def step(self, instruction: Optional[int] = None):
+        """Go through the compute cycle for one instruction.
+
+        If an instruction is given, it is served in place of the
+        one at the PC."""
+        output = self.output
+        input = self.input
+
+        # Serve the instruction at the PC
+        self._enter(IFETCH)
+        pc = input.read("A")["A"]
+        self.ir = self._read_word(pc) if instruction is None else instruction
+        output.set_bus("B", self.ir)
+        output.send()
+        output.set_oe("B", False)
+        self._served(IFETCH)
+        self._enter(ISTORE)
+        self._served(ISTORE)
+
+        # The register file drives B from here on
+        output.set_oe("B", True)
+        self._enter(EXECUTE)
+        op = self.ir & 0xF
+        if op == LOADB or op == LOADW:
+            address = input.read("A")["A"]
+            if op == LOADB:
+                output.set_bus("C", self.memory[address])
+            else:
+                output.set_bus("C", self._read_word(address))
+            output.send()
+            output.set_oe("C", False)
+        self._served(EXECUTE)
+
+        self._enter(COMMIT)
+        if op == STOREB or op == STOREW:
+            buses = input.read("A", "B")
+            address, value = buses["A"], buses["B"]
+            if op == STOREB:
+                self.memory[address] = value & 0xFF
+            else:
+                if address & 1:
+                    raise MemoryServerError(f"Unaligned word address {address:#06x}")
+                self.memory[address] = value & 0xFF
+                self.memory[address + 1] = value >> 8
+        self._served(COMMIT)
+
+        self._enter(PCUPDATE)
+        self._served(PCUPDATE)
+        if op == LOADB or op == LOADW:
+            output.set_oe("C", True)
+        self.n_instructions += 1
+        if op == HALT:
+            self.halted = True
+
+    def run(
+        self,
+        max_instructions: Optional[int] = None,
+        progress: Optional[Callable[[RunStats], None]] = None,
+    ) -> RunStats:
+        """Execute instructions until halt (or the limit is reached).
+
+        If given, progress is called every PROGRESS_INTERVAL
+        instructions with the statistics so far."""
+        start = time.perf_counter()
+        n_instructions = self.n_instructions
+        n_cycles = self.n_cycles
+
+        def stats() -> RunStats:
+            return RunStats(
+                self.n_instructions - n_instructions,
+                self.n_cycles - n_cycles,
+                time.perf_counter() - start,
+            )
+
+        n = 0
+        self.halted = False
+        while not self.halted and n != max_instructions:
+            self.step()
+            n += 1
+            if progress is not None and n % PROGRESS_INTERVAL == 0:
+                progress(stats())
+        return stats()
+
+
+def _report(stats: RunStats):
+    print(
+        f"{stats.n_instructions:10d} instructions"
+        f" {stats.n_cycles:10d} cycles"
+        f" {stats.elapsed:9.2f} s"
+        f" {stats.cycles_per_second:10.1f} cycles/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("image", help="binary image to load")
+    parser.add_argument("--address", type=lambda s: int(s, 0), default=0)
+    parser.add_argument("--max-instructions", type=int, default=None)
+    parser.add_argument(
+        "--progress", action="store_true", help="report the rate as it runs"
+    )
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image = f.read()
+    server = MemoryServer(_Output(), _Input(), image, args.address)
+    server.reset()
+    stats = server.run(args.max_instructions, _report if args.progress else None)
+    _report(stats)
+    if not server.halted:
+        print("Stopped before halt")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,53 @@
-from typing import List, Union
+import contextlib
+import time
+
+from typing import Dict, List, NamedTuple, Optional, Union
 
 import bitarray
 import bitarray.util
 
-import RPi.GPIO as GPIO
+import bus_vcd
+import gpio_backend
+import gpio_trace
+
+GPIO = gpio_backend.load()
 
 BUS_WIDTH = 16
 CYCLE_WIDTH = 5
+BITS_PER_BYTE = 8
+
+
+def _image(n_pins: int) -> bitarray.bitarray:
+    """Allocate a pin image, with pin 0 the top bit of byte 0.
+
+    Since the buses are byte aligned in the shift register banks,
+    this means they can be read and written a byte at a time
+    through a memoryview, without allocating anything."""
+    assert n_pins % BITS_PER_BYTE == 0
+    return bitarray.util.zeros(n_pins, endian="big")
 
 
 class _Output:
     def __init__(self):
         self.n_pins = 80
 
-        self._outputs = [False for _ in range(self.n_pins)]
+        self._outputs = _image(self.n_pins)
+        self._output_bytes = memoryview(self._outputs)
+
+        # What the 595s currently hold, so that unchanged frames
+        # need not be shifted out again
+        self._latched = _image(self.n_pins)
+        self._latched_valid = False
+        self.n_sends = 0
+        self.n_sends_skipped = 0
+
+        # Whether a send has been deferred by batch()
+        self._batch_depth = 0
+        self._pending = False
+
+        # Where the frames sent are recorded, if anywhere (see
+        # gpio_trace.py)
+        self.trace = gpio_trace.RECORDER
 
         # SPI bus clock (SRCLK)
         self._clk_out = 23
@@ -23,15 +57,14 @@ class _Output:
         self._select_out = 24
 
         self._enables = dict(A=8, B=3, C=5, Cycle=10, Instruction=7, Clock=11, Reset=12)
+        self._all_enables = tuple(self._enables.values())
 
         # Define where things are in the shift register bank
-        self._buses = dict(
-            A=[48 + i for i in range(BUS_WIDTH)],
-            B=[32 + i for i in range(BUS_WIDTH)],
-            C=[16 + i for i in range(BUS_WIDTH)],
-            Instruction=[0 + i for i in range(BUS_WIDTH)],
-        )
-        self._cycle = [64 + i for i in reversed(range(CYCLE_WIDTH))]
+        # Each bus is sent most significant bit first
+        self._bus_starts = dict(A=48, B=32, C=16, Instruction=0)
+        self._bus_bytes = {k: v // BITS_PER_BYTE for k, v in self._bus_starts.items()}
+        self._cycle_start = 64
+        self._cycle = [self._cycle_start + i for i in reversed(range(CYCLE_WIDTH))]
         self._clock = 77
         self._reset = 78
 
@@ -47,43 +80,86 @@ class _Output:
         GPIO.output(self._select_out, GPIO.HIGH)
 
         # Now the enables
-        for p in self._enables.values():
-            GPIO.setup(p, GPIO.OUT)
-            GPIO.output(p, GPIO.HIGH)
+        GPIO.setup(self._all_enables, GPIO.OUT)
+        GPIO.output(self._all_enables, GPIO.HIGH)
+
+    def clear(self):
+        """Return to the state just after construction.
+
+        The image is zeroed (but not sent), and all outputs are
+        disabled."""
+        self._outputs.setall(0)
+        self._batch_depth = 0
+        self._pending = False
+        GPIO.output(self._all_enables, GPIO.HIGH)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Defer sending until the end of the block.
+
+        If send() is called inside the block, the outputs are
+        latched (once) when the block exits. If the block raises,
+        nothing is sent."""
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._pending = False
+            raise
+        finally:
+            self._batch_depth -= 1
+        if self._batch_depth == 0 and self._pending:
+            self._pending = False
+            self.send()
 
     def send(self):
+        if self._batch_depth > 0:
+            self._pending = True
+            return
+
+        if self._latched_valid and self._outputs == self._latched:
+            self.n_sends_skipped += 1
+            return
+
         # Prepare to send
         GPIO.output(self._select_out, GPIO.LOW)
+        data_clock = (self._copi, self._clk_out)
         for op in self._outputs:
-            GPIO.output(self._copi, op)
-            GPIO.output(self._clk_out, GPIO.LOW)
+            # Present the data with the clock low, then clock it in
+            GPIO.output(data_clock, (op, GPIO.LOW))
             GPIO.output(self._clk_out, GPIO.HIGH)
         # Clock everything into output stages
         GPIO.output(self._select_out, GPIO.HIGH)
         # Idle clk_out low
         GPIO.output(self._clk_out, GPIO.LOW)
 
+        self._latched[:] = self._outputs
+        self._latched_valid = True
+        self.n_sends += 1
+        if self.trace is not None:
+            self.trace.record(
+                gpio_trace.BACKPLANE, gpio_trace.SEND, self._outputs, self.n_pins
+            )
+
     def set_oe(self, target: str, value: bool):
         GPIO.output(self._enables[target], value)
 
     def set_bus(self, target: str, value: Union[int, bitarray.bitarray]):
-        if isinstance(value, int):
-            assert value >= 0 and value < 2 ** BUS_WIDTH
-            send_values = bitarray.util.int2ba(value, length=BUS_WIDTH, endian="little")
-        else:
-            send_values = value
+        if not isinstance(value, int):
+            assert len(value) == BUS_WIDTH
+            value = bitarray.util.ba2int(value)
+        assert value >= 0 and value < 2 ** BUS_WIDTH
 
-        for i in range(BUS_WIDTH):
-            bus_idx = self._buses[target][i]
-            self._outputs[bus_idx] = send_values[BUS_WIDTH - i - 1]
+        idx = self._bus_bytes[target]
+        self._output_bytes[idx] = value >> BITS_PER_BYTE
+        self._output_bytes[idx + 1] = value & 0xFF
 
     def set_cycle(self, step: int):
         # Negative values mean 'turn all off'
         assert step < CYCLE_WIDTH
 
         # Ensure everything is off
-        for i in range(CYCLE_WIDTH):
-            self._outputs[self._cycle[i]] = False
+        self._outputs[self._cycle_start : self._cycle_start + CYCLE_WIDTH] = 0
 
         # Turn on desired step
         if step >= 0:
@@ -96,16 +172,54 @@ class _Output:
         self._outputs[self._reset] = value
 
 
+class BackplaneSnapshot(NamedTuple):
+    """Everything the Pi can see on the backplane, at one instant."""
+
+    A: int
+    B: int
+    C: int
+    Instruction: int
+    Cycle: int
+    Clock: bool
+    Reset: bool
+
+
 class _Input:
     def __init__(self):
         self.n_pins = 80
 
-        self._inputs = [False for _ in range(self.n_pins)]
+        self._inputs = _image(self.n_pins)
+        self._input_bytes = memoryview(self._inputs)
+        # Each bus arrives least significant byte first, with
+        # the top bit of each byte first
         self._bus_starts = dict(A=16, B=32, C=48, Instruction=64)
+        self._bus_bytes = {k: v // BITS_PER_BYTE for k, v in self._bus_starts.items()}
         self._cycle_start = 8
+        # Shift which brings the cycle bits to the bottom of their byte
+        self._cycle_shift = (
+            BITS_PER_BYTE - self._cycle_start % BITS_PER_BYTE - CYCLE_WIDTH
+        )
         self._clock = 6
         self._reset = 5
 
+        # How many bits must be clocked in to see each field
+        self._field_ends = {k: v + BUS_WIDTH for k, v in self._bus_starts.items()}
+        self._field_ends.update(
+            Cycle=self._cycle_start + CYCLE_WIDTH,
+            Clock=self._clock + 1,
+            Reset=self._reset + 1,
+        )
+        self.clocks_saved = 0
+        self.n_clocks_saved = 0
+        self.n_recvs = 0
+
+        # Where the frames received are recorded, if anywhere (see
+        # gpio_trace.py)
+        self.trace = gpio_trace.RECORDER
+        # Where the signals received are dumped, if anywhere (see
+        # bus_vcd.py)
+        self.vcd = bus_vcd.WRITER
+
         # Designate the pins
         self._clk_in = 40
         self._cipo = 35
@@ -121,39 +235,162 @@ class _Input:
         GPIO.setup(self._load_in, GPIO.OUT)
         GPIO.setup(self._cipo, GPIO.IN)
 
-    def recv(self):
+    def clear(self):
+        """Forget the last inputs received."""
+        self._inputs.setall(0)
+
+    def recv(self, n_bits: Optional[int] = None):
+        """Receive the inputs.
+
+        If n_bits is given, only the first n_bits of the chain are
+        clocked in, and the rest of the image keeps its old contents."""
+        if n_bits is None:
+            n_bits = self.n_pins
+        assert n_bits > 0 and n_bits <= self.n_pins
+        self.n_recvs += 1
+        self.clocks_saved = self.n_pins - n_bits
+        self.n_clocks_saved += self.clocks_saved
+
         # Load the data
         GPIO.output(self._load_in, GPIO.LOW)
         GPIO.output(self._load_in, GPIO.HIGH)
 
-        # Clock everything in
+        # Clock in as much as is needed
         GPIO.output(self._select_in, GPIO.LOW)
-        for i in range(self.n_pins):
+        for i in range(n_bits):
             self._inputs[i] = GPIO.input(self._cipo) == 1
             GPIO.output(self._clk_in, GPIO.LOW)
             GPIO.output(self._clk_in, GPIO.HIGH)
         GPIO.output(self._select_in, GPIO.HIGH)
+        if self.trace is not None:
+            self.trace.record(
+                gpio_trace.BACKPLANE, gpio_trace.RECV, self._inputs, n_bits
+            )
+        if self.vcd is not None:
+            self._dump(n_bits)
+
+    def _dump(self, n_bits: int):
+        """Add the fields within the first n_bits to the VCD."""
+        values = dict()
+        for name, end in self._field_ends.items():
+            if end > n_bits:
+                continue
+            if name in self._bus_bytes:
+                values[name] = self.read_bus(name)
+            elif name == "Cycle":
+                values[name] = self._cycle_bits()
+            elif name == "Clock":
+                values[name] = self.read_clock()
+            else:
+                values[name] = self.read_reset()
+        self.vcd.sample(values)
+
+    def read(self, *names: str) -> Dict[str, Union[bool, int]]:
+        """Receive just the given fields, and return them by name.
+
+        The names are those of the buses, or Cycle, Clock and Reset.
+        Only the chain up to the farthest of them is clocked in, and
+        the number of clock edges saved is left in clocks_saved."""
+        self.recv(max(self._field_ends[name] for name in names))
+
+        result = dict()
+        for name in names:
+            if name in self._bus_bytes:
+                result[name] = self.read_bus(name)
+            elif name == "Cycle":
+                result[name] = self.read_cycle()
+            elif name == "Clock":
+                result[name] = self.read_clock()
+            else:
+                result[name] = self.read_reset()
+        return result
+
+    def snapshot(self) -> BackplaneSnapshot:
+        """Receive the inputs once, and decode all of them."""
+        self.recv()
+        return BackplaneSnapshot(
+            A=self.read_bus("A"),
+            B=self.read_bus("B"),
+            C=self.read_bus("C"),
+            Instruction=self.read_bus("Instruction"),
+            Cycle=self.read_cycle(),
+            Clock=self.read_clock(),
+            Reset=self.read_reset(),
+        )
 
     def read_bus(self, bus: str) -> int:
-        idx = self._bus_starts[bus]
-        byte_0 = list(reversed(self._inputs[idx : idx + BUS_WIDTH // 2]))
-        byte_1 = list(reversed(self._inputs[idx + BUS_WIDTH // 2 : idx + BUS_WIDTH]))
-        ba = bitarray.bitarray(byte_0 + byte_1, endian="little")
-        return bitarray.util.ba2int(ba)
+        idx = self._bus_bytes[bus]
+        return self._input_bytes[idx] | (self._input_bytes[idx + 1] << BITS_PER_BYTE)
+
+    def _cycle_bits(self) -> int:
+        # Bit i is set for step i
+        vals = self._input_bytes[self._cycle_start // BITS_PER_BYTE]
+        return (vals >> self._cycle_shift) & ((1 << CYCLE_WIDTH) - 1)
 
     def read_cycle(self) -> int:
-        vals = list(
-            reversed(self._inputs[self._cycle_start : self._cycle_start + CYCLE_WIDTH])
-        )
-        step = -1
-        for i in range(CYCLE_WIDTH):
-            if vals[i]:
-                assert step < 0, "Two steps set!"
-                step = i
-        return step
+        vals = self._cycle_bits()
+        assert vals & (vals - 1) == 0, "Two steps set!"
+        return vals.bit_length() - 1
 
     def read_clock(self) -> bool:
-        return self._inputs[self._clock]
+        return self._inputs[self._clock] == 1
 
     def read_reset(self) -> bool:
-        return self._inputs[self._reset]
+        return self._inputs[self._reset] == 1
+
+
+def transact(output: _Output, input: _Input) -> float:
+    """Send the outputs and receive the inputs in a single pass.
+
+    Both chains are clocked in the same loop, so this takes about
+    as long as one of send() or recv(). Since the 74HC165s are
+    loaded at the start, the inputs captured are those present
+    *before* the new outputs are latched; each call therefore
+    returns the response to the previous one.
+
+    The outputs are latched straight away, even inside batch(), and
+    any send deferred by it is then no longer needed.
+
+    Returns the achieved bit rate (in bits per second, counting
+    both chains)."""
+    assert output.n_pins == input.n_pins
+
+    start = time.perf_counter()
+
+    # Load the input data; the whole chain is clocked in
+    input.n_recvs += 1
+    input.clocks_saved = 0
+    GPIO.output(input._load_in, GPIO.LOW)
+    GPIO.output(input._load_in, GPIO.HIGH)
+
+    GPIO.output((output._select_out, input._select_in), GPIO.LOW)
+    clocks = (output._clk_out, input._clk_in)
+    for i in range(output.n_pins):
+        input._inputs[i] = GPIO.input(input._cipo) == 1
+        GPIO.output(
+            (output._copi, output._clk_out, input._clk_in),
+            (output._outputs[i], GPIO.LOW, GPIO.LOW),
+        )
+        GPIO.output(clocks, GPIO.HIGH)
+    # Clock everything into output stages
+    GPIO.output((output._select_out, input._select_in), GPIO.HIGH)
+    # Idle clk_out low
+    GPIO.output(output._clk_out, GPIO.LOW)
+    output._latched[:] = output._outputs
+    output._latched_valid = True
+    # Anything deferred by batch() has now been latched
+    output._pending = False
+    output.n_sends += 1
+    if input.trace is not None:
+        input.trace.record(
+            gpio_trace.BACKPLANE, gpio_trace.RECV, input._inputs, input.n_pins
+        )
+    if input.vcd is not None:
+        input._dump(input.n_pins)
+    if output.trace is not None:
+        output.trace.record(
+            gpio_trace.BACKPLANE, gpio_trace.SEND, output._outputs, output.n_pins
+        )
+
+    elapsed = time.perf_counter() - start
+    return 2 * output.n_pins / elapsed
@@ -0,0 +1,175 @@
+"""Wait for the boards to settle, rather than sleeping for the worst case.
+
+Where the harness can see the effect of a change, the SettleEngine
+polls for it: the inputs are read until the value has been the same
+for several reads in a row (or a deadline passes). Where it cannot,
+the engine holds for the shortest time the board is known to need.
+
+These per-board minimums start from DEFAULT_MINIMUMS, and can be
+replaced by a calibration file (see calibrate_settle.py) named by
+the SLOTHPU_SETTLE_CALIBRATION environment variable. The time each
+poll took is recorded, keyed by board and signal.
+"""
+
+import collections
+import json
+import os
+import time
+
+from typing import Callable, Dict, List, Mapping, Optional, TypeVar
+
+CALIBRATION_ENV = "SLOTHPU_SETTLE_CALIBRATION"
+
+T = TypeVar("T")
+
+# Shortest times (in seconds) for which a board needs to be left,
+# keyed by "<board>.<signal>". These are the delays the tests used
+# to sleep for, except for the register with reset where the notes
+# give 0.1 s for a reset to be effective and to recover from it
+DEFAULT_MINIMUMS = {
+    "RWR.Reset": 0.1,
+    "RWR.ResetRecovery": 0.1,
+    "RegisterFile.Clock": 0.001,
+    "ProgramCounter.ResetCharge": 0.1,
+    "ProgramCounter.Reset": 0.1,
+    "ProgramCounter.ResetRecovery": 0.1,
+    "InstructionRegister.ResetCharge": 0.03,
+    "InstructionRegister.Reset": 0.03,
+    "InstructionRegister.ResetRecovery": 0.03,
+}
+
+N_STABLE = 3
+TIMEOUT_SECS = 1.0
+# Allowance over the slowest settle seen, when calibrating
+MARGIN = 1.5
+
+
+class SettleEngine:
+    def __init__(
+        self,
+        minimums: Optional[Mapping[str, float]] = None,
+        n_stable: int = N_STABLE,
+        timeout: float = TIMEOUT_SECS,
+    ):
+        self.minimums: Dict[str, float] = dict(DEFAULT_MINIMUMS)
+        if minimums is not None:
+            self.minimums.update(minimums)
+        self.n_stable = n_stable
+        self.timeout = timeout
+
+        # Observed settle times, in seconds
+        self.observed: Dict[str, List[float]] = collections.defaultdict(list)
+        self.n_timeouts: Dict[str, int] = collections.Counter()
+
+    @classmethod
+    def from_environment(cls) -> "SettleEngine":
+        """Create an engine, with the calibration file if there is one."""
+        path = os.environ.get(CALIBRATION_ENV)
+        if path:
+            with open(path) as f:
+                return cls(json.load(f))
+        return cls()
+
+    def minimum(self, board: str, signal: str) -> float:
+        return self.minimums.get(f"{board}.{signal}", 0.0)
+
+    def hold(self, board: str, signal: str):
+        """Wait for the minimum time needed by the given board and signal."""
+        delay = self.minimum(board, signal)
+        if delay > 0:
+            time.sleep(delay)
+
+    def poll(
+        self,
+        board: str,
+        signal: str,
+        read: Callable[[], T],
+        until: Optional[Callable[[T], bool]] = None,
+    ) -> T:
+        """Call read() until its result is stable, and return it.
+
+        Stable means the same value n_stable times in a row (and
+        satisfying until, if given). If the deadline passes first,
+        the last value is returned, and the timeout counted. The
+        time until the value last changed is recorded."""
+        key = f"{board}.{signal}"
+        start = time.perf_counter()
+        self.hold(board, signal)
+
+        value = read()
+        settled = time.perf_counter()
+        count = 1
+        deadline = start + self.timeout
+        while count < self.n_stable or (until is not None and not until(value)):
+            now = time.perf_counter()
+            if now > deadline:
+                self.n_timeouts[key] += 1
+                break
+            latest = read()
+            if latest == value:
+                count += 1
+            else:
+                value = latest
+                settled = now
+                count = 1
+
+        self.observed[key].append(settled - start)
+        return value
+
+    def calibration(self, margin: float = MARGIN) -> Dict[str, float]:
+        """The minimums, updated from the polls made so far.
+
+        Each polled signal gets the slowest settle time seen (with
+        some margin). Since every poll first holds for the current
+        minimum, this can only lower it if the engine was created
+        with smaller minimums, as calibrate_settle.py does."""
+        result = dict(self.minimums)
+        for key, times in self.observed.items():
+            if times and not self.n_timeouts[key]:
+                result[key] = margin * max(times)
+        return result
+
+    def save(self, path: str, minimums: Optional[Mapping[str, float]] = None):
+        if minimums is None:
+            minimums = self.calibration()
+        with open(path, "w") as f:
+            json.dump(dict(minimums), f, indent=2, sort_keys=True)
+
+    def summary(self) -> List[str]:
+        lines = []
+        for key, times in sorted(self.observed.items()):
+            lines.append(
+                f"{key:36s} {len(times):7d} polls"
+                f" {1e3 * sum(times) / len(times):9.3f} ms mean"
+                f" {1e3 * max(times):9.3f} ms max"
+                f" {self.n_timeouts[key]:5d} timeouts"
+            )
+        return lines
+
+
+ENGINE = SettleEngine.from_environment()
+
+
+def pulse_reset(output, board: str, observe: Optional[Callable[[], int]] = None):
+    """Pulse the (active low) backplane Reset line.
+
+    The RC network in the reset logic needs the line high for a
+    while before the pulse. If observe is given, it should return
+    something which reads zero once the board has reset; otherwise
+    the calibrated time is used."""
+    output.set_reset(True)
+    output.send()
+    ENGINE.hold(board, "ResetCharge")
+
+    output.set_reset(False)
+    output.send()
+    if observe is None:
+        ENGINE.hold(board, "Reset")
+    else:
+        ENGINE.poll(board, "Reset", observe, until=lambda v: v == 0)
+
+    output.set_reset(True)
+    output.send()
+    # Let the RC networks in the reset logic return to their
+    # 'base' state
+    ENGINE.hold(board, "ResetRecovery")
@@ -0,0 +1,383 @@
+"""Simulated stand in for RPi.GPIO.
+
+The shift register chains of the tester board and the Pi backplane
+are modelled bit by bit, so the harness code runs unchanged. What
+sits on the far side of the chains is given by behavioural models
+(see board_models.py), attached with attach().
+
+Only BOARD pin numbering is supported.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+BOARD = 10
+BCM = 11
+
+OUT = 0
+IN = 1
+
+LOW = 0
+HIGH = 1
+
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+
+N_HEADER_PINS = 40
+
+BUS_WIDTH = 16
+CYCLE_WIDTH = 5
+
+# How many passes the backplane gets to settle after a change
+MAX_SETTLE_PASSES = 10
+
+_mode = None
+_directions: Dict[int, int] = dict()
+_levels = [LOW for _ in range(N_HEADER_PINS + 1)]
+_rig = None
+
+
+class SimulationError(Exception):
+    pass
+
+
+def setwarnings(flag: bool):
+    pass
+
+
+def setmode(mode: int):
+    global _mode
+    if mode != BOARD:
+        raise ValueError("Only BOARD pin numbering is simulated")
+    _mode = mode
+
+
+def getmode() -> Optional[int]:
+    return _mode
+
+
+def _channels(channel) -> List[int]:
+    if isinstance(channel, (list, tuple)):
+        return list(channel)
+    return [channel]
+
+
+def setup(channel, direction: int, pull_up_down: int = PUD_OFF, initial=None):
+    if _mode is None:
+        raise RuntimeError("Please set pin numbering mode using GPIO.setmode")
+    for ch in _channels(channel):
+        assert ch >= 1 and ch <= N_HEADER_PINS
+        _directions[ch] = direction
+        if direction == OUT and initial is not None:
+            output(ch, initial)
+
+
+def output(channel, value):
+    channels = _channels(channel)
+    if isinstance(value, (list, tuple)):
+        values = value
+        assert len(values) == len(channels)
+    else:
+        values = [value for _ in channels]
+
+    for ch, v in zip(channels, values):
+        if _directions.get(ch) != OUT:
+            raise RuntimeError(f"Channel {ch} has not been set up as an OUTPUT")
+        level = HIGH if v else LOW
+        if level != _levels[ch]:
+            _levels[ch] = level
+            if _rig is not None:
+                _rig.edge(ch, level)
+
+
+def input(channel: int) -> int:
+    if _directions.get(channel) is None:
+        raise RuntimeError(f"You must setup() channel {channel} first")
+    if _rig is not None:
+        return _rig.read(channel)
+    return _levels[channel]
+
+
+def cleanup(channel=None):
+    global _mode
+    channels = _channels(channel) if channel is not None else list(_directions)
+    for ch in channels:
+        _directions.pop(ch, None)
+        _levels[ch] = LOW
+    if channel is None:
+        _mode = None
+
+
+def attach(rig):
+    """Connect the given rig (or None) to the header pins."""
+    global _rig
+    _rig = rig
+    if rig is not None:
+        rig.connect(_levels)
+
+
+def attached():
+    return _rig
+
+
+class ShiftOutChain:
+    def __init__(self, n_stages: int):
+        """74HC595s in series.
+
+        Stage 0 is fed from the data pin, and each rising edge of
+        the shift clock moves everything up one stage. The storage
+        registers take a copy of the stages on a rising edge of
+        the register clock."""
+        self.stages = [LOW for _ in range(n_stages)]
+        self.latched = [LOW for _ in range(n_stages)]
+
+    def shift(self, bit: int):
+        self.stages.pop()
+        self.stages.insert(0, bit)
+
+    def latch(self):
+        self.latched[:] = self.stages
+
+
+class ShiftInChain:
+    def __init__(self, n_stages: int):
+        """74HC165s in series.
+
+        Stage 0 drives the serial output pin, and each rising edge
+        of the clock moves everything down one stage. The serial
+        input at the far end is tied low."""
+        self.stages = [LOW for _ in range(n_stages)]
+
+    def load(self, values: Sequence[int]):
+        assert len(values) == len(self.stages)
+        self.stages[:] = values
+
+    def shift(self):
+        self.stages.pop(0)
+        self.stages.append(LOW)
+
+
+class _Rig:
+    def __init__(
+        self,
+        n_stages: int,
+        clk_out: int,
+        copi: int,
+        select_out: int,
+        clk_in: int,
+        cipo: int,
+        select_in: int,
+        load_in: int,
+        enables: Sequence[int],
+    ):
+        """The shift register chains, as wired to the header pins.
+
+        Subclasses decide what the latched outputs are connected
+        to, by overriding update() and sample()."""
+        self.n_stages = n_stages
+        self._clk_out = clk_out
+        self._copi = copi
+        self._select_out = select_out
+        self._clk_in = clk_in
+        self._cipo = cipo
+        self._select_in = select_in
+        self._load_in = load_in
+        self._enables = frozenset(enables)
+
+        self.shift_out = ShiftOutChain(n_stages)
+        self.shift_in = ShiftInChain(n_stages)
+        self._levels = [LOW for _ in range(N_HEADER_PINS + 1)]
+
+    def connect(self, levels: List[int]):
+        self._levels = levels
+        self.update()
+
+    def edge(self, pin: int, level: int):
+        """Respond to a change on one of the header pins."""
+        levels = self._levels
+        if pin == self._clk_out:
+            if level:
+                self.shift_out.shift(levels[self._copi])
+        elif pin == self._select_out:
+            if level:
+                self.shift_out.latch()
+                self.update()
+        elif pin == self._clk_in:
+            # Clock inhibited by select, and ignored during a load
+            if level and not levels[self._select_in] and levels[self._load_in]:
+                self.shift_in.shift()
+        elif pin == self._load_in:
+            # Loading is continuous while the line is low, so
+            # capture the inputs at both ends of the pulse
+            self.shift_in.load(self.sample())
+        elif pin in self._enables:
+            self.update()
+
+    def read(self, pin: int) -> int:
+        if pin == self._cipo:
+            return self.shift_in.stages[0]
+        return self._levels[pin]
+
+    def enabled(self, pin: int) -> bool:
+        # The output enables are active low
+        return self._levels[pin] == LOW
+
+    def update(self):
+        """Called when the latched outputs (or their enables) change."""
+        pass
+
+    def sample(self) -> List[int]:
+        """Values to be loaded into the input chain, stage 0 first."""
+        return [LOW for _ in range(self.n_stages)]
+
+
+class TesterRig(_Rig):
+    N_PINS = 40
+    PINS_PER_BANK = 8
+
+    def __init__(self, model=None):
+        """The tester board, with an optional connector board model.
+
+        The model is given the 40 output pins (as seen by the board,
+        so zero where a bank is disabled) through apply(), and
+        provides the 40 input pins from inputs()."""
+        self._bank_enables = [15, 13, 7, 5, 3]
+        super().__init__(
+            self.N_PINS,
+            clk_out=23,
+            copi=19,
+            select_out=24,
+            clk_in=40,
+            cipo=35,
+            select_in=12,
+            load_in=37,
+            enables=self._bank_enables,
+        )
+        self.model = model
+
+    def outputs(self) -> List[int]:
+        """The output pins, with pin i in stage i of the 595 chain."""
+        latched = self.shift_out.latched
+        result = []
+        for bank, enable in enumerate(self._bank_enables):
+            start = bank * self.PINS_PER_BANK
+            if self.enabled(enable):
+                result.extend(latched[start : start + self.PINS_PER_BANK])
+            else:
+                result.extend(LOW for _ in range(self.PINS_PER_BANK))
+        return result
+
+    def update(self):
+        if self.model is not None:
+            self.model.apply(self.outputs())
+
+    def sample(self) -> List[int]:
+        if self.model is None:
+            return super().sample()
+        pins = self.model.inputs()
+        # The highest pin is the first out
+        return [1 if pins[i] else 0 for i in reversed(range(self.N_PINS))]
+
+
+BUSES = ["A", "B", "C", "Instruction"]
+
+
+class BackplaneRig(_Rig):
+    N_PINS = 80
+
+    # Positions in the order the harness clocks the chains (so the
+    # first bit sent ends in the last stage of the 595 chain, and
+    # the first bit received comes from stage 0 of the 165 chain).
+    # Output buses are sent most significant bit first
+    _OUTPUT_BUS_STARTS = dict(A=48, B=32, C=16, Instruction=0)
+    _OUTPUT_CYCLE_START = 64
+    _OUTPUT_CLOCK = 77
+    _OUTPUT_RESET = 78
+    # Input buses arrive least significant byte first, with the
+    # top bit of each byte first
+    _INPUT_BUS_STARTS = dict(A=16, B=32, C=48, Instruction=64)
+    _INPUT_CYCLE_START = 8
+    _INPUT_CLOCK = 6
+    _INPUT_RESET = 5
+
+    def __init__(self, cards: Sequence = ()):
+        """The Pi backplane, with cards plugged into it.
+
+        The buses are the OR of everything driving them, and read
+        as zero when nothing does. See board_models.Card for what
+        the cards provide."""
+        self._bus_enables = dict(
+            A=8, B=3, C=5, Cycle=10, Instruction=7, Clock=11, Reset=12
+        )
+        super().__init__(
+            self.N_PINS,
+            clk_out=23,
+            copi=19,
+            select_out=24,
+            clk_in=40,
+            cipo=35,
+            select_in=26,
+            load_in=32,
+            enables=self._bus_enables.values(),
+        )
+        self.cards = list(cards)
+        self.buses = self._pi_buses()
+
+    def _sent(self, position: int) -> int:
+        return self.shift_out.latched[self.n_stages - 1 - position]
+
+    def _pi_buses(self) -> Dict[str, int]:
+        """The bus values driven by the Pi."""
+        result = dict()
+        for bus, start in self._OUTPUT_BUS_STARTS.items():
+            value = 0
+            if self.enabled(self._bus_enables[bus]):
+                for b in range(BUS_WIDTH):
+                    value |= self._sent(start + BUS_WIDTH - 1 - b) << b
+            result[bus] = value
+
+        cycle = 0
+        if self.enabled(self._bus_enables["Cycle"]):
+            for s in range(CYCLE_WIDTH):
+                cycle |= self._sent(self._OUTPUT_CYCLE_START + CYCLE_WIDTH - 1 - s) << s
+        result["Cycle"] = cycle
+
+        for name, position in [
+            ("Clock", self._OUTPUT_CLOCK),
+            ("Reset", self._OUTPUT_RESET),
+        ]:
+            enabled = self.enabled(self._bus_enables[name])
+            result[name] = self._sent(position) if enabled else LOW
+        return result
+
+    def _settle(self, pi: Dict[str, int]) -> Dict[str, int]:
+        buses = dict(pi)
+        for _ in range(MAX_SETTLE_PASSES):
+            driven = dict(pi)
+            for card in self.cards:
+                for bus, value in card.drive(buses).items():
+                    driven[bus] |= value
+            if driven == buses:
+                return buses
+            buses = driven
+        raise SimulationError("Backplane buses did not settle")
+
+    def update(self):
+        pi = self._pi_buses()
+        for card in self.cards:
+            card.transition(self.buses, pi)
+        self.buses = self._settle(pi)
+
+    def sample(self) -> List[int]:
+        result = [LOW for _ in range(self.n_stages)]
+        for bus, start in self._INPUT_BUS_STARTS.items():
+            value = self.buses[bus]
+            for b in range(BUS_WIDTH):
+                position = start + 8 * (b // 8) + 7 - (b % 8)
+                result[position] = (value >> b) & 1
+        for s in range(CYCLE_WIDTH):
+            position = self._INPUT_CYCLE_START + CYCLE_WIDTH - 1 - s
+            result[position] = (self.buses["Cycle"] >> s) & 1
+        result[self._INPUT_CLOCK] = self.buses["Clock"]
+        result[self._INPUT_RESET] = self.buses["Reset"]
+        return result
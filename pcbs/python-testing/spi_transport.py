@@ -0,0 +1,82 @@
+from typing import Optional
+
+import bitarray
+
+PINS_PER_BYTE = 8
+
+
+class SPITransport:
+    def __init__(self, n_pins: int, out_device, in_device):
+        """Move whole frames through the chains with the SPI peripherals.
+
+        The tester board wiring puts the 74HC595 chain on SPI0
+        (SCLK=23, MOSI=19, CE0=24) and the 74HC165 chain on SPI1
+        (SCLK=40, MISO=35, CE0=12), so each frame is a single
+        transfer. The devices must be opened spidev.SpiDev
+        instances (or something with the same interface, such as
+        fake_spidev.SpiDev)."""
+        assert n_pins % PINS_PER_BYTE == 0
+        self.n_pins = n_pins
+        self.n_bytes = n_pins // PINS_PER_BYTE
+
+        self._out_dev = out_device
+        self._in_dev = in_device
+
+    @classmethod
+    def open(
+        cls,
+        n_pins: int = 40,
+        out_bus: int = 0,
+        out_device: int = 0,
+        in_bus: int = 1,
+        in_device: int = 0,
+        max_speed_hz: int = 1000000,
+        spidev_module=None,
+    ) -> "SPITransport":
+        """Open the SPI devices and configure them for the chains."""
+        if spidev_module is None:
+            import spidev
+
+            spidev_module = spidev
+
+        devices = []
+        for bus, device in [(out_bus, out_device), (in_bus, in_device)]:
+            dev = spidev_module.SpiDev()
+            dev.open(bus, device)
+            # Both the 595 and 165 act on the rising edge of
+            # the clock, with the clock idling low
+            dev.mode = 0
+            dev.max_speed_hz = max_speed_hz
+            devices.append(dev)
+
+        return cls(n_pins, devices[0], devices[1])
+
+    def close(self):
+        self._out_dev.close()
+        self._in_dev.close()
+
+    def send(self, pins: bitarray.bitarray):
+        """Shift out the given (little endian) frame and latch it."""
+        # Pin 0 is the last clocked out, and SPI sends the most
+        # significant bit of each byte first. So the bytes just
+        # need reversing
+        frame = pins.tobytes()
+        # Deselecting at the end of the transfer clocks RCLK
+        self._out_dev.xfer2(list(reversed(frame)))
+
+    def recv(self, result: bitarray.bitarray, n_bits: Optional[int] = None) -> int:
+        """Shift a frame which has already been loaded into result.
+
+        The result must be a little endian bitarray. If n_bits is
+        given, only enough whole bytes to cover the first n_bits
+        shifted out (the highest pins) are transferred, and the
+        rest of result is left alone. Returns the number of bits
+        clocked."""
+        n_bytes = self.n_bytes
+        if n_bits is not None:
+            n_bytes = -(-n_bits // PINS_PER_BYTE)
+        frame = self._in_dev.xfer2([0] * n_bytes)
+        assert len(frame) == n_bytes
+
+        memoryview(result)[self.n_bytes - n_bytes :] = bytes(reversed(frame))
+        return n_bytes * PINS_PER_BYTE
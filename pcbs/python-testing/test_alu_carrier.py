@@ -2,7 +2,9 @@ import pytest
 
 import bitarray.util
 
-from pi_backplane import _Input, _Output
+import golden_model
+import vectors
+from pi_backplane import transact
 
 
 N_BITS = 16
@@ -35,67 +37,28 @@ bus_vals = pwr_2 + pwr_2_off + pwr_2_off_2 + others
 # bus_vals = [0, 1]
 
 
-def add_result(A_val: int, B_val: int) -> int:
-    sum = A_val + B_val
-    if sum >= 2 ** N_BITS:
-        sum -= 2 ** N_BITS
-    return sum
+barrel_shifts = list(range(20))
 
 
-def sub_result(A_val: int, B_val: int) -> int:
-    diff = A_val - B_val
-    if diff < 0:
-        diff += 2 ** N_BITS
-    return diff
-
-
-def cmp_result(A_val: int, B_val: int) -> int:
-    if A_val < B_val:
-        return 1
-    elif A_val > B_val:
-        return 4
+def operand_pairs(op: str):
+    """The (A, B) pairs to test the operation with (see vectors.py)."""
+    t = vectors.strength()
+    if t is None:
+        pairs = vectors.cross(bus_vals, barrel_shifts if op == "barrel" else bus_vals)
+    elif op == "barrel":
+        pairs = vectors.plan_rotations(barrel_shifts, t)
     else:
-        return 2
-
-
-def nand_result(A_val: int, B_val: int) -> int:
-    A = bitarray.util.int2ba(A_val, length=N_BITS, endian="little")
-    B = bitarray.util.int2ba(B_val, length=N_BITS, endian="little")
-    C = ~(A & B)
-    print(f"exp {C}")
-    return bitarray.util.ba2int(C)
-
-
-def xor_result(A_val: int, B_val: int) -> int:
-    A = bitarray.util.int2ba(A_val, length=N_BITS, endian="little")
-    B = bitarray.util.int2ba(B_val, length=N_BITS, endian="little")
-    C = A ^ B
-    return bitarray.util.ba2int(C)
-
-
-def barrel_result(A_val: int, B_val: int) -> int:
-    A = bitarray.util.int2ba(A_val, length=N_BITS, endian="little")
-    expected = bitarray.util.zeros(N_BITS, endian="little")
-
-    for i in range(N_BITS):
-        expected[(i + B_val) % N_BITS] = A[i]
-    return bitarray.util.ba2int(expected)
+        pairs = vectors.plan_operands(op, t)
+    name = f"test_alu_carrier {op} ({vectors.selection()})"
+    vectors.record(vectors.operand_coverage(name, op, pairs))
+    return pairs
 
 
 instructions = {"add": 0, "sub": 1, "compare": 4, "nand": 5, "xor": 6, "barrel": 7}
-result_fns = {
-    "add": add_result,
-    "sub": sub_result,
-    "compare": cmp_result,
-    "nand": nand_result,
-    "xor": xor_result,
-    "barrel": barrel_result,
-}
 
 
-def run_test(A: int, B: int, instr: str):
-    output = _Output()
-    input = _Input()
+def run_test(backplane, A: int, B: int, instr: str):
+    output, input = backplane
 
     output.set_oe("A", False)
     output.set_oe("B", False)
@@ -105,53 +68,52 @@ def run_test(A: int, B: int, instr: str):
     output.set_bus("A", A)
     output.set_bus("B", B)
     output.set_bus("Instruction", instructions[instr])
-    output.send()
 
+    expected = int(golden_model.evaluate(instr, A, B))
+
+    # Each transaction returns the response to the previous
+    # one, so we check the previous cycle as we latch the next
     active_cycles = [2, 3]
+    output.set_cycle(0)
+    transact(output, input)
     for cyc in range(5):
-        output.set_cycle(cyc)
-        output.send()
-        input.recv()
+        if cyc + 1 < 5:
+            output.set_cycle(cyc + 1)
+        transact(output, input)
 
         c_val = input.read_bus("C")
         if cyc in active_cycles:
             print(f"act {bitarray.util.int2ba(c_val, length=N_BITS, endian='little')}")
-            assert c_val == result_fns[instr](A, B)
+            assert c_val == expected
         else:
             assert c_val == 0
 
 
-@pytest.mark.parametrize("A", bus_vals)
-@pytest.mark.parametrize("B", bus_vals)
-def test_adder(A, B):
-    run_test(A, B, "add")
+@pytest.mark.parametrize("A,B", operand_pairs("add"))
+def test_adder(backplane, A, B):
+    run_test(backplane, A, B, "add")
 
 
-@pytest.mark.parametrize("A", bus_vals)
-@pytest.mark.parametrize("B", bus_vals)
-def test_subtractor(A, B):
-    run_test(A, B, "sub")
+@pytest.mark.parametrize("A,B", operand_pairs("sub"))
+def test_subtractor(backplane, A, B):
+    run_test(backplane, A, B, "sub")
 
 
-@pytest.mark.parametrize("A", bus_vals)
-@pytest.mark.parametrize("B", bus_vals)
-def test_comparator(A, B):
-    run_test(A, B, "compare")
+@pytest.mark.parametrize("A,B", operand_pairs("compare"))
+def test_comparator(backplane, A, B):
+    run_test(backplane, A, B, "compare")
 
 
-@pytest.mark.parametrize("A", bus_vals)
-@pytest.mark.parametrize("B", bus_vals)
-def test_nand(A, B):
-    run_test(A, B, "nand")
+@pytest.mark.parametrize("A,B", operand_pairs("nand"))
+def test_nand(backplane, A, B):
+    run_test(backplane, A, B, "nand")
 
 
-@pytest.mark.parametrize("A", bus_vals)
-@pytest.mark.parametrize("B", bus_vals)
-def test_xor(A, B):
-    run_test(A, B, "xor")
+@pytest.mark.parametrize("A,B", operand_pairs("xor"))
+def test_xor(backplane, A, B):
+    run_test(backplane, A, B, "xor")
 
 
-@pytest.mark.parametrize("A", bus_vals)
-@pytest.mark.parametrize("B", range(20))
-def test_barrel(A, B):
-    run_test(A, B, "barrel")
+@pytest.mark.parametrize("A,B", operand_pairs("barrel"))
+def test_barrel(backplane, A, B):
+    run_test(backplane, A, B, "barrel")
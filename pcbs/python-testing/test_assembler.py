@@ -0,0 +1,151 @@
+import struct
+
+import numpy as np
+import pytest
+
+from assembler import (
+    AssemblerError,
+    assemble,
+    assemble_program,
+    encode,
+    encode_array,
+    to_image,
+)
+from constants import INSTRUCTIONS, N_BITS
+from emulator import SlothPU16
+from utils import get_instruction
+
+
+def words(image: bytes):
+    return list(struct.unpack(f"<{len(image) // 2}H", image))
+
+
+def test_instructions():
+    image = assemble(
+        """
+        add r1, r2, r3
+        loadw r4, r5        ; A and C
+        storeb r6, r7       # A and B
+        loadpc r8
+        branchzero r9, r10
+        halt
+        halt r11
+        """
+    )
+    assert words(image) == [
+        encode("add", 1, 2, 3),
+        encode("loadw", 4, 0, 5),
+        encode("storeb", 6, 7, 0),
+        encode("loadpc", 0, 0, 8),
+        encode("branchzero", 9, 10, 0),
+        encode("halt", 0, 0, 0),
+        encode("halt", 0, 0, 11),
+    ]
+
+
+@pytest.mark.parametrize("value", [0, 0x0F, 0x10, 0xA5, 0xFF])
+def test_set(value: int):
+    image = assemble(f"set {value:#x}, r3")
+    emu = SlothPU16(image)
+    emu.step()
+    assert emu.registers[3] == value
+
+
+def test_labels():
+    program = assemble_program(
+        """
+start:  set end, r1
+        branchzero r1, r0
+middle: .word start, middle, end
+end:    .byte end
+        """
+    )
+    assert program.labels == dict(start=0, middle=4, end=10)
+    assert words(program.image[:10]) == [
+        encode("set", 10 & 0xF, 10 >> 4, 1),
+        encode("branchzero", 1, 0, 0),
+        0,
+        4,
+        10,
+    ]
+    assert program.image[10] == 10
+
+
+def test_directives():
+    image = assemble(
+        """
+        .byte 1, 0xFF, -1
+        .space 3
+        .word 0x1234, -2
+        .org 0x10
+        halt
+        """
+    )
+    assert image[:6] == bytes([1, 0xFF, 0xFF, 0, 0, 0])
+    assert image[6:10] == bytes([0x34, 0x12, 0xFE, 0xFF])
+    assert len(image) == 0x12
+    assert words(image[0x10:]) == [INSTRUCTIONS["halt"]]
+
+
+def test_directive_labels():
+    image = assemble(
+        """
+first:  .byte 1
+        .org 4
+here:   .space here
+        .org first
+        .byte 2
+        """
+    )
+    assert image == bytes([2, 0, 0, 0, 0, 0, 0, 0])
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "frobnicate r1",
+        "add r1, r2",
+        "add r1, r2, r16",
+        "add r1, r2, 3",
+        "set 0x100, r1",
+        "set far, r1\n.org 0x100\nfar: halt",
+        "branchzero nowhere, r0",
+        ".byte 1\nhalt",
+        ".byte 256",
+        ".word 0x10000",
+        ".org 0x10000",
+        ".org start",
+        ".org later\nlater: halt",
+        ".space x",
+        ".space -1",
+        ".space 0x10001",
+        ".org 1, 2",
+        ".bogus 1",
+        "x: halt\nx: halt",
+    ],
+)
+def test_errors(source: str):
+    with pytest.raises(AssemblerError):
+        assemble(source)
+
+
+def test_encode_array():
+    rng = np.random.default_rng(0)
+    opcodes = rng.choice(list(INSTRUCTIONS), size=100)
+    fields = rng.integers(0, 16, size=(3, 100))
+    expected = [encode(op, *f) for op, f in zip(opcodes, fields.T)]
+    assert encode_array(opcodes, *fields).tolist() == expected
+
+    # Broadcast one opcode against all the registers
+    all_C = encode_array("add", 1, 2, np.arange(16))
+    assert all_C.tolist() == [encode("add", 1, 2, r) for r in range(16)]
+    assert to_image(all_C) == struct.pack("<16H", *all_C.tolist())
+
+    with pytest.raises(AssemblerError):
+        encode_array("add", 16, 0, 0)
+
+
+def test_get_instruction():
+    bits = get_instruction("sub", 3, 12, 5)
+    assert len(bits) == N_BITS
+    assert int(bits.to01()[::-1], 2) == encode("sub", 3, 12, 5)
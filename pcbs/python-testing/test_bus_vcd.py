@@ -0,0 +1,112 @@
+import pytest
+
+import board_models
+import bus_vcd
+import gpio_backend
+import sim_gpio
+from bus_vcd import VCDWriter
+
+
+def parse(path):
+    """The declared signals, and the changes as (time, name, value)."""
+    codes = dict()
+    changes = []
+    now = None
+    with open(path) as f:
+        lines = f.read().splitlines()
+    body = lines.index("$enddefinitions $end")
+    for line in lines[:body]:
+        words = line.split()
+        if words[0] == "$var":
+            codes[words[3]] = (words[4], int(words[2]))
+    for line in lines[body + 1 :]:
+        if line.startswith("#"):
+            now = int(line[1:])
+        elif line.startswith("b"):
+            value, code = line[1:].split()
+            changes.append((now, codes[code][0], value))
+        elif line[0] in "01x":
+            changes.append((now, codes[line[1:]][0], line[0]))
+    return codes, changes
+
+
+def test_changes_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(bus_vcd, "BUFFER_LINES", 3)
+    path = str(tmp_path / "bus.vcd")
+    writer = VCDWriter(path)
+    writer.sample(dict(A=5, Clock=True))
+    writer.sample(dict(A=5, Clock=True))
+    writer.comment("next")
+    writer.sample(dict(A=5, Cycle=0b00100, Clock=False))
+    # Written out when the buffer fills
+    assert "b101 !" in open(path).read()
+    writer.close()
+
+    codes, changes = parse(path)
+    assert [codes[c] for c in "!%&"] == [("A", 16), ("Cycle", 5), ("Clock", 1)]
+    # The initial values, then what changed
+    assert [c[1:] for c in changes[:7]] == [
+        ("A", "x" * 16),
+        ("B", "x" * 16),
+        ("C", "x" * 16),
+        ("Instruction", "x" * 16),
+        ("Cycle", "x" * 5),
+        ("Clock", "x"),
+        ("Reset", "x"),
+    ]
+    assert [c[1:] for c in changes[7:]] == [
+        ("A", "101"),
+        ("Clock", "1"),
+        ("Cycle", "100"),
+        ("Clock", "0"),
+    ]
+    assert changes[7][0] < changes[9][0]
+    assert writer.n_samples == 3
+    assert "$comment next $end" in open(path).read()
+
+
+@pytest.mark.skipif(
+    gpio_backend.backend_name() != "sim", reason="Needs the simulated GPIO backend"
+)
+def test_backplane(tmp_path):
+    from pi_backplane import _Input, _Output, transact
+
+    class Driver(board_models.Card):
+        def drive(self, buses):
+            return dict(C=0x1234, Clock=1)
+
+    path = str(tmp_path / "backplane.vcd")
+    saved = sim_gpio.attached()
+    output = _Output()
+    input = _Input()
+    try:
+        sim_gpio.attach(sim_gpio.BackplaneRig([Driver()]))
+        input.vcd = VCDWriter(path)
+        output.set_oe("A", False)
+        output.set_oe("Cycle", False)
+        output.set_bus("A", 0xBEEF)
+        output.set_cycle(3)
+        output.send()
+        input.recv()
+        # Only as far as the cycle bus
+        output.set_cycle(1)
+        output.send()
+        input.read("Cycle")
+        transact(output, input)
+        input.vcd.close()
+    finally:
+        input.vcd = None
+        sim_gpio.attach(saved)
+
+    _, changes = parse(path)
+    changes = [c[1:] for c in changes[7:]]
+    assert changes[:7] == [
+        ("A", f"{0xBEEF:b}"),
+        ("B", "0"),
+        ("C", f"{0x1234:b}"),
+        ("Instruction", "0"),
+        ("Cycle", "1000"),
+        ("Clock", "1"),
+        ("Reset", "0"),
+    ]
+    assert changes[7:] == [("Cycle", "10")]
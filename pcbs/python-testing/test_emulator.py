@@ -0,0 +1,168 @@
+import random
+import struct
+
+import pytest
+
+from assembler import encode
+from constants import INSTRUCTIONS, N_BITS
+from emulator import (
+    COMMIT,
+    EXECUTE,
+    IFETCH,
+    ISTORE,
+    PCUPDATE,
+    EmulatorError,
+    SlothPU16,
+)
+
+WORD_VALUES = [0, 1, 2, 0x7FFF, 0x8000, 0xA5A5, 0xFFFF]
+
+
+def make_emulator(*words: int) -> SlothPU16:
+    return SlothPU16(struct.pack(f"<{len(words)}H", *words))
+
+
+class TestInstructions:
+    @pytest.mark.parametrize("A", WORD_VALUES)
+    @pytest.mark.parametrize("B", WORD_VALUES)
+    def test_alu(self, A: int, B: int):
+        expected = dict(
+            add=(A + B) % 2 ** N_BITS,
+            sub=(A - B) % 2 ** N_BITS,
+            compare=1 if A < B else (2 if A == B else 4),
+            nand=(2 ** N_BITS - 1) - (A & B),
+            xor=A ^ B,
+            barrel=((A << (B % 16)) | (A >> (16 - B % 16))) % 2 ** N_BITS,
+        )
+        for op, result in expected.items():
+            emu = make_emulator(encode(op, 1, 2, 3))
+            emu.registers[1] = A
+            emu.registers[2] = B
+            assert emu.run(1) == 1
+            assert emu.registers[3] == result, op
+            assert emu.pc == 2
+
+    def test_set(self):
+        emu = make_emulator(encode("set", 0xA, 0x5, 7))
+        emu.run(1)
+        assert emu.registers[7] == 0x5A
+
+    def test_loads(self):
+        emu = make_emulator(encode("loadb", 1, 0, 2), encode("loadw", 1, 0, 3))
+        emu.registers[1] = 0x100
+        emu.load(bytes([0x34, 0x12]), 0x100)
+        emu.run(2)
+        assert emu.registers[2] == 0x34
+        assert emu.registers[3] == 0x1234
+
+    def test_stores(self):
+        emu = make_emulator(encode("storeb", 1, 2, 3), encode("storew", 4, 2, 3))
+        emu.registers[1] = 0x101
+        emu.registers[2] = 0xBEEF
+        emu.registers[3] = 0x5555
+        emu.registers[4] = 0x200
+        emu.run(2)
+        assert emu.memory[0x101] == 0xEF
+        assert emu.memory[0x200:0x202] == bytes([0xEF, 0xBE])
+        # No write to the register file
+        assert emu.registers[3] == 0x5555
+
+    def test_loadw_unaligned(self):
+        emu = make_emulator(encode("loadw", 1, 0, 2))
+        emu.registers[1] = 0x101
+        with pytest.raises(EmulatorError):
+            emu.run(1)
+
+    def test_loadpc(self):
+        emu = make_emulator(encode("set", 0, 0, 0), encode("loadpc", 0, 0, 5))
+        emu.run(2)
+        assert emu.registers[5] == 2
+
+    @pytest.mark.parametrize("B", [0, 1, 0x8000])
+    def test_branchzero(self, B: int):
+        emu = make_emulator(encode("branchzero", 1, 2, 3))
+        emu.registers[1] = 0x40
+        emu.registers[2] = B
+        emu.registers[3] = 0x5555
+        emu.run(1)
+        assert emu.pc == (0x40 if B == 0 else 2)
+        assert emu.registers[3] == 0x5555
+
+    def test_halt(self):
+        emu = make_emulator(encode("set", 1, 0, 3), encode("halt", 0, 0, 3))
+        assert emu.run() == 2
+        assert emu.halted
+        # PC is not updated, but nothing drives C during the commit
+        assert emu.pc == 2
+        assert emu.registers[3] == 0
+
+
+class TestComputeCycle:
+    def test_stages(self):
+        emu = make_emulator(encode("add", 1, 2, 3))
+        emu.registers[1] = 10
+        emu.registers[2] = 20
+        instr = encode("add", 1, 2, 3)
+
+        states = emu.step()
+        assert [s.cycle for s in states] == [IFETCH, ISTORE, EXECUTE, COMMIT, PCUPDATE]
+
+        # Memory puts the instruction on B, with the PC on A
+        assert states[IFETCH][1:] == (0, instr, 0, 0)
+        assert states[ISTORE][1:] == (0, instr, 0, instr)
+        assert states[EXECUTE][1:] == (10, 20, 30, instr)
+        assert states[COMMIT][1:] == (10, 20, 30, instr)
+        # The ALU stops driving C
+        assert states[PCUPDATE][1:] == (10, 20, 0, instr)
+        assert emu.registers[3] == 30
+        assert emu.pc == 2
+
+    def test_commit_feeds_back(self):
+        emu = make_emulator(encode("add", 1, 1, 1))
+        emu.registers[1] = 3
+
+        states = emu.step()
+        assert states[EXECUTE][1:4] == (3, 3, 6)
+        # After the commit, the register file drives the new value
+        assert states[COMMIT][1:4] == (6, 6, 12)
+        assert emu.registers[1] == 6
+
+    def test_loadpc_pc_update(self):
+        emu = make_emulator(encode("set", 0, 0, 0), encode("loadpc", 0, 0, 5))
+        emu.step()
+
+        states = emu.step()
+        assert states[EXECUTE].C == 2
+        # The PC changes on entering PC Update
+        assert states[PCUPDATE].C == 4
+        assert emu.registers[5] == 2
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_matches_fast(self, seed: int):
+        # Random programs run until they make an unaligned access
+        rng = random.Random(seed)
+        words = []
+        for _ in range(2000):
+            op = rng.choice([k for k in INSTRUCTIONS if k != "halt"])
+            words.append(
+                encode(op, rng.randrange(16), rng.randrange(16), rng.randrange(16))
+            )
+        image = struct.pack(f"<{len(words)}H", *words)
+
+        stepped = SlothPU16(image)
+        fast = SlothPU16(image)
+        for emu in [stepped, fast]:
+            emu.registers[:] = [2 * i for i in range(16)]
+
+        for _ in range(1000):
+            try:
+                stepped.step()
+            except EmulatorError:
+                with pytest.raises(EmulatorError):
+                    fast.run(1)
+                break
+            fast.run(1)
+            assert stepped.registers == fast.registers
+            assert stepped.pc == fast.pc
+            assert stepped.ir == fast.ir
+        assert stepped.memory == fast.memory
@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+
+import golden_model
+import vectors
+from constants import INSTRUCTIONS, N_BITS
+from gate_sim import Circuit, SimulationError, alu_carrier, pack, schematic, unpack
+from kicad_netlist import Component, Netlist
+
+OP_NAMES = {code: op for op, code in INSTRUCTIONS.items() if code < 8}
+
+# Cycle is one hot, and the ALU drives C in EXECUTE and COMMIT
+CYCLES = [1 << i for i in range(5)]
+ACTIVE_CYCLES = [1 << 2, 1 << 3]
+
+
+def exhaustive(n_bits: int):
+    A, B = np.meshgrid(np.arange(2 ** n_bits), np.arange(2 ** n_bits))
+    return A.ravel(), B.ravel()
+
+
+def planned(op: str, n_bits: int = N_BITS):
+    if op == "barrel":
+        pairs = vectors.plan_rotations(range(n_bits), 3, n_bits)
+    else:
+        pairs = vectors.plan_operands(op, 3, n_bits)
+    A, B = np.array(pairs).T
+    return A, B
+
+
+@pytest.fixture(scope="module")
+def adder_subtractor() -> Circuit:
+    return Circuit.from_schematic(schematic("Adder Subtractor"))
+
+
+@pytest.fixture(scope="module")
+def carrier() -> Circuit:
+    return Circuit(alu_carrier())
+
+
+def test_pack():
+    bits = np.random.default_rng(0).integers(0, 2, 100).astype(bool)
+    words = pack(bits)
+    assert len(words) == 2
+    assert np.array_equal(unpack(words, 100), bits)
+
+
+@pytest.mark.parametrize("carry_in", [0, 1])
+@pytest.mark.parametrize("op", ["add", "sub"])
+def test_adder_subtractor(adder_subtractor: Circuit, op: str, carry_in: int):
+    A, B = exhaustive(8)
+    result = adder_subtractor.run(
+        {
+            "A": A,
+            "B": B,
+            "~{Add}": op != "add",
+            "~{Sub}": op != "sub",
+            "Carry_{in}": carry_in,
+        }
+    )
+    model = golden_model.add_carry if op == "add" else golden_model.sub_carry
+    expected, expected_carry = model(A, B, carry_in, 8)
+    assert np.array_equal(result.bus("C"), expected)
+    assert np.array_equal(result.net("Carry_{Out}"), expected_carry)
+    assert not result.floating("C").any()
+    assert not result.contention()
+
+
+def test_adder_subtractor_off(adder_subtractor: Circuit):
+    A, B = exhaustive(8)
+    result = adder_subtractor.run({"A": A, "B": B, "~{Add}": 1, "~{Sub}": 1})
+    assert result.floating("C").all()
+    assert not result.bus("C").any()
+
+
+def test_comparator():
+    circuit = Circuit.from_schematic(schematic("Comparator"))
+    A, B = planned("compare")
+    result = circuit.run({"A": A, "B": B, "~{Enable}": 0})
+    assert np.array_equal(result.bus("C"), golden_model.compare(A, B))
+
+    result = circuit.run({"A": A, "B": B, "~{Enable}": 1})
+    assert result.floating("C").all()
+
+
+def test_nand_xor():
+    circuit = Circuit.from_schematic(schematic("NAND XOR"))
+    A, B = exhaustive(8)
+    for op in ["nand", "xor"]:
+        result = circuit.run(
+            {"A": A, "B": B, "~{NAND}": op != "nand", "~{XOR}": op != "xor"}
+        )
+        assert np.array_equal(result.bus("C"), golden_model.evaluate(op, A, B, 8))
+
+    # Asking for both enables neither
+    result = circuit.run({"A": A, "B": B, "~{NAND}": 0, "~{XOR}": 0})
+    assert result.floating("C").all()
+    assert not result.contention()
+
+
+def test_barrel_shifter():
+    # Each board rotates by up to 7 places, and is off for the rest
+    circuit = Circuit.from_schematic(schematic("Barrel Shifter"))
+    A, B = planned("barrel")
+    result = circuit.run({"A": A, "B_": B, "~{OE}": 0})
+    low = B < 8
+    assert np.array_equal(result.bus("C")[low], golden_model.barrel(A, B)[low])
+    assert not result.floating("C")[low].any()
+    assert result.floating("C")[~low].all()
+
+
+@pytest.mark.parametrize("op", list(OP_NAMES.values()))
+def test_alu_carrier(carrier: Circuit, op: str):
+    A, B = planned(op)
+    for cycle in CYCLES:
+        result = carrier.run(
+            {"A": A, "B": B, "I": INSTRUCTIONS[op], "Cycle": cycle, "RESET": 1}
+        )
+        assert not result.contention()
+        if cycle in ACTIVE_CYCLES:
+            assert np.array_equal(result.bus("C"), golden_model.evaluate(op, A, B))
+            assert not result.floating("C").any()
+        else:
+            assert result.floating("C").all()
+
+
+@pytest.mark.parametrize("code", [2, 3] + list(range(8, 16)))
+def test_alu_carrier_undriven(carrier: Circuit, code: int):
+    A, B = golden_model.sample("add", 256, rng=np.random.default_rng(code))[:2]
+    result = carrier.run({"A": A, "B": B, "I": code, "Cycle": ACTIVE_CYCLES[0]})
+    assert not result.bus("C").any()
+    # Codes 2 and 3 enable the output buffers, with no board behind them
+    assert result.floating("C").all() == (code >= 8)
+
+
+def test_loop():
+    # A ring of three inverters never settles
+    nets = ["a", "b", "c"]
+    pins = {"1": "a", "2": "b", "3": "b", "4": "c", "5": "c", "6": "a"}
+    u1 = Component("U1", "74HC04", "74xx:74HC04", pins, dict())
+    netlist = Netlist(dict(U1=u1), {n: [] for n in nets})
+    with pytest.raises(SimulationError):
+        Circuit(netlist).run({})
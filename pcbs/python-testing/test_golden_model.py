@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import golden_model
+from constants import INSTRUCTIONS
+from emulator import alu
+
+
+@pytest.mark.parametrize("op", golden_model.OPERATIONS.keys())
+def test_matches_emulator(op: str):
+    A, B, C = golden_model.sample(op, 5000, rng=np.random.default_rng(9))
+
+    for a, b, c in zip(A.tolist(), B.tolist(), C.tolist()):
+        assert c == alu(INSTRUCTIONS[op], a, b)
+
+
+@pytest.mark.parametrize("op", golden_model.OPERATIONS.keys())
+def test_exhaustive_8bit(op: str):
+    n_blocks = 0
+    for A, B, C in golden_model.exhaustive(op, n_bits=8, rows=100):
+        assert C.shape == (A.shape[0], 256)
+        assert C.max() < 256 or op == "compare"
+        n_blocks += 1
+    assert n_blocks == 3
+
+
+def test_add_carry():
+    A = np.arange(256)[:, np.newaxis]
+    B = np.arange(256)[np.newaxis, :]
+    for carry_in in [0, 1]:
+        C, carry_out = golden_model.add_carry(A, B, carry_in, n_bits=8)
+        total = A + B + carry_in
+        assert np.array_equal(C, total % 256)
+        assert np.array_equal(carry_out, total >= 256)
+
+
+def test_sub_carry():
+    A = np.arange(256)[:, np.newaxis]
+    B = np.arange(256)[np.newaxis, :]
+    C, carry_out = golden_model.sub_carry(A, B, 1, n_bits=8)
+    assert np.array_equal(C, (A - B) % 256)
+    # No borrow
+    assert np.array_equal(carry_out, A >= B)
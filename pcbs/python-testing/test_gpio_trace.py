@@ -0,0 +1,137 @@
+import bitarray.util
+import pytest
+
+import board_models
+import gpio_backend
+import gpio_trace
+import sim_gpio
+from gpio_trace import BACKPLANE, RECV, SEND, TESTER, Recorder, ReplayError, Trace
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "run.trace")
+    frames = [
+        (TESTER, SEND, bitarray.util.urandom(40, endian="little"), 40),
+        (BACKPLANE, RECV, bitarray.util.urandom(80, endian="big"), 13),
+        (TESTER, RECV, bitarray.util.urandom(40, endian="little"), 8),
+    ]
+    recorder = Recorder(path)
+    for frame in frames[:2]:
+        recorder.record(*frame)
+    recorder.close()
+    # A later recording appends
+    recorder = Recorder(path)
+    recorder.record(*frames[2])
+    recorder.close()
+    # And a partly written record is left out
+    with open(path, "ab") as f:
+        f.write(b"\0" * 5)
+
+    trace = Trace(path)
+    assert len(trace) == 3
+    for i, (source, kind, frame, n_bits) in enumerate(frames):
+        assert trace.records["source"][i] == source
+        assert trace.records["kind"][i] == kind
+        assert trace.records["n_bits"][i] == n_bits
+        assert trace.frame(i) == frame
+    assert list(trace.select(TESTER, RECV)) == [2]
+    assert trace.seconds(2) >= trace.seconds(0) == 0
+    assert trace.summary()[-1].startswith("3 records")
+
+
+def test_not_a_trace(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"0123456789" * 10)
+    with pytest.raises(gpio_trace.TraceError):
+        Trace(str(path))
+    with pytest.raises(gpio_trace.TraceError):
+        Recorder(str(path))
+
+
+@pytest.mark.skipif(
+    gpio_backend.backend_name() != "sim", reason="Needs the simulated GPIO backend"
+)
+class TestReplay:
+    def test_backplane(self, tmp_path):
+        from pi_backplane import _Input, _Output
+
+        class Adder(board_models.Card):
+            def drive(self, buses):
+                return dict(C=(buses["A"] + buses["B"]) & 0xFFFF)
+
+        def run(output, input, values):
+            for bus in ["A", "B"]:
+                output.set_oe(bus, False)
+            results = []
+            for a, b in values:
+                output.set_bus("A", a)
+                output.set_bus("B", b)
+                output.send()
+                results.append(input.read("C")["C"])
+            return results
+
+        values = [(1, 2), (0x8000, 0x8001), (0x1234, 0x1111)]
+        path = str(tmp_path / "backplane.trace")
+        saved = sim_gpio.attached()
+        output = _Output()
+        input = _Input()
+        try:
+            sim_gpio.attach(sim_gpio.BackplaneRig([Adder()]))
+            output.trace = input.trace = Recorder(path)
+            assert run(output, input, values) == [3, 1, 0x2345]
+            output.trace.close()
+            output.trace = input.trace = None
+
+            # No cards, just the trace
+            output.clear()
+            sim_gpio.attach(gpio_trace.BackplaneReplayRig(Trace(path)))
+            assert run(output, input, values) == [3, 1, 0x2345]
+
+            # Any departure from the recording is caught
+            output.clear()
+            sim_gpio.attach(gpio_trace.BackplaneReplayRig(Trace(path)))
+            with pytest.raises(ReplayError, match="Send 1 to the backplane"):
+                run(output, input, [(1, 2), (0x8000, 0x8000)])
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_tester(self, tmp_path, monkeypatch):
+        from connector_board import BoardSpec, make_board
+
+        class Inverter:
+            def __init__(self):
+                self.pins = [0] * 40
+
+            def apply(self, pins):
+                self.pins = [1 - p for p in pins]
+
+            def inputs(self):
+                return self.pins
+
+        board_type = make_board(
+            BoardSpec(
+                name="Inverter",
+                outputs=dict(Out=list(range(16))),
+                inputs=dict(In=list(range(16, 32))),
+            )
+        )
+        path = str(tmp_path / "tester.trace")
+        saved = sim_gpio.attached()
+        try:
+            sim_gpio.attach(sim_gpio.TesterRig(Inverter()))
+            # Recording from the start, as the board sets itself up
+            monkeypatch.setattr(gpio_trace, "RECORDER", Recorder(path))
+            board = board_type()
+            board.write_Out(0x5A5A)
+            assert board.read_In() == 0xFFFF
+            gpio_trace.RECORDER.close()
+            monkeypatch.setattr(gpio_trace, "RECORDER", None)
+
+            sim_gpio.attach(gpio_trace.TesterReplayRig(Trace(path)))
+            board = board_type()
+            board.write_Out(0x5A5A)
+            assert board.read_In() == 0xFFFF
+            with pytest.raises(ReplayError, match="past the end"):
+                board.read_In()
+        finally:
+            sim_gpio.attach(saved)
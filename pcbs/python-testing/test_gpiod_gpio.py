@@ -0,0 +1,99 @@
+import pytest
+
+import fake_gpiod
+import gpiod_gpio as GPIO
+
+CHIP = "/dev/gpiochip0"
+
+# Tester board wiring, with the BCM numbers of the lines
+CLK_OUT = 23  # GPIO11
+COPI = 19  # GPIO10
+SELECT_OUT = 24  # GPIO8
+CIPO = 35  # GPIO19
+ENABLES = [15, 13, 7, 5, 3]  # GPIO22, 27, 4, 3, 2
+ENABLE_OFFSETS = [22, 27, 4, 3, 2]
+
+
+@pytest.fixture
+def chip():
+    fake_gpiod.chips.clear()
+    GPIO.open_chip(CHIP, gpiod_module=fake_gpiod)
+    GPIO.setmode(GPIO.BOARD)
+    yield fake_gpiod.chip(CHIP)
+    GPIO.cleanup()
+
+
+def set_calls(chip):
+    return [arg for name, arg in chip.calls if name == "set_values"]
+
+
+class TestGPIOD:
+    def test_one_request(self, chip):
+        GPIO.setup([CLK_OUT, COPI, SELECT_OUT], GPIO.OUT)
+        GPIO.setup(ENABLES, GPIO.OUT)
+        GPIO.setup(CIPO, GPIO.IN)
+        assert chip.calls == []
+
+        # The lines are requested together when first used
+        GPIO.output(SELECT_OUT, GPIO.HIGH)
+        GPIO.output(CLK_OUT, GPIO.LOW)
+        assert chip.calls[0] == (
+            "request_lines",
+            sorted([11, 10, 8, 19] + ENABLE_OFFSETS),
+        )
+        assert len([c for c in chip.calls if c[0] == "request_lines"]) == 1
+
+    def test_enables_single_call(self, chip):
+        GPIO.setup(ENABLES, GPIO.OUT)
+
+        GPIO.output(ENABLES, [True, False, True, False, True])
+        assert set_calls(chip) == [
+            {
+                22: fake_gpiod.Value.ACTIVE,
+                27: fake_gpiod.Value.INACTIVE,
+                4: fake_gpiod.Value.ACTIVE,
+                3: fake_gpiod.Value.INACTIVE,
+                2: fake_gpiod.Value.ACTIVE,
+            }
+        ]
+
+    def test_data_and_clock(self, chip):
+        GPIO.setup([COPI, CLK_OUT], GPIO.OUT)
+
+        GPIO.output((COPI, CLK_OUT), (1, GPIO.LOW))
+        GPIO.output(CLK_OUT, GPIO.HIGH)
+        assert set_calls(chip) == [
+            {10: fake_gpiod.Value.ACTIVE, 11: fake_gpiod.Value.INACTIVE},
+            {11: fake_gpiod.Value.ACTIVE},
+        ]
+
+    def test_setup_keeps_levels(self, chip):
+        GPIO.setup(SELECT_OUT, GPIO.OUT)
+        GPIO.output(SELECT_OUT, GPIO.HIGH)
+
+        # Adding a line remakes the request, without glitching
+        GPIO.setup(CLK_OUT, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.output(CLK_OUT, GPIO.HIGH)
+        assert chip.requests[0].released
+        assert not chip.requests[-1].released
+        settings = chip.requests[-1].settings
+        assert settings[8].output_value == fake_gpiod.Value.ACTIVE
+        assert chip.values[8] == fake_gpiod.Value.ACTIVE
+        assert chip.values[11] == fake_gpiod.Value.ACTIVE
+
+    def test_input(self, chip):
+        GPIO.setup(CIPO, GPIO.IN)
+
+        chip.values[19] = fake_gpiod.Value.ACTIVE
+        assert GPIO.input(CIPO) == GPIO.HIGH
+        chip.values[19] = fake_gpiod.Value.INACTIVE
+        assert GPIO.input(CIPO) == GPIO.LOW
+
+    def test_errors(self, chip):
+        GPIO.setup(CIPO, GPIO.IN)
+        with pytest.raises(RuntimeError):
+            GPIO.output(CIPO, GPIO.HIGH)
+        with pytest.raises(RuntimeError):
+            GPIO.input(CLK_OUT)
+        with pytest.raises(ValueError):
+            GPIO.setup(1, GPIO.OUT)
@@ -0,0 +1,91 @@
+import pytest
+
+import gpiomem_gpio as GPIO
+
+# Tester board wiring, with the BCM numbers of the lines
+CLK_OUT = 23  # GPIO11
+COPI = 19  # GPIO10
+CIPO = 35  # GPIO19
+ENABLES = [15, 13, 7, 5, 3]  # GPIO22, 27, 4, 3, 2
+
+
+@pytest.fixture
+def regs(tmp_path, monkeypatch):
+    """The register block, backed by an ordinary file."""
+    path = tmp_path / "gpiomem"
+    path.write_bytes(bytes(GPIO.BLOCK_SIZE))
+    monkeypatch.setenv(GPIO.DEVICE_ENV, str(path))
+
+    GPIO.setmode(GPIO.BOARD)
+    GPIO.open_device()
+    yield GPIO._regs
+    GPIO.cleanup()
+
+
+def clear_strobes(regs):
+    regs[GPIO.GPSET0] = 0
+    regs[GPIO.GPCLR0] = 0
+
+
+class TestGPIOMem:
+    def test_setup_function_select(self, regs):
+        GPIO.setup(CLK_OUT, GPIO.OUT)
+        GPIO.setup(CIPO, GPIO.IN)
+
+        # GPIO11 is field 1 of GPFSEL1, GPIO19 field 9
+        assert regs[GPIO.GPFSEL0 + 1] == 0b001 << 3
+        GPIO.setup(COPI, GPIO.OUT)
+        assert regs[GPIO.GPFSEL0 + 1] == (0b001 << 3) | (0b001 << 0)
+
+        GPIO.setup(CLK_OUT, GPIO.IN)
+        assert regs[GPIO.GPFSEL0 + 1] == 0b001 << 0
+
+    def test_single_output(self, regs):
+        GPIO.setup(CLK_OUT, GPIO.OUT)
+
+        clear_strobes(regs)
+        GPIO.output(CLK_OUT, GPIO.HIGH)
+        assert (regs[GPIO.GPSET0], regs[GPIO.GPCLR0]) == (1 << 11, 0)
+
+        clear_strobes(regs)
+        GPIO.output(CLK_OUT, GPIO.LOW)
+        assert (regs[GPIO.GPSET0], regs[GPIO.GPCLR0]) == (0, 1 << 11)
+
+    @pytest.mark.parametrize("bit", [0, 1])
+    def test_data_and_clock(self, regs, bit: int):
+        GPIO.setup([COPI, CLK_OUT], GPIO.OUT)
+
+        clear_strobes(regs)
+        GPIO.output((COPI, CLK_OUT), (bit, GPIO.LOW))
+        if bit:
+            assert (regs[GPIO.GPSET0], regs[GPIO.GPCLR0]) == (1 << 10, 1 << 11)
+        else:
+            # A single store lowers both
+            assert (regs[GPIO.GPSET0], regs[GPIO.GPCLR0]) == (0, (1 << 10) | (1 << 11))
+
+    def test_enables_together(self, regs):
+        GPIO.setup(ENABLES, GPIO.OUT)
+
+        clear_strobes(regs)
+        GPIO.output(ENABLES, GPIO.HIGH)
+        mask = (1 << 22) | (1 << 27) | (1 << 4) | (1 << 3) | (1 << 2)
+        assert (regs[GPIO.GPSET0], regs[GPIO.GPCLR0]) == (mask, 0)
+
+    def test_input(self, regs):
+        GPIO.setup(CIPO, GPIO.IN)
+
+        regs[GPIO.GPLEV0] = 1 << 19
+        assert GPIO.input(CIPO) == GPIO.HIGH
+        regs[GPIO.GPLEV0] = ~(1 << 19) & 0xFFFFFFFF
+        assert GPIO.input(CIPO) == GPIO.LOW
+
+    def test_errors(self, regs):
+        GPIO.setup(CIPO, GPIO.IN)
+        with pytest.raises(RuntimeError):
+            GPIO.output(CIPO, GPIO.HIGH)
+        with pytest.raises(RuntimeError):
+            GPIO.input(CLK_OUT)
+        with pytest.raises(ValueError):
+            GPIO.setup(1, GPIO.OUT)
+        with pytest.raises(ValueError):
+            GPIO.setup(CIPO, GPIO.IN, pull_up_down=GPIO.PUD_UP)
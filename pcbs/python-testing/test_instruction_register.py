@@ -1,14 +1,9 @@
-import time
-
 import pytest
 
-import bitarray.util
-
-from constants import N_BITS, INSTR_BITS, INSTRUCTIONS, REG_BITS
+from assembler import encode
+from constants import INSTRUCTIONS, REG_BITS
 from pi_backplane import _Input, _Output
-from utils import get_instruction
-
-SLEEP_SECS = 0.03
+from settle import pulse_reset
 
 
 def prepare_instruction_register(input: _Input, output: _Output):
@@ -25,36 +20,28 @@ def prepare_instruction_register(input: _Input, output: _Output):
     output.set_oe("Reset", False)
     output.send()
 
-    # Send reset
-    output.set_reset(True)
-    output.send()
-    time.sleep(SLEEP_SECS)
-    output.set_reset(False)
-    output.send()
-    time.sleep(SLEEP_SECS)
-    output.set_reset(True)
-    output.send()
-    # This last is important, since it allows the
-    # RC networks in the RwR reset logic to return
-    # to 'base' state
-    time.sleep(SLEEP_SECS)
+    # Send reset, watching for the IR to clear
+    def read_instruction() -> int:
+        input.recv()
+        return input.read_bus("Instruction")
+
+    pulse_reset(output, "InstructionRegister", observe=read_instruction)
 
 
 @pytest.mark.parametrize("op", INSTRUCTIONS.keys())
 @pytest.mark.parametrize("rA", range(2 ** REG_BITS))
 @pytest.mark.parametrize("rB", [0, 7, 9, 15])
 @pytest.mark.parametrize("rC", [0, 11])
-def test_instruction_write(op: str, rA: int, rB: int, rC: int):
-    output = _Output()
-    input = _Input()
+def test_instruction_write(backplane, op: str, rA: int, rB: int, rC: int):
+    output, input = backplane
 
     prepare_instruction_register(input, output)
 
-    instr = get_instruction(op, rA, rB, rC)
+    instr = encode(op, rA, rB, rC)
 
     # Set the cycle and instruction
     output.set_cycle(0)
-    output.set_bus("B", bitarray.util.ba2int(instr))
+    output.set_bus("B", instr)
     output.send()
 
     # Check outputs
@@ -70,7 +57,7 @@ def test_instruction_write(op: str, rA: int, rB: int, rC: int):
     # Check outputs again
     input.recv()
     assert input.read_bus("A") == 0
-    assert input.read_bus("Instruction") == bitarray.util.ba2int(instr)
+    assert input.read_bus("Instruction") == instr
     assert input.read_bus("C") == 0
 
     # Advance through remaining cycles
@@ -79,7 +66,7 @@ def test_instruction_write(op: str, rA: int, rB: int, rC: int):
         output.send()
         input.recv()
         assert input.read_bus("A") == 0
-        assert input.read_bus("Instruction") == bitarray.util.ba2int(instr)
+        assert input.read_bus("Instruction") == instr
         expected_C = 0
         if op == "set":
             expected_C = rA + (rB * 2 ** REG_BITS)
@@ -0,0 +1,37 @@
+import pytest
+
+from gate_sim import schematic
+from kicad_netlist import NetlistError, load_netlist, parse, vector_members
+
+
+def test_parse():
+    expr = parse('(kicad_sch (version 1) (property "Reference" "U\\"1") (wire))')
+    assert expr.head == "kicad_sch"
+    assert expr.get("version")[1] == "1"
+    assert expr.property("Reference") == 'U"1'
+    assert len(list(expr.all("wire"))) == 1
+
+    with pytest.raises(NetlistError):
+        parse("(kicad_sch (version 1)")
+
+
+def test_vector_members():
+    assert vector_members("A[0..3]") == ["A0", "A1", "A2", "A3"]
+    assert vector_members("~{Y}[2..0]") == ["~{Y}2", "~{Y}1", "~{Y}0"]
+    assert vector_members("A0") is None
+
+
+def test_hierarchy():
+    netlist = load_netlist(schematic("NAND XOR"))
+    # The edge connector, and the gates on both sheets, by bus member
+    assert sorted(netlist.nets["A0"]) == [("J1", "A2"), ("U1", "1"), ("U4", "1")]
+    assert netlist.components["U3"].net("CE") == "/NAND/~{Enable}"
+    # Units of the same part, placed on separate symbols
+    assert len(netlist.components["U7"].pins) == 14
+
+
+def test_power():
+    netlist = load_netlist(schematic("Adder Subtractor"))
+    for component in netlist.parts("74"):
+        assert "GND" in component.pins.values()
+        assert "+5V" in component.pins.values()
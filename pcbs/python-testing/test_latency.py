@@ -0,0 +1,152 @@
+import sys
+
+import pytest
+
+import board_models
+import gpio_backend
+import latency
+import sim_gpio
+from latency import Histogram, Profiler, bucket, bucket_bounds
+
+
+def test_buckets():
+    previous = -1
+    for index in range(latency.N_BUCKETS):
+        low, high = bucket_bounds(index)
+        # The buckets cover every time, in order, without overlapping
+        assert low == previous + 1
+        assert bucket(low) == bucket(high) == index
+        # And are within the resolution
+        assert high - low <= max(low, latency.LINEAR) / latency.HALF
+        previous = high
+    assert bucket(1 << 50) == latency.N_BUCKETS - 1
+
+
+def test_histogram():
+    h = Histogram()
+    for ns in range(1, 1001):
+        h.record(1000 * ns, n_edges=2)
+    assert h.n_calls == 1000
+    assert h.mean() == 500500
+    assert h.n_edges == 2000
+    assert h.max_ns == h.percentile(100) == 1000000
+    for percent in [1, 50, 90, 99]:
+        assert h.percentile(percent) == pytest.approx(10000 * percent, rel=0.02)
+
+    copy = Histogram.from_dict(h.to_dict())
+    assert copy.counts == h.counts
+    copy.merge(h)
+    assert copy.n_calls == 2000
+    assert copy.percentile(50) == h.percentile(50)
+
+
+def test_modules():
+    profiler = Profiler()
+    profiler.counting = True
+
+    def work(n_lines):
+        profiler._edges[0] += n_lines
+
+    timed = profiler.timed("work", work)
+    profiler.start_module("test_a.py")
+    timed(3)
+    timed(5)
+    profiler.module_times["test_a.py"] = 1.0
+    profiler.start_module("test_b.py")
+    timed(7)
+    profiler.module_times["test_b.py"] = 2.0
+
+    assert profiler.histograms["test_a.py"]["work"].n_calls == 2
+    assert profiler.histograms["test_a.py"]["work"].n_edges == 8
+    split = profiler.breakdown()
+    assert split["test_a.py"]["lines_written"] == 8
+    assert split["test_b.py"]["lines_written"] == 7
+    assert split["test_b.py"]["transfers"] == 0
+    assert split["test_b.py"]["other"] == 2.0
+
+    before = profiler.to_dict()
+    lines = profiler.summary(before)
+    assert lines[0].startswith("test_a.py")
+    assert "1.00x" in lines[1]
+
+
+@pytest.mark.skipif(
+    gpio_backend.backend_name() != "sim", reason="Needs the simulated GPIO backend"
+)
+def test_install():
+    import settle
+    from pi_backplane import _Input, _Output
+
+    gpio = gpio_backend.load()
+    original = _Output.send, gpio.output
+    saved = sim_gpio.attached()
+    profiler = Profiler()
+    profiler.install(count_lines=True)
+    try:
+        sim_gpio.attach(sim_gpio.BackplaneRig([board_models.Card()]))
+        output = _Output()
+        input = _Input()
+        profiler.start_module("test_x.py")
+        output.set_bus("A", 1)
+        output.send()
+        # Unchanged, so skipped, but still timed
+        output.send()
+        input.recv()
+        input.read("Cycle")
+        settle.SettleEngine({"Card.Line": 1e-3}).hold("Card", "Line")
+        profiler.module_times["test_x.py"] = 1.0
+    finally:
+        profiler.uninstall()
+        sim_gpio.attach(saved)
+    assert (_Output.send, gpio.output) == original
+
+    calls = profiler.histograms["test_x.py"]
+    assert calls["_Output.send"].n_calls == 2
+    assert calls["_Input.recv"].n_calls == 2
+    assert calls["SettleEngine.hold"].total_ns >= 1e6
+    # Select, then data and clock for each bit, and the latch
+    assert calls["_Output.send"].n_edges == 1 + 80 * 3 + 2
+    assert calls["_Input.recv"].n_edges == 2 * (4 + 3 * 80) - 3 * (80 - 13)
+
+    split = profiler.breakdown()["test_x.py"]
+    assert split["sleeping"] >= 1e-3
+    assert split["lines_read"] == 80 + 13
+
+
+@pytest.mark.skipif(
+    gpio_backend.backend_name() != "sim", reason="Needs the simulated GPIO backend"
+)
+def test_transact(monkeypatch):
+    import types
+
+    import pi_backplane
+    from pi_backplane import _Input, _Output
+
+    # A test module which imported transact by name, as
+    # test_alu_carrier.py does
+    module = types.ModuleType("test_uses_transact")
+    module.transact = pi_backplane.transact
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+
+    original = pi_backplane.transact
+    saved = sim_gpio.attached()
+    profiler = Profiler()
+    profiler.install()
+    try:
+        sim_gpio.attach(sim_gpio.BackplaneRig([board_models.Card()]))
+        output = _Output()
+        input = _Input()
+        profiler.start_module("test_uses_transact.py")
+        for _ in range(3):
+            module.transact(output, input)
+        profiler.module_times["test_uses_transact.py"] = 1.0
+    finally:
+        profiler.uninstall()
+        sim_gpio.attach(saved)
+    assert module.transact is pi_backplane.transact is original
+
+    calls = profiler.histograms["test_uses_transact.py"]
+    assert calls["pi_backplane.transact"].n_calls == 3
+    split = profiler.breakdown()["test_uses_transact.py"]
+    assert split["transfers"] > 0
+    assert split["other"] == pytest.approx(1.0 - split["transfers"])
@@ -0,0 +1,86 @@
+import pytest
+
+import board_models
+from assembler import assemble
+from emulator import EXECUTE
+from lockstep import Lockstep, LockstepDivergence
+
+
+PROGRAM = assemble(
+    """
+        set 0x5A, r1
+        set 0xC3, r2
+        set 0x60, r3
+        add r1, r2, r4
+        sub r1, r2, r5
+        compare r1, r2, r6
+        nand r1, r2, r7
+        xor r1, r2, r8
+        barrel r1, r2, r9
+        storew r3, r4
+        loadb r3, r10
+        loadw r3, r11
+        storeb r3, r9
+        loadpc r12
+        set skip, r13
+        branchzero r13, r0
+        halt
+skip:   halt r14
+    """
+)
+
+
+def test_program(backplane):
+    output, input = backplane
+
+    lockstep = Lockstep(output, input, PROGRAM)
+    stats = lockstep.run(max_instructions=100)
+    assert lockstep.server.halted
+    assert lockstep.emulator.halted
+    assert stats.n_instructions == lockstep.emulator.n_instructions == 17
+
+
+class _FaultyALUCard(board_models.ALUCarrierCard):
+    """Sets bit 8 of C on XOR."""
+
+    def drive(self, buses):
+        result = super().drive(buses)
+        if "C" in result and buses["Instruction"] & 0xF == 6:
+            result["C"] |= 0x100
+        return result
+
+
+def test_divergence(backplane, simulated_boards):
+    if simulated_boards is None:
+        pytest.skip("Needs the simulated GPIO backend")
+    output, input = backplane
+
+    cards = simulated_boards.cards
+    simulated_boards.cards = [
+        _FaultyALUCard() if isinstance(c, board_models.ALUCarrierCard) else c
+        for c in cards
+    ]
+    try:
+        lockstep = Lockstep(output, input, PROGRAM)
+        with pytest.raises(LockstepDivergence) as info:
+            lockstep.run(max_instructions=100)
+    finally:
+        simulated_boards.cards = cards
+
+    assert info.value.expected.cycle == EXECUTE
+    assert info.value.actual.C == info.value.expected.C | 0x100
+    assert lockstep.emulator.n_instructions == 7
+    assert "!! EXECUTE" in str(info.value)
+
+
+def test_memory_divergence(backplane):
+    output, input = backplane
+
+    lockstep = Lockstep(output, input, PROGRAM)
+    lockstep.server.memory[0x100] ^= 1
+    with pytest.raises(LockstepDivergence) as info:
+        lockstep.run(max_instructions=0)
+
+    # Before any stage was checked
+    assert info.value.expected is info.value.actual is None
+    assert "Memory differs first at 0x0100" in str(info.value)
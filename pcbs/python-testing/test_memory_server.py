@@ -0,0 +1,81 @@
+import pytest
+
+from assembler import assemble, encode
+from emulator import SlothPU16
+from memory_server import MemoryServer
+
+# Where the programs leave their results
+RESULTS = 0x80
+
+
+PROGRAMS = dict(
+    # Store the ALU results for a pair of constants
+    alu=f"""
+        set 0xA5, r1
+        set 0x3C, r2
+        set {RESULTS}, r3
+        set 2, r4
+        add r1, r2, r5
+        storew r3, r5
+        add r3, r4, r3
+        nand r1, r2, r5
+        storew r3, r5
+        add r3, r4, r3
+        compare r1, r2, r5
+        storeb r3, r5
+        loadpc r5
+        add r3, r4, r3
+        storew r3, r5
+        halt
+    """,
+    # Copy a table of words, in reverse, through a loop
+    copy=f"""
+        set table, r1           ; source
+        set {RESULTS + 8}, r2   ; destination end
+        set 2, r3
+        set 4, r4               ; count
+        set 1, r5
+        set loop, r6
+        set done, r7
+loop:   loadw r1, r8
+        sub r2, r3, r2
+        storew r2, r8
+        add r1, r3, r1
+        sub r4, r5, r4
+        branchzero r7, r4
+        branchzero r6, r0
+done:   loadb r1, r9
+        storeb r2, r9
+        halt
+        .org 0x40
+table:  .word 0x1234, 0xBEEF, 0x0F0F, 0x8001, 0x00AB
+    """,
+)
+
+
+@pytest.mark.parametrize("name", PROGRAMS.keys())
+def test_program(backplane, name: str):
+    output, input = backplane
+    image = assemble(PROGRAMS[name])
+
+    emu = SlothPU16(image)
+    n = emu.run(max_instructions=1000)
+    assert emu.halted
+
+    server = MemoryServer(output, input, image)
+    server.reset()
+    stats = server.run(max_instructions=1000)
+    assert server.halted
+    assert stats.n_instructions == n
+    assert stats.n_cycles == 5 * n
+    assert server.memory == emu.memory
+
+
+def test_max_instructions(backplane):
+    output, input = backplane
+    # Loop forever
+    server = MemoryServer(output, input, assemble("branchzero r0, r0"))
+    server.reset()
+    stats = server.run(max_instructions=3)
+    assert not server.halted
+    assert stats.n_instructions == 3
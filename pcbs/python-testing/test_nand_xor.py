@@ -1,84 +1,25 @@
-from typing import Dict, List, Union
-
 import bitarray
 import bitarray.util
 import pytest
 
-from tester_board import TesterBoard
+from connector_board import BoardSpec, make_board
 
 N_BITS = 8
 
 
-class NandXorALUBoard:
-    def __init__(self):
-        """Initialise with an internal Testerboard."""
-        self._tb = TesterBoard()
-
-        # Start with all outputs disabled
-        self._tb.enable_outputs([False for _ in range(5)])
-
-        # Set all outputs low
-        self._outputs = [0 for _ in range(self._tb.n_pins)]
-        self.send()
-
-        # Except NAND and XOR
-        self.NAND(True)
-        self.XOR(True)
-
-        # Enable outputs
-        self._tb.enable_outputs([True for _ in range(5)])
-
-        self.recv()
-
-    @property
-    def Output_Pins(self) -> Dict[str, Union[int, List[int]]]:
-        op = dict(
-            A=[0 + i for i in range(N_BITS)],
-            B=[16 + i for i in range(N_BITS)],
-            NAND=36,
-            XOR=37,
-        )
-        return op
-
-    @property
-    def Input_Pins(self) -> Dict[str, Union[int, List[int]]]:
-        ip = dict(C=[32 + i for i in range(N_BITS)])
-        return ip
-
-    def recv(self):
-        self._inputs = self._tb.recv()
-
-    def send(self):
-        self._tb.send(self._outputs)
-
-    def _write_bus(self, value: bitarray.bitarray, name: str):
-        assert len(value) == N_BITS
-
-        for i, curr_bit in enumerate(value):
-            self._outputs[self.Output_Pins[name][i]] = value[i]
-        self.send()
-
-    def write_A(self, value: bitarray.bitarray):
-        self._write_bus(value, "A")
-
-    def write_B(self, value: bitarray.bitarray):
-        self._write_bus(value, "B")
-
-    def NAND(self, value: bool):
-        self._outputs[self.Output_Pins["NAND"]] = value
-        self.send()
-
-    def XOR(self, value: bool):
-        self._outputs[self.Output_Pins["XOR"]] = value
-        self.send()
-
-    def read_C(self) -> bitarray.bitarray:
-        self.recv()
-        result = bitarray.bitarray(N_BITS, endian="little")
-        for i, pin in enumerate(self.Input_Pins["C"]):
-            result[i] = self._inputs[pin]
-
-        return result
+NAND_XOR = BoardSpec(
+    name="NandXorALUBoard",
+    outputs=dict(
+        A=[0 + i for i in range(N_BITS)],
+        B=[16 + i for i in range(N_BITS)],
+        NAND=36,
+        XOR=37,
+    ),
+    inputs=dict(C=[32 + i for i in range(N_BITS)]),
+    # NAND and XOR are active low
+    initial=dict(NAND=True, XOR=True),
+)
+NandXorALUBoard = make_board(NAND_XOR)
 
 
 pwr_2 = [2 ** x for x in range(N_BITS)]
@@ -96,75 +37,62 @@ others = [
 all_vals = pwr_2 + pwr_2_off + pwr_2_off_2 + others
 
 
+@pytest.fixture
+def nxcb(connector_board) -> NandXorALUBoard:
+    return connector_board(NandXorALUBoard)
+
+
 class TestXorNand:
     @pytest.mark.parametrize("a", all_vals)
     @pytest.mark.parametrize("b", all_vals)
-    def test_nand(self, a: int, b: int):
-        nxcb = NandXorALUBoard()
-
+    def test_nand(self, nxcb: NandXorALUBoard, a: int, b: int):
         a_bits = bitarray.util.int2ba(a, length=N_BITS, endian="little")
         b_bits = bitarray.util.int2ba(b, length=N_BITS, endian="little")
 
         expected = ~(a_bits & b_bits)
 
         # We are active low for this
-        nxcb.NAND(False)
-
-        nxcb.write_A(a_bits)
-        nxcb.write_B(b_bits)
+        nxcb.write(NAND=False, A=a_bits, B=b_bits)
 
         actual = nxcb.read_C()
 
-        assert expected == actual
+        assert bitarray.util.ba2int(expected) == actual
 
         # And check the off
-        nxcb.NAND(True)
-        zeros = bitarray.util.int2ba(0, length=N_BITS, endian="little")
-        assert zeros == nxcb.read_C()
+        nxcb.write_NAND(True)
+        assert 0 == nxcb.read_C()
 
     @pytest.mark.parametrize("a", all_vals)
     @pytest.mark.parametrize("b", all_vals)
-    def test_xor(self, a: int, b: int):
-        nxcb = NandXorALUBoard()
-
+    def test_xor(self, nxcb: NandXorALUBoard, a: int, b: int):
         a_bits = bitarray.util.int2ba(a, length=N_BITS, endian="little")
         b_bits = bitarray.util.int2ba(b, length=N_BITS, endian="little")
 
         expected = a_bits ^ b_bits
 
         # We are active low for this
-        nxcb.XOR(False)
-
-        nxcb.write_A(a_bits)
-        nxcb.write_B(b_bits)
+        nxcb.write(XOR=False, A=a_bits, B=b_bits)
 
         actual = nxcb.read_C()
 
-        assert expected == actual
+        assert bitarray.util.ba2int(expected) == actual
 
         # And check the off
-        nxcb.XOR(True)
-        zeros = bitarray.util.int2ba(0, length=N_BITS, endian="little")
-        assert zeros == nxcb.read_C()
+        nxcb.write_XOR(True)
+        assert 0 == nxcb.read_C()
 
     @pytest.mark.parametrize("a", all_vals)
     @pytest.mark.parametrize("b", all_vals)
-    def test_both_zero(self, a: int, b: int):
+    def test_both_zero(self, nxcb: NandXorALUBoard, a: int, b: int):
         # Verifies the interlock on having both active
-        nxcb = NandXorALUBoard()
-
         a_bits = bitarray.util.int2ba(a, length=N_BITS, endian="little")
         b_bits = bitarray.util.int2ba(b, length=N_BITS, endian="little")
 
         # Interlock should turn both outputs off
-        expected = bitarray.util.int2ba(0, length=N_BITS, endian="little")
+        expected = 0
 
         # Active low
-        nxcb.XOR(False)
-        nxcb.NAND(False)
-
-        nxcb.write_A(a_bits)
-        nxcb.write_B(b_bits)
+        nxcb.write(XOR=False, NAND=False, A=a_bits, B=b_bits)
 
         actual = nxcb.read_C()
 
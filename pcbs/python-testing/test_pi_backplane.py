@@ -1,6 +1,5 @@
 import pytest
 
-from pi_backplane import _Input, _Output
 
 bus_vals = [0, 1, 32768, 45534, 65535]
 cycle_vals = list(range(-1, 5))
@@ -11,9 +10,8 @@ cycle_vals = list(range(-1, 5))
 @pytest.mark.parametrize("C", bus_vals)
 @pytest.mark.parametrize("Instruction", bus_vals)
 @pytest.mark.parametrize("Cycle", cycle_vals)
-def test_buses(A, B, C, Instruction, Cycle):
-    output = _Output()
-    input = _Input()
+def test_buses(backplane, A, B, C, Instruction, Cycle):
+    output, input = backplane
 
     buses = ["A", "B", "C", "Instruction"]
     for bus in buses:
@@ -62,9 +60,8 @@ def test_buses(A, B, C, Instruction, Cycle):
     assert input.read_cycle() == -1
 
 
-def test_clock():
-    output = _Output()
-    input = _Input()
+def test_clock(backplane):
+    output, input = backplane
 
     output.set_oe("Clock", False)
 
@@ -89,9 +86,8 @@ def test_clock():
     assert input.read_clock() == False
 
 
-def test_reset():
-    output = _Output()
-    input = _Input()
+def test_reset(backplane):
+    output, input = backplane
 
     output.set_oe("Reset", False)
 
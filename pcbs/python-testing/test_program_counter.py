@@ -1,13 +1,9 @@
-import time
-
 import pytest
 
-import bitarray.util
-
-from constants import N_BITS, INSTR_BITS, INSTRUCTIONS
+from assembler import encode
+from constants import N_BITS
 from pi_backplane import _Input, _Output
-
-SLEEP_SECS = 0.1
+from settle import pulse_reset
 
 
 instr_non_pc = [
@@ -38,27 +34,23 @@ def prepare_program_counter(input: _Input, output: _Output):
     output.set_oe("Reset", False)
     output.send()
 
-    # Reset the PC register
-    output.set_reset(True)
-    output.send()
-    time.sleep(SLEEP_SECS)
-    output.set_reset(False)
-    output.send()
-    time.sleep(SLEEP_SECS)
-    output.set_reset(True)
+    # Reset the PC register, watching for it to clear. The PC only
+    # drives the A bus during instruction fetch, so stay there
+    # until the reset is over
+    def read_pc() -> int:
+        return input.read("A")["A"]
+
+    output.set_cycle(0)
+    pulse_reset(output, "ProgramCounter", observe=read_pc)
+    output.set_cycle(-1)
     output.send()
-    # This last is important, since it allows the
-    # RC networks in the RwR reset logic to return
-    # to 'base' state
-    time.sleep(SLEEP_SECS)
 
 
-def test_non_pc():
+def test_non_pc(backplane):
 
     bus_vals = dict(A=189, B=20049, C=40181)
 
-    output = _Output()
-    input = _Input()
+    output, input = backplane
 
     prepare_program_counter(input, output)
 
@@ -84,11 +76,7 @@ def test_non_pc():
         # Instruction Store -------------------
         output.set_cycle(1)
 
-        instr_bus = bitarray.util.zeros(N_BITS, endian="little")
-        instr_bus[0:3] = bitarray.util.int2ba(
-            INSTRUCTIONS[op], endian="little", length=INSTR_BITS
-        )
-        output.set_bus("Instruction", bitarray.util.ba2int(instr_bus))
+        output.set_bus("Instruction", encode(op, 0, 0, 0))
         output.send()
 
         input.recv()
@@ -139,11 +127,10 @@ def test_non_pc():
     input.recv()
 
 
-def test_halt():
+def test_halt(backplane):
     bus_vals = dict(A=189, B=20049, C=40181)
 
-    output = _Output()
-    input = _Input()
+    output, input = backplane
 
     prepare_program_counter(input, output)
 
@@ -169,11 +156,7 @@ def test_halt():
         # Instruction Store -------------------
         output.set_cycle(1)
 
-        instr_bus = bitarray.util.zeros(N_BITS, endian="little")
-        instr_bus[0:3] = bitarray.util.int2ba(
-            INSTRUCTIONS[op], endian="little", length=INSTR_BITS
-        )
-        output.set_bus("Instruction", bitarray.util.ba2int(instr_bus))
+        output.set_bus("Instruction", encode(op, 0, 0, 0))
         output.send()
 
         input.recv()
@@ -224,11 +207,10 @@ def test_halt():
     input.recv()
 
 
-def test_loadpc():
+def test_loadpc(backplane):
     bus_vals = dict(A=189, B=20049, C=40181)
 
-    output = _Output()
-    input = _Input()
+    output, input = backplane
 
     prepare_program_counter(input, output)
 
@@ -254,11 +236,7 @@ def test_loadpc():
         # Instruction Store -------------------
         output.set_cycle(1)
 
-        instr_bus = bitarray.util.zeros(N_BITS, endian="little")
-        instr_bus[0:3] = bitarray.util.int2ba(
-            INSTRUCTIONS[op], endian="little", length=INSTR_BITS
-        )
-        output.set_bus("Instruction", bitarray.util.ba2int(instr_bus))
+        output.set_bus("Instruction", encode(op, 0, 0, 0))
         output.send()
 
         input.recv()
@@ -311,12 +289,11 @@ def test_loadpc():
 
 
 @pytest.mark.parametrize("b_bit", range(N_BITS))
-def test_branchzero_nobranch(b_bit: int):
+def test_branchzero_nobranch(backplane, b_bit: int):
     assert b_bit < N_BITS
     bus_vals = dict(A=180, B=2 ** b_bit, C=40181)
 
-    output = _Output()
-    input = _Input()
+    output, input = backplane
 
     prepare_program_counter(input, output)
 
@@ -342,11 +319,7 @@ def test_branchzero_nobranch(b_bit: int):
         # Instruction Store -------------------
         output.set_cycle(1)
 
-        instr_bus = bitarray.util.zeros(N_BITS, endian="little")
-        instr_bus[0:3] = bitarray.util.int2ba(
-            INSTRUCTIONS[op], endian="little", length=INSTR_BITS
-        )
-        output.set_bus("Instruction", bitarray.util.ba2int(instr_bus))
+        output.set_bus("Instruction", encode(op, 0, 0, 0))
         output.send()
 
         input.recv()
@@ -401,11 +374,10 @@ def test_branchzero_nobranch(b_bit: int):
     input.recv()
 
 
-def test_branchzero_dobranch():
+def test_branchzero_dobranch(backplane):
     bus_vals = dict(A=189, B=0, C=40181)
 
-    output = _Output()
-    input = _Input()
+    output, input = backplane
 
     prepare_program_counter(input, output)
 
@@ -459,11 +431,7 @@ def test_branchzero_dobranch():
         # Instruction Store -------------------
         output.set_cycle(1)
 
-        instr_bus = bitarray.util.zeros(N_BITS, endian="little")
-        instr_bus[0:3] = bitarray.util.int2ba(
-            INSTRUCTIONS[op], endian="little", length=INSTR_BITS
-        )
-        output.set_bus("Instruction", bitarray.util.ba2int(instr_bus))
+        output.set_bus("Instruction", encode(op, 0, 0, 0))
         output.send()
 
         input.recv()
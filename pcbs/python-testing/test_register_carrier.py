@@ -1,10 +1,7 @@
 import pytest
 
-import bitarray.util
-
-from constants import N_BITS, INSTR_BITS, REG_BITS, INSTRUCTIONS
-from pi_backplane import _Input, _Output
-from utils import get_instruction
+from assembler import encode
+from constants import N_BITS, INSTRUCTIONS
 
 
 N_REGISTERS = 16
@@ -12,9 +9,8 @@ N_REGISTERS = 16
 
 @pytest.mark.parametrize("r_C", range(N_REGISTERS))
 @pytest.mark.parametrize("target_val", [0, 16385, (2 ** N_BITS) - 1])
-def test_smoke(r_C, target_val):
-    output = _Output()
-    input = _Input()
+def test_smoke(backplane, r_C, target_val):
+    output, input = backplane
 
     # We will read from A and B
     output.set_oe("A", True)
@@ -28,28 +24,9 @@ def test_smoke(r_C, target_val):
     # Anything except loadb, loadw or branchzero
     op = "loadpc"
 
-    instr_bus = bitarray.util.zeros(N_BITS, endian="little")
-    # Actual instruction is the first four bits
-
-    instr_bus[0:3] = bitarray.util.int2ba(
-        INSTRUCTIONS[op], endian="little", length=INSTR_BITS
-    )
-    reg_bits = bitarray.util.int2ba(r_C, endian="little", length=INSTR_BITS)
-
-    # r_A set by next four bits
-    instr_bus[4:7] = reg_bits
-
-    # And then r_B
-    instr_bus[8:11] = reg_bits
-
-    # r_C set by the final bits of the instruction
-    instr_bus[12:15] = reg_bits
-
-    print("instr_bus=", instr_bus)
-
     # Set things up
     output.set_bus("C", target_val)
-    output.set_bus("Instruction", bitarray.util.ba2int(instr_bus))
+    output.set_bus("Instruction", encode(op, r_C, r_C, r_C))
     output.send()
 
     # Do a simple sweep
@@ -71,9 +48,8 @@ def test_smoke(r_C, target_val):
     "target_val", [0, 144, 1037, 8195, 20125, 40008, (2 ** N_BITS) - 1]
 )
 @pytest.mark.parametrize("op", list(INSTRUCTIONS.keys()))
-def test_compute_cycle(r_C, target_val, op):
-    output = _Output()
-    input = _Input()
+def test_compute_cycle(backplane, r_C, target_val, op):
+    output, input = backplane
 
     # We will read from A and B
     output.set_oe("A", True)
@@ -89,9 +65,8 @@ def test_compute_cycle(r_C, target_val, op):
         # Anything except loadb, loadw or branchzero
         setup_op = "loadpc"
 
-        instr_bus = get_instruction(setup_op, r_i, r_i, r_i)
         output.set_bus("C", 2 ** r_i)
-        output.set_bus("Instruction", bitarray.util.ba2int(instr_bus))
+        output.set_bus("Instruction", encode(setup_op, r_i, r_i, r_i))
         output.send()
 
         for cyc in [3, 4]:
@@ -105,27 +80,25 @@ def test_compute_cycle(r_C, target_val, op):
     # For IFETCH and ISTORE, bus A and B should be zero
     for cyc in [0, 1]:
         for r_i in range(N_REGISTERS):
-            instr_bus = get_instruction(op, r_i, r_i, r_C)
-            output.set_bus("Instruction", bitarray.util.ba2int(instr_bus))
+            output.set_bus("Instruction", encode(op, r_i, r_i, r_C))
             output.set_cycle(cyc)
             output.send()
 
-            input.recv()
-            assert input.read_bus("A") == 0
-            assert input.read_bus("B") == 0
+            buses = input.read("A", "B")
+            assert buses["A"] == 0
+            assert buses["B"] == 0
 
     # FOR EXECUTE, bus A and B should read 2**i
     cyc = 2
     for r_A in range(N_REGISTERS):
         for r_B in range(N_REGISTERS):
-            instr_bus = get_instruction(op, r_A, r_B, r_C)
-            output.set_bus("Instruction", bitarray.util.ba2int(instr_bus))
+            output.set_bus("Instruction", encode(op, r_A, r_B, r_C))
             output.set_cycle(cyc)
             output.send()
 
-            input.recv()
-            assert input.read_bus("A") == 2 ** r_A
-            assert input.read_bus("B") == 2 ** r_B
+            buses = input.read("A", "B")
+            assert buses["A"] == 2 ** r_A
+            assert buses["B"] == 2 ** r_B
 
     # On COMMIT, A & B should start picking up target_value
     # except on  storeb, storew and branchzero
@@ -136,18 +109,17 @@ def test_compute_cycle(r_C, target_val, op):
     for cyc in [3, 4]:
         for r_A in range(N_REGISTERS):
             for r_B in range(N_REGISTERS):
-                instr_bus = get_instruction(op, r_A, r_B, r_C)
-                output.set_bus("Instruction", bitarray.util.ba2int(instr_bus))
+                output.set_bus("Instruction", encode(op, r_A, r_B, r_C))
                 output.set_cycle(cyc)
                 output.send()
 
-                input.recv()
+                buses = input.read("A", "B")
                 if r_A == r_C:
-                    assert input.read_bus("A") == expected_C
+                    assert buses["A"] == expected_C
                 else:
-                    assert input.read_bus("A") == 2 ** r_A
+                    assert buses["A"] == 2 ** r_A
                 if r_B == r_C:
-                    assert input.read_bus("B") == expected_C
+                    assert buses["B"] == expected_C
                 else:
-                    assert input.read_bus("B") == 2 ** r_B
+                    assert buses["B"] == 2 ** r_B
     input.recv()
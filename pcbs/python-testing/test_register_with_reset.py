@@ -31,40 +31,39 @@ other_vals = [
 all_vals = pwr_2 + pwr_2_off + pwr_2_off_2 + other_vals
 
 
+@pytest.fixture
+def rwrcb(connector_board) -> RWRConnectorBoard:
+    return connector_board(RWRConnectorBoard)
+
+
 class TestRWR:
     @pytest.mark.parametrize("target_value", all_vals)
-    def test_smoke(self, target_value: int):
-        rwrcb = RWRConnectorBoard()
-
+    def test_smoke(self, rwrcb: RWRConnectorBoard, target_value: int):
         # Check we can write a value
-        rwrcb.write_register(target_value)
-        rwrcb.Clock(True)
-        rwrcb.Clock(False)
-        assert rwrcb.read_register() == target_value
+        rwrcb.write_RegIn(target_value)
+        rwrcb.write_Clock(True)
+        rwrcb.write_Clock(False)
+        assert rwrcb.read_RegOut() == target_value
 
     @pytest.mark.parametrize("target_value", all_vals)
-    def test_output_enable(self, target_value: int):
-        rwrcb = RWRConnectorBoard()
-
-        rwrcb.write_register(target_value)
-        rwrcb.Clock(True)
-        rwrcb.Clock(False)
+    def test_output_enable(self, rwrcb: RWRConnectorBoard, target_value: int):
+        rwrcb.write_RegIn(target_value)
+        rwrcb.write_Clock(True)
+        rwrcb.write_Clock(False)
 
         # Check output enable
-        rwrcb.OE(True)
-        assert rwrcb.read_register() == 0
-        rwrcb.OE(False)
-        assert rwrcb.read_register() == target_value
+        rwrcb.write_OE(True)
+        assert rwrcb.read_RegOut() == 0
+        rwrcb.write_OE(False)
+        assert rwrcb.read_RegOut() == target_value
 
     @pytest.mark.parametrize("target_value", all_vals)
-    def test_reset(self, target_value: int):
-        rwrcb = RWRConnectorBoard()
-
-        rwrcb.write_register(target_value)
-        rwrcb.Clock(True)
-        rwrcb.Clock(False)
-        assert rwrcb.read_register() == target_value
+    def test_reset(self, rwrcb: RWRConnectorBoard, target_value: int):
+        rwrcb.write_RegIn(target_value)
+        rwrcb.write_Clock(True)
+        rwrcb.write_Clock(False)
+        assert rwrcb.read_RegOut() == target_value
 
         # Check Reset line
         rwrcb.Reset()
-        assert rwrcb.read_register() == 0
+        assert rwrcb.read_RegOut() == 0
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+import gpio_backend
+from settle import DEFAULT_MINIMUMS, SettleEngine
+
+
+def reads(*values):
+    """A read function returning the given values, then the last forever."""
+    it = iter(values)
+    last = [None]
+
+    def read():
+        last[0] = next(it, last[0])
+        return last[0]
+
+    return read
+
+
+def make_engine(**kwargs) -> SettleEngine:
+    # No minimum holds, so these tests run quickly
+    return SettleEngine({k: 0.0 for k in DEFAULT_MINIMUMS}, **kwargs)
+
+
+class TestSettleEngine:
+    def test_defaults(self):
+        engine = SettleEngine()
+        assert engine.minimums == DEFAULT_MINIMUMS
+        assert engine.minimum("Unknown", "Signal") == 0.0
+
+    def test_poll_stable(self):
+        engine = make_engine()
+        assert engine.poll("RWR", "RegOut", reads(5)) == 5
+        assert len(engine.observed["RWR.RegOut"]) == 1
+        assert engine.n_timeouts["RWR.RegOut"] == 0
+
+    def test_poll_waits_for_stable(self):
+        engine = make_engine(n_stable=3)
+        read = reads(1, 2, 2, 3, 3, 3, 4)
+        assert engine.poll("RWR", "RegOut", read) == 3
+
+    def test_poll_until(self):
+        engine = make_engine()
+        read = reads(7, 7, 7, 7, 0)
+        assert engine.poll("RWR", "Reset", read, until=lambda v: v == 0) == 0
+        assert engine.n_timeouts["RWR.Reset"] == 0
+
+    def test_poll_timeout(self):
+        engine = make_engine(timeout=0.01)
+        assert engine.poll("RWR", "Reset", reads(7), until=lambda v: v == 0) == 7
+        assert engine.n_timeouts["RWR.Reset"] == 1
+
+    def test_poll_holds_minimum(self):
+        engine = SettleEngine({"RWR.RegOut": 0.02})
+        engine.poll("RWR", "RegOut", reads(1))
+        assert engine.observed["RWR.RegOut"][0] >= 0.02
+
+    def test_calibration(self, tmp_path):
+        engine = make_engine(timeout=0.01)
+        engine.poll("RWR", "RegOut", reads(1))
+        engine.poll("RWR", "Reset", reads(7), until=lambda v: v == 0)
+
+        minimums = engine.calibration(margin=2.0)
+        assert minimums["RWR.RegOut"] == 2.0 * max(engine.observed["RWR.RegOut"])
+        # Timed out, so nothing learnt
+        assert minimums["RWR.Reset"] == 0.0
+
+        path = tmp_path / "settle.json"
+        engine.save(str(path), minimums)
+        with open(path) as f:
+            assert json.load(f) == minimums
+        assert SettleEngine(minimums).minimums == minimums
+
+    def test_from_environment(self, tmp_path, monkeypatch):
+        path = tmp_path / "settle.json"
+        path.write_text(json.dumps({"RWR.Reset": 0.005}))
+        monkeypatch.setenv("SLOTHPU_SETTLE_CALIBRATION", str(path))
+
+        engine = SettleEngine.from_environment()
+        assert engine.minimum("RWR", "Reset") == 0.005
+        assert engine.minimum("RWR", "ResetRecovery") == 0.1
+
+
+def test_shorten_holds():
+    import calibrate_settle
+
+    engine = SettleEngine({"PC.ResetCharge": 0.1, "PC.ResetRecovery": 0.1})
+
+    # Only the charge matters, and it needs 0.02 s
+    def trial():
+        return engine.minimums["PC.ResetCharge"] >= 0.02
+
+    keys = ["PC.ResetCharge", "PC.ResetRecovery"]
+    result = calibrate_settle.shorten_holds(engine, keys, trial, 3, margin=1.5)
+    assert result["PC.ResetCharge"] == pytest.approx(1.5 * 0.025)
+    # Halved until the floor
+    assert result["PC.ResetRecovery"] == pytest.approx(1.5 * 0.1 / 512)
+    assert {k: engine.minimums[k] for k in keys} == result
+
+
+@pytest.mark.skipif(
+    gpio_backend.backend_name() != "sim", reason="Needs the simulated GPIO backend"
+)
+@pytest.mark.parametrize("board", ["ir", "pc"])
+def test_reset_trials(board, monkeypatch):
+    import board_models
+    import calibrate_settle
+    import settle
+    import sim_gpio
+
+    cards = dict(
+        ir=board_models.InstructionRegisterCard(),
+        pc=board_models.ProgramCounterCard(),
+    )
+    monkeypatch.setattr(settle, "ENGINE", make_engine())
+    saved = sim_gpio.attached()
+    try:
+        sim_gpio.attach(sim_gpio.BackplaneRig([cards[board]]))
+        calibration = calibrate_settle.CALIBRATIONS[board]
+        calibration.calibrate(3)
+        assert len(settle.ENGINE.observed[calibration.polled[0]]) == 3
+        trial = calibration.trial()
+        assert all(trial() for _ in range(3))
+
+        # With nothing plugged in, the board never seems to work
+        sim_gpio.attach(sim_gpio.BackplaneRig([]))
+        settle.ENGINE.timeout = 0.01
+        assert not trial()
+    finally:
+        sim_gpio.attach(saved)
@@ -0,0 +1,542 @@
+import random
+
+import pytest
+
+import board_models
+import gpio_backend
+import sim_gpio
+
+N_PINS = 40
+
+# Tester board wiring
+CLK_OUT = 23
+COPI = 19
+SELECT_OUT = 24
+ENABLES = [15, 13, 7, 5, 3]
+CLK_IN = 40
+CIPO = 35
+SELECT_IN = 12
+LOAD_IN = 37
+
+
+class _Loopback:
+    """Connector board model which reflects the outputs back."""
+
+    def __init__(self):
+        self.pins = [0 for _ in range(N_PINS)]
+
+    def apply(self, pins):
+        self.pins = list(pins)
+
+    def inputs(self):
+        return self.pins
+
+
+@pytest.fixture
+def tester_rig():
+    saved = sim_gpio.attached()
+    rig = sim_gpio.TesterRig(_Loopback())
+    sim_gpio.attach(rig)
+    sim_gpio.setmode(sim_gpio.BOARD)
+    for p in [CLK_OUT, COPI, SELECT_OUT, CLK_IN, SELECT_IN, LOAD_IN] + ENABLES:
+        sim_gpio.setup(p, sim_gpio.OUT)
+    sim_gpio.setup(CIPO, sim_gpio.IN)
+    sim_gpio.output([SELECT_OUT, SELECT_IN, LOAD_IN], sim_gpio.HIGH)
+    sim_gpio.output(ENABLES, sim_gpio.LOW)
+    yield rig
+    sim_gpio.attach(saved)
+
+
+def _send(pins):
+    sim_gpio.output(SELECT_OUT, sim_gpio.LOW)
+    for i in reversed(range(N_PINS)):
+        sim_gpio.output(COPI, pins[i])
+        sim_gpio.output(CLK_OUT, sim_gpio.LOW)
+        sim_gpio.output(CLK_OUT, sim_gpio.HIGH)
+    sim_gpio.output(SELECT_OUT, sim_gpio.HIGH)
+
+
+def _recv():
+    result = [0 for _ in range(N_PINS)]
+    sim_gpio.output(LOAD_IN, sim_gpio.LOW)
+    sim_gpio.output(LOAD_IN, sim_gpio.HIGH)
+    sim_gpio.output(SELECT_IN, sim_gpio.LOW)
+    for i in reversed(range(N_PINS)):
+        result[i] = sim_gpio.input(CIPO)
+        sim_gpio.output(CLK_IN, sim_gpio.LOW)
+        sim_gpio.output(CLK_IN, sim_gpio.HIGH)
+    sim_gpio.output(SELECT_IN, sim_gpio.HIGH)
+    return result
+
+
+class TestTesterRig:
+    def test_loopback(self, tester_rig):
+        rng = random.Random(11)
+        for _ in range(20):
+            pins = [rng.randrange(2) for _ in range(N_PINS)]
+            _send(pins)
+            assert _recv() == pins
+
+    def test_latch_on_select(self, tester_rig):
+        pins = [1 for _ in range(N_PINS)]
+        sim_gpio.output(SELECT_OUT, sim_gpio.LOW)
+        for i in reversed(range(N_PINS)):
+            sim_gpio.output(COPI, pins[i])
+            sim_gpio.output(CLK_OUT, sim_gpio.LOW)
+            sim_gpio.output(CLK_OUT, sim_gpio.HIGH)
+        # Nothing appears until RCLK rises
+        assert _recv() == [0 for _ in range(N_PINS)]
+        sim_gpio.output(SELECT_OUT, sim_gpio.HIGH)
+        assert _recv() == pins
+
+    @pytest.mark.parametrize("bank", range(len(ENABLES)))
+    def test_enables(self, tester_rig, bank: int):
+        pins = [1 for _ in range(N_PINS)]
+        _send(pins)
+
+        # Active low
+        sim_gpio.output(ENABLES[bank], sim_gpio.HIGH)
+        expected = [0 if i // 8 == bank else 1 for i in range(N_PINS)]
+        assert _recv() == expected
+
+    def test_output_not_setup(self):
+        with pytest.raises(RuntimeError):
+            sim_gpio.output(2, sim_gpio.HIGH)
+
+
+class TestBackplaneRig:
+    def test_buses_or(self):
+        class DriveC(board_models.Card):
+            def drive(self, buses):
+                return dict(C=buses["A"] ^ 0xFF)
+
+        rig = sim_gpio.BackplaneRig([DriveC()])
+        rig.buses = rig._settle(
+            dict(A=0x1234, B=0, C=0x0F00, Instruction=0, Cycle=0, Clock=0, Reset=0)
+        )
+        assert rig.buses["C"] == 0x0F00 | 0x12CB
+
+    def test_register_carrier_commit(self):
+        card = board_models.RegisterCarrierCard()
+        idle = dict(A=0, B=0, C=0, Instruction=0, Cycle=1 << 2, Clock=0, Reset=1)
+        # add r1, r2 -> r3, with 0x55 on C
+        before = dict(idle, Instruction=0x3210, C=0x55)
+        after = dict(before, Cycle=1 << 3)
+        card.transition(before, after)
+        assert card.registers[3] == 0x55
+
+        # And no write for a store
+        card.transition(dict(before, Instruction=0x321A, C=1), after)
+        assert card.registers[3] == 0x55
+
+
+class TestConnectorModels:
+    def test_register_with_reset(self):
+        model = board_models.RegisterWithResetModel(
+            dict(RegIn=list(range(16)), Reset=16, Clock=17, OE=18),
+            dict(RegOut=list(range(20, 36))),
+        )
+        pins = [0 for _ in range(N_PINS)]
+
+        def apply(RegIn: int, Reset: int, Clock: int, OE: int) -> int:
+            for i in range(16):
+                pins[i] = (RegIn >> i) & 1
+            pins[16:19] = [Reset, Clock, OE]
+            model.apply(pins)
+            return sum(model.inputs()[20 + i] << i for i in range(16))
+
+        assert apply(0x1234, Reset=1, Clock=0, OE=0) == 0
+        assert apply(0x1234, Reset=1, Clock=1, OE=0) == 0x1234
+        # Reset is active low, and holds off the clock
+        assert apply(0x4321, Reset=0, Clock=0, OE=0) == 0
+        assert apply(0x4321, Reset=0, Clock=1, OE=0) == 0
+        assert apply(0x4321, Reset=1, Clock=0, OE=0) == 0
+        assert apply(0x4321, Reset=1, Clock=1, OE=0) == 0x4321
+        # As is output enable
+        assert apply(0x4321, Reset=1, Clock=1, OE=1) == 0
+
+    def test_add_subtract(self):
+        model = board_models.AddSubtractModel(
+            dict(A=list(range(8)), B=list(range(8, 16)), CarryIn=16, ADD=17, SUB=18),
+            dict(C=list(range(20, 28)), CarryOut=28),
+        )
+
+        def apply(A: int, B: int, CarryIn: int, ADD: int, SUB: int) -> int:
+            pins = [(A >> i) & 1 for i in range(8)] + [(B >> i) & 1 for i in range(8)]
+            pins += [CarryIn, ADD, SUB] + [0 for _ in range(N_PINS - 19)]
+            model.apply(pins)
+            return sum(model.inputs()[20 + i] << i for i in range(9))
+
+        assert apply(200, 100, 0, ADD=0, SUB=1) == 300
+        assert apply(100, 200, 1, ADD=1, SUB=0) == 156
+        assert apply(200, 100, 1, ADD=1, SUB=0) == 256 + 100
+        # Neither (or both) selected
+        assert apply(200, 100, 0, ADD=1, SUB=1) == 0
+        assert apply(200, 100, 0, ADD=0, SUB=0) == 0
+
+
+@pytest.mark.skipif(
+    gpio_backend.backend_name() != "sim", reason="Needs the simulated GPIO backend"
+)
+class TestHarness:
+    def test_backplane_roundtrip(self):
+        from pi_backplane import _Input, _Output
+
+        saved = sim_gpio.attached()
+        sim_gpio.attach(sim_gpio.BackplaneRig())
+        try:
+            output = _Output()
+            input = _Input()
+            for bus in ["A", "B", "C", "Instruction", "Cycle", "Clock"]:
+                output.set_oe(bus, False)
+            output.set_bus("A", 0x8001)
+            output.set_bus("B", 0x1234)
+            output.set_bus("C", 0xFEDC)
+            output.set_bus("Instruction", 0x00FF)
+            output.set_cycle(3)
+            output.set_clock(True)
+            output.send()
+
+            input.recv()
+            assert input.read_bus("A") == 0x8001
+            assert input.read_bus("B") == 0x1234
+            assert input.read_bus("C") == 0xFEDC
+            assert input.read_bus("Instruction") == 0x00FF
+            assert input.read_cycle() == 3
+            assert input.read_clock()
+            # Not enabled
+            assert not input.read_reset()
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_backplane_partial_read(self):
+        from pi_backplane import _Input, _Output
+
+        saved = sim_gpio.attached()
+        sim_gpio.attach(sim_gpio.BackplaneRig())
+        try:
+            output = _Output()
+            input = _Input()
+            for bus in ["A", "B", "C", "Cycle"]:
+                output.set_oe(bus, False)
+            output.set_bus("A", 0x8001)
+            output.set_bus("B", 0x1234)
+            output.set_bus("C", 0xFEDC)
+            output.set_cycle(2)
+            output.send()
+
+            assert input.read("Cycle") == dict(Cycle=2)
+            assert input.clocks_saved == 80 - 13
+            assert input.read("A", "B") == dict(A=0x8001, B=0x1234)
+            assert input.clocks_saved == 80 - 48
+            assert input.read("C") == dict(C=0xFEDC)
+            assert input.clocks_saved == 80 - 64
+            assert input.n_clocks_saved == 67 + 32 + 16
+
+            # And a full read is still complete afterwards
+            input.recv()
+            assert input.clocks_saved == 0
+            assert input.read_cycle() == 2
+        finally:
+            sim_gpio.attach(saved)
+
+    @pytest.mark.parametrize("pin", [0, 17, 32, 39])
+    def test_connector_partial_read(self, pin: int):
+        from connector_board import BoardSpec, make_board
+
+        board_type = make_board(
+            BoardSpec(
+                name="Loopback",
+                outputs=dict(Out=[i for i in range(N_PINS)]),
+                inputs=dict(In=pin, High=39),
+            )
+        )
+        saved = sim_gpio.attached()
+        sim_gpio.attach(sim_gpio.TesterRig(_Loopback()))
+        try:
+            board = board_type()
+            board.write_Out(1 << pin)
+            assert board.read("In") == dict(In=True)
+            assert board.clocks_saved == pin
+            assert board.read_High() == (pin == 39)
+            assert board.clocks_saved == 39
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_backplane_snapshot(self):
+        from pi_backplane import BackplaneSnapshot, _Input, _Output
+
+        saved = sim_gpio.attached()
+        sim_gpio.attach(sim_gpio.BackplaneRig())
+        try:
+            output = _Output()
+            input = _Input()
+            for bus in ["A", "B", "C", "Instruction", "Cycle", "Reset"]:
+                output.set_oe(bus, False)
+            output.set_bus("A", 0x0102)
+            output.set_bus("B", 0x0304)
+            output.set_bus("C", 0x0506)
+            output.set_bus("Instruction", 0x0708)
+            output.set_cycle(4)
+            output.set_reset(True)
+            output.send()
+
+            n_recvs = input.n_recvs
+            assert input.snapshot() == BackplaneSnapshot(
+                A=0x0102,
+                B=0x0304,
+                C=0x0506,
+                Instruction=0x0708,
+                Cycle=4,
+                Clock=False,
+                Reset=True,
+            )
+            assert input.n_recvs == n_recvs + 1
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_connector_snapshot(self):
+        from connector_board import BoardSpec, make_board
+
+        board_type = make_board(
+            BoardSpec(
+                name="Loopback",
+                outputs=dict(Out=[i for i in range(16)], Flag=39),
+                inputs=dict(Low=[i for i in range(8)], High=[8, 9, 10, 11], Flag=39),
+            )
+        )
+        saved = sim_gpio.attached()
+        sim_gpio.attach(sim_gpio.TesterRig(_Loopback()))
+        try:
+            board = board_type()
+            board.write(Out=0x0A5C, Flag=True)
+
+            n_recvs = board.n_recvs
+            snapshot = board.snapshot()
+            assert board.n_recvs == n_recvs + 1
+            assert (snapshot.Low, snapshot.High, snapshot.Flag) == (0x5C, 0xA, True)
+            with pytest.raises(AttributeError):
+                snapshot.Low = 0
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_connector_batch_raises(self):
+        from connector_board import BoardSpec, make_board
+
+        board_type = make_board(
+            BoardSpec(name="Loopback", outputs=dict(Out=list(range(8))), inputs=dict())
+        )
+        saved = sim_gpio.attached()
+        loopback = _Loopback()
+        sim_gpio.attach(sim_gpio.TesterRig(loopback))
+        try:
+            board = board_type()
+            with pytest.raises(RuntimeError):
+                with board.batch():
+                    board.write_Out(1 << 3)
+                    raise RuntimeError()
+            assert loopback.pins[3] == 0
+            board.write_Out(1 << 5)
+            # Nothing stale is latched by a later batch
+            with board.batch():
+                pass
+            assert loopback.pins[:8] == [0, 0, 0, 0, 0, 1, 0, 0]
+
+            # Nor after a batch abandoned part way through
+            blocks = board.batch()
+            blocks.__enter__()
+            board.write_Out(1 << 3)
+            board.reinitialise()
+            with board.batch():
+                pass
+            assert loopback.pins[:8] == [0] * 8
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_backplane_batch_raises(self):
+        from pi_backplane import _Input, _Output
+
+        saved = sim_gpio.attached()
+        sim_gpio.attach(sim_gpio.BackplaneRig())
+        try:
+            output = _Output()
+            input = _Input()
+            output.set_oe("A", False)
+            output.send()
+            with pytest.raises(RuntimeError):
+                with output.batch():
+                    output.set_bus("A", 1 << 3)
+                    output.send()
+                    raise RuntimeError()
+            assert input.read("A") == dict(A=0)
+            output.set_bus("A", 1 << 5)
+            output.send()
+            output.set_bus("A", 1 << 3)
+            with output.batch():
+                pass
+            assert input.read("A") == dict(A=1 << 5)
+        finally:
+            sim_gpio.attach(saved)
+
+    @staticmethod
+    def _count_latches(rig) -> list:
+        """A list which gains an entry each time the rig latches its outputs."""
+        latches = []
+        latch = rig.shift_out.latch
+
+        def counted():
+            latches.append(list(rig.shift_out.stages))
+            latch()
+
+        rig.shift_out.latch = counted
+        return latches
+
+    def test_tester_send_skipped(self):
+        from tester_board import TesterBoard
+
+        saved = sim_gpio.attached()
+        loopback = _Loopback()
+        rig = sim_gpio.TesterRig(loopback)
+        sim_gpio.attach(rig)
+        try:
+            board = TesterBoard()
+            latches = self._count_latches(rig)
+            frame = [i % 3 == 0 for i in range(N_PINS)]
+            board.send(frame)
+            board.send(list(frame))
+            assert (board.n_sends, board.n_sends_skipped) == (1, 1)
+            assert len(latches) == 1
+            assert loopback.pins == [int(p) for p in frame]
+
+            # A changed frame is still sent after a skip
+            frame[7] = not frame[7]
+            board.send(frame)
+            assert (board.n_sends, board.n_sends_skipped) == (2, 1)
+            assert len(latches) == 2
+            assert loopback.pins == [int(p) for p in frame]
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_backplane_send_skipped(self):
+        from pi_backplane import _Input, _Output
+
+        saved = sim_gpio.attached()
+        rig = sim_gpio.BackplaneRig()
+        sim_gpio.attach(rig)
+        try:
+            output = _Output()
+            input = _Input()
+            latches = self._count_latches(rig)
+            output.set_oe("A", False)
+            output.set_bus("A", 0x1234)
+            output.send()
+            output.send()
+            assert (output.n_sends, output.n_sends_skipped) == (1, 1)
+            assert len(latches) == 1
+            assert input.read("A") == dict(A=0x1234)
+
+            # A changed frame is still sent after a skip
+            output.set_bus("A", 0x4321)
+            output.send()
+            assert (output.n_sends, output.n_sends_skipped) == (2, 1)
+            assert len(latches) == 2
+            assert input.read("A") == dict(A=0x4321)
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_transact_in_batch(self):
+        from pi_backplane import _Input, _Output, transact
+
+        saved = sim_gpio.attached()
+        rig = sim_gpio.BackplaneRig()
+        sim_gpio.attach(rig)
+        try:
+            output = _Output()
+            input = _Input()
+            latches = self._count_latches(rig)
+            with output.batch():
+                output.set_oe("A", False)
+                output.set_bus("A", 0x1234)
+                output.send()
+                transact(output, input)
+                assert len(latches) == 1
+            # The send deferred before transact() is not repeated
+            assert len(latches) == 1
+            assert (output.n_sends, output.n_sends_skipped) == (1, 0)
+            assert input.read("A") == dict(A=0x1234)
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_connector_batch(self):
+        from connector_board import BoardSpec, make_board
+
+        board_type = make_board(
+            BoardSpec(
+                name="Loopback",
+                outputs=dict(Low=list(range(8)), High=list(range(8, 16)), Bit=16),
+                inputs=dict(),
+            )
+        )
+        saved = sim_gpio.attached()
+        loopback = _Loopback()
+        rig = sim_gpio.TesterRig(loopback)
+        sim_gpio.attach(rig)
+        try:
+            board = board_type()
+            latches = self._count_latches(rig)
+            n_sends = board.n_sends
+            with board.batch():
+                board.write_Low(0x12)
+                board.write_High(0x34)
+                with board.batch():
+                    board.write_Bit(True)
+                    board.write(Low=0x56)
+                assert len(latches) == 0
+            assert len(latches) == 1
+            assert board.n_sends == n_sends + 1
+            expected = [(0x3456 >> i) & 1 for i in range(16)] + [1]
+            assert loopback.pins[:17] == expected
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_backplane_batch(self):
+        from pi_backplane import _Input, _Output
+
+        saved = sim_gpio.attached()
+        rig = sim_gpio.BackplaneRig()
+        sim_gpio.attach(rig)
+        try:
+            output = _Output()
+            input = _Input()
+            latches = self._count_latches(rig)
+            with output.batch():
+                output.set_oe("A", False)
+                output.send()
+                output.set_bus("A", 0x12)
+                output.send()
+                with output.batch():
+                    output.set_bus("A", 0x1234)
+                    output.send()
+                assert len(latches) == 0
+            assert len(latches) == 1
+            assert output.n_sends == 1
+            assert input.read("A") == dict(A=0x1234)
+        finally:
+            sim_gpio.attach(saved)
+
+    def test_transact_clocks_saved(self):
+        from pi_backplane import _Input, _Output, transact
+
+        saved = sim_gpio.attached()
+        sim_gpio.attach(sim_gpio.BackplaneRig())
+        try:
+            output = _Output()
+            input = _Input()
+            input.read("Cycle")
+            assert input.clocks_saved > 0
+            n_clocks_saved = input.n_clocks_saved
+            transact(output, input)
+            assert input.clocks_saved == 0
+            assert input.n_clocks_saved == n_clocks_saved
+        finally:
+            sim_gpio.attach(saved)
@@ -0,0 +1,80 @@
+import bitarray
+import bitarray.util
+import pytest
+
+import fake_spidev
+from spi_transport import SPITransport
+
+N_PINS = 40
+
+
+def make_transport() -> SPITransport:
+    return SPITransport.open(n_pins=N_PINS, spidev_module=fake_spidev)
+
+
+class TestSPITransport:
+    def test_open(self):
+        spi = make_transport()
+
+        assert (spi._out_dev.bus, spi._out_dev.device) == (0, 0)
+        assert (spi._in_dev.bus, spi._in_dev.device) == (1, 0)
+        for dev in [spi._out_dev, spi._in_dev]:
+            assert dev.mode == 0
+            assert dev.max_speed_hz > 0
+
+        spi.close()
+        assert spi._out_dev.bus is None
+        assert spi._in_dev.bus is None
+
+    @pytest.mark.parametrize("pin", range(N_PINS))
+    def test_send_single_pin(self, pin: int):
+        spi = make_transport()
+
+        pins = bitarray.bitarray([i == pin for i in range(N_PINS)], endian="little")
+        spi.send(pins)
+
+        # One transfer, with pin 39 clocked out first
+        assert len(spi._out_dev.transfers) == 1
+        sent = spi._out_dev.transfers[0]
+        assert len(sent) == N_PINS // 8
+        bits = [(sent[j // 8] >> (7 - j % 8)) & 1 == 1 for j in range(N_PINS)]
+        assert bits == list(reversed(pins.tolist()))
+
+    @pytest.mark.parametrize("pin", range(N_PINS))
+    def test_recv_single_pin(self, pin: int):
+        spi = make_transport()
+
+        # The first bit clocked in is pin 39
+        miso = [0] * (N_PINS // 8)
+        first_bit = N_PINS - 1 - pin
+        miso[first_bit // 8] = 1 << (7 - first_bit % 8)
+        spi._in_dev.miso = miso
+
+        result = bitarray.util.zeros(N_PINS, endian="little")
+        spi.recv(result)
+        assert result.tolist() == [i == pin for i in range(N_PINS)]
+        assert spi._in_dev.transfers == [[0] * (N_PINS // 8)]
+
+    @pytest.mark.parametrize("n_bits", [1, 8, 9, 33])
+    def test_recv_partial(self, n_bits: int):
+        spi = make_transport()
+        spi._in_dev.miso = [0xFF] * (N_PINS // 8)
+
+        result = bitarray.util.zeros(N_PINS, endian="little")
+        n_bytes = (n_bits + 7) // 8
+        assert spi.recv(result, n_bits) == 8 * n_bytes
+        assert spi._in_dev.transfers == [[0] * n_bytes]
+        # Only the highest pins are shifted in
+        assert result.tolist() == [i >= N_PINS - 8 * n_bytes for i in range(N_PINS)]
+
+    def test_roundtrip(self):
+        spi = make_transport()
+
+        pins = bitarray.bitarray(
+            [(i * 7) % 3 == 0 for i in range(N_PINS)], endian="little"
+        )
+        spi.send(pins)
+        spi._in_dev.miso = spi._out_dev.transfers[-1]
+        result = bitarray.util.zeros(N_PINS, endian="little")
+        spi.recv(result)
+        assert result == pins
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import timing
+from timing import Arc, analyse, critical_path
+
+
+@pytest.fixture(scope="module")
+def report() -> timing.Report:
+    return analyse()
+
+
+def test_critical_path():
+    arcs = [
+        Arc("a", "b", 10, "U1"),
+        Arc("b", "c", 10, "U2"),
+        Arc("a", "c", 15, "U3"),
+        # A loop through a transceiver is cut, not followed forever
+        Arc("c", "b", 5, "U4"),
+        Arc("x", "y", 100, "U5"),
+    ]
+    path = critical_path(arcs, ["a"], {"c": 3, "y": 0})
+    assert path.delay == 23
+    assert [step.net for step in path.steps] == ["a", "b", "c"]
+    assert [step.reference for step in path.steps] == ["", "U1", "U2"]
+
+    assert critical_path(arcs, ["a"], {"y": 0}) is None
+
+
+def test_classes(report: timing.Report):
+    def references(name):
+        return [step.reference for step in report.classes[name].steps]
+
+    # The carry ripples through the adders of both boards
+    adder = references("add/sub")
+    for board in ["J3001", "J3002"]:
+        assert f"ALU Carrier/{board}/U3" in adder
+    assert "ALU Carrier/J6001/U101" in references("barrel")
+    for name, used in timing.ALU_CLASSES.items():
+        for step in report.classes[name].steps[1:]:
+            board = step.reference.split("/")[1]
+            assert not board.startswith("J") or board in used
+        assert report.classes[name].delay <= report.machine.delay
+
+
+def test_stage_time(report: timing.Report):
+    assert report.machine.steps[0].net in timing.STAGE_NETS
+    assert report.stage_time == timing.MARGIN * report.machine.delay
+    assert 100 < report.stage_time < 10000
+
+
+def test_calibration(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "calibration.json"
+    path.write_text(json.dumps({"RWR.Reset": 0.2}))
+    monkeypatch.setattr("sys.argv", ["timing.py", "--calibration", str(path)])
+    timing.main()
+    assert "Minimum stage time" in capsys.readouterr().out
+    minimums = json.loads(path.read_text())
+    assert minimums["RWR.Reset"] == 0.2
+    assert 1e-7 < minimums["Backplane.Stage"] < 1e-5
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+import golden_model
+import vectors
+
+N_BITS = 8
+ALL_VALUES = range(2 ** N_BITS)
+
+
+@pytest.mark.parametrize("levels", [[2] * 12, [2, 3, 4, 5], [2] * 6 + [16, 3]])
+@pytest.mark.parametrize("t", [1, 2, 3])
+def test_covering_array(levels, t: int):
+    rows = vectors.covering_array(levels, t)
+    assert np.all(rows >= 0) and np.all(rows < np.array(levels))
+    assert vectors.tway_coverage(rows, levels, t).fraction == 1.0
+
+
+def test_covering_array_initial():
+    levels = [2] * 8
+    initial = np.zeros((1, 8), dtype=np.int64)
+    rows = vectors.covering_array(levels, 2, initial=initial)
+    assert not np.any(np.all(rows == 0, axis=1))
+    both = np.vstack([initial, rows])
+    assert vectors.tway_coverage(both, levels, 2).fraction == 1.0
+
+
+@pytest.mark.parametrize("op", ["add", "sub"])
+def test_adder_cell_pairs(op: str):
+    pairs = vectors.adder_cell_pairs(N_BITS, subtract=op == "sub")
+    report = vectors.operand_coverage(op, op, pairs, N_BITS)
+    assert report.get("adder cells").fraction == 1.0
+
+
+def test_chains():
+    add = vectors.operand_coverage("add", "add", vectors.carry_chains(N_BITS), N_BITS)
+    assert add.get("carry chain lengths").fraction == 1.0
+    sub = vectors.operand_coverage("sub", "sub", vectors.borrow_chains(N_BITS), N_BITS)
+    assert sub.get("carry chain lengths").fraction == 1.0
+
+
+def test_walking():
+    assert vectors.walking_ones(4) == [1, 2, 4, 8]
+    assert vectors.walking_zeros(4) == [14, 13, 11, 7]
+    pairs = vectors.walking_pairs(N_BITS)
+    report = vectors.operand_coverage("xor", "xor", pairs, N_BITS)
+    assert report.get("operand bits").fraction == 1.0
+
+
+@pytest.mark.parametrize("op", [op for op in golden_model.OPERATIONS if op != "barrel"])
+def test_plan_matches_exhaustive(op: str):
+    full = vectors.operand_coverage(
+        "full", op, vectors.cross(ALL_VALUES, ALL_VALUES), N_BITS
+    )
+    pairs = vectors.plan_operands(op, 3, N_BITS)
+    planned = vectors.operand_coverage("planned", op, pairs, N_BITS)
+    assert len(pairs) < len(ALL_VALUES) ** 2 // 100
+    assert [c.name for c in planned.items] == [c.name for c in full.items]
+    for c in planned.items:
+        assert c.covered == full.get(c.name).covered, c.name
+
+    # Planning is repeatable
+    assert pairs == vectors.plan_operands(op, 3, N_BITS)
+
+
+def test_plan_rotations():
+    shifts = range(2 * N_BITS)
+    full = vectors.operand_coverage(
+        "full", "barrel", vectors.cross(ALL_VALUES, shifts), N_BITS
+    )
+    pairs = vectors.plan_rotations(shifts, 3, N_BITS)
+    planned = vectors.operand_coverage("planned", "barrel", pairs, N_BITS)
+    assert len(pairs) < len(ALL_VALUES) * len(shifts) // 4
+    assert planned.get("rotation paths").fraction == 1.0
+    assert planned.get("3-wise").covered == full.get("3-wise").covered
+
+
+def test_plan_writes():
+    offsets = [0, 1, 127]
+    writes = vectors.plan_writes(3, N_BITS, 16, offsets)
+    reads = vectors.port_pairs(16)
+    report = vectors.register_coverage("rf", writes, reads, N_BITS, 16, offsets)
+    assert all(c.fraction == 1.0 for c in report.items)
+    assert len(reads) == 32
+    assert {o for _, _, o in writes} == set(offsets)
+
+
+def test_lower_strength_covers_less():
+    pairs = vectors.plan_operands("xor", 1, N_BITS)
+    report = vectors.operand_coverage("xor", "xor", pairs, N_BITS)
+    assert report.get("operand bits").fraction == 1.0
+    assert report.get("3-wise").fraction < 1.0
+    assert report.lines()[0] == f"xor: {len(pairs)} vectors"
+
+
+def test_selection(monkeypatch):
+    monkeypatch.delenv(vectors.VECTORS_ENV, raising=False)
+    assert vectors.strength() == vectors.DEFAULT_STRENGTH
+    monkeypatch.setenv(vectors.VECTORS_ENV, "Full")
+    assert vectors.strength() is None
+    monkeypatch.setenv(vectors.VECTORS_ENV, "2")
+    assert vectors.strength() == 2
+    monkeypatch.setenv(vectors.VECTORS_ENV, "lots")
+    with pytest.raises(ValueError):
+        vectors.selection()
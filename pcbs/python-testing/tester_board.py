@@ -1,79 +1,235 @@
-from typing import List
+import contextlib
+import os
 
-import RPi.GPIO as GPIO
+from typing import List, Optional, Union
 
+import bitarray
+import bitarray.util
 
-class TesterBoard:
-    def __init__(self):
-        """Initialise instance and also RPi.GPIO."""
-        self.n_pins = 40
+import gpio_backend
+import gpio_trace
 
-        # Board pin numbers for output
-        self._clk_out = 23
-        self._copi = 19
-        self._select_out = 24
-        self._enable_out = [15, 13, 7, 5, 3]
+GPIO = gpio_backend.load()
 
-        # Board pin numbers for input
-        self._clk_in = 40
-        self._select_in = 12
-        self._load_in = 37
-        self._cipo = 35
+# Set to 'spi' to use the hardware SPI peripherals by default
+TRANSPORT_ENV = "TESTER_BOARD_TRANSPORT"
 
-        # Configure the board
-        GPIO.setmode(GPIO.BOARD)
+
+class BitBangTransport:
+    def __init__(
+        self,
+        n_pins: int,
+        clk_out: int,
+        copi: int,
+        select_out: int,
+        clk_in: int,
+        cipo: int,
+        select_in: int,
+    ):
+        """Shift frames through the chains by toggling GPIO lines directly.
+
+        Assumes that GPIO.setmode has already been called."""
+        self.n_pins = n_pins
+
+        self._clk_out = clk_out
+        self._copi = copi
+        self._select_out = select_out
+        self._clk_in = clk_in
+        self._cipo = cipo
+        self._select_in = select_in
 
         # Set up output side
         GPIO.setup(self._clk_out, GPIO.OUT)
         GPIO.setup(self._copi, GPIO.OUT)
         GPIO.setup(self._select_out, GPIO.OUT)
         GPIO.output(self._select_out, GPIO.HIGH)
-        for p in self._enable_out:
-            GPIO.setup(p, GPIO.OUT)
-            GPIO.output(p, GPIO.LOW)
 
         # Setup intput side
         GPIO.setup(self._clk_in, GPIO.OUT)
         GPIO.setup(self._select_in, GPIO.OUT)
         GPIO.output(self._select_in, GPIO.HIGH)
-        GPIO.setup(self._load_in, GPIO.OUT)
         GPIO.setup(self._cipo, GPIO.IN)
 
-    def send(self, pins: List[bool]):
-        """Send given array to the outputs."""
-        assert len(pins) == self.n_pins
-
+    def send(self, pins: bitarray.bitarray):
+        """Shift out the given frame and latch it."""
         GPIO.output(self._select_out, GPIO.LOW)
+        data_clock = (self._copi, self._clk_out)
         # Pin 0 is the last clocked out
         for i in reversed(range(self.n_pins)):
-            GPIO.output(self._copi, pins[i])
-            GPIO.output(self._clk_out, GPIO.LOW)
+            # Present the data with the clock low, then clock it in
+            GPIO.output(data_clock, (pins[i], GPIO.LOW))
             GPIO.output(self._clk_out, GPIO.HIGH)
         GPIO.output(self._select_out, GPIO.HIGH)
 
-    def recv(self) -> List[bool]:
-        """Receive all the inputs."""
-        result = [False for _ in range(self.n_pins)]
+    def recv(self, result: bitarray.bitarray, n_bits: Optional[int] = None) -> int:
+        """Shift a frame which has already been loaded into result.
 
-        # Load the data
-        GPIO.output(self._load_in, GPIO.LOW)
-        GPIO.output(self._load_in, GPIO.HIGH)
-
-        # Clock everything in
+        If n_bits is given, only that many bits (from the highest
+        pin down) are shifted in. Returns the number of bits
+        clocked."""
+        if n_bits is None:
+            n_bits = self.n_pins
         GPIO.output(self._select_in, GPIO.LOW)
-        for i in reversed(range(self.n_pins)):
+        for i in reversed(range(self.n_pins - n_bits, self.n_pins)):
             result[i] = GPIO.input(self._cipo) == 1
             GPIO.output(self._clk_in, GPIO.LOW)
             GPIO.output(self._clk_in, GPIO.HIGH)
         GPIO.output(self._select_in, GPIO.HIGH)
+        return n_bits
+
+
+class TesterBoard:
+    def __init__(self, transport=None):
+        """Initialise instance and also RPi.GPIO.
+
+        The shift register chains are driven through the given
+        transport. If none is supplied, the choice is made by the
+        TESTER_BOARD_TRANSPORT environment variable: 'spi' selects
+        spi_transport.SPITransport, otherwise the GPIO lines are
+        bit-banged."""
+        self.n_pins = 40
+
+        # Board pin numbers for output
+        self._clk_out = 23
+        self._copi = 19
+        self._select_out = 24
+        self._enable_out = [15, 13, 7, 5, 3]
+
+        # Board pin numbers for input
+        self._clk_in = 40
+        self._select_in = 12
+        self._load_in = 37
+        self._cipo = 35
+
+        # Configure the board
+        GPIO.setmode(GPIO.BOARD)
+
+        # Enables and load are always driven directly
+        GPIO.setup(self._enable_out, GPIO.OUT)
+        GPIO.output(self._enable_out, GPIO.LOW)
+        GPIO.setup(self._load_in, GPIO.OUT)
+
+        if transport is None and os.environ.get(TRANSPORT_ENV) == "spi":
+            from spi_transport import SPITransport
+
+            transport = SPITransport.open(self.n_pins)
+        if transport is None:
+            transport = BitBangTransport(
+                self.n_pins,
+                clk_out=self._clk_out,
+                copi=self._copi,
+                select_out=self._select_out,
+                clk_in=self._clk_in,
+                cipo=self._cipo,
+                select_in=self._select_in,
+            )
+        assert transport.n_pins == self.n_pins
+        self._transport = transport
+
+        # Pin images, with pin i as bit i. The input image is
+        # overwritten in place by each recv()
+        self._inputs = bitarray.util.zeros(self.n_pins, endian="little")
+
+        # What the 595s currently hold, so that unchanged frames
+        # need not be shifted out again
+        self._latched = bitarray.util.zeros(self.n_pins, endian="little")
+        self._latched_valid = False
+        self.n_sends = 0
+        self.n_sends_skipped = 0
+
+        # Input clock edges not needed by partial reads, for the
+        # last recv() and in total
+        self.clocks_saved = 0
+        self.n_clocks_saved = 0
+        self.n_recvs = 0
+
+        # Frame waiting to be sent at the end of a batch
+        self._batch_depth = 0
+        self._pending = None
+
+        # Where the frames moved are recorded, if anywhere (see
+        # gpio_trace.py)
+        self.trace = gpio_trace.RECORDER
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Defer sending until the end of the block.
+
+        Sends inside the block only record the frame, and the last
+        one recorded is latched (once) when the block exits. If the
+        block raises, the frame recorded is dropped."""
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._pending = None
+            raise
+        finally:
+            self._batch_depth -= 1
+        if self._batch_depth == 0 and self._pending is not None:
+            pending = self._pending
+            self._pending = None
+            self.send(pending)
+
+    def cancel_batch(self):
+        """Drop any frame deferred by batch(), and leave all blocks."""
+        self._batch_depth = 0
+        self._pending = None
+
+    def send(self, pins: Union[bitarray.bitarray, List[bool]]):
+        """Send given array to the outputs.
+
+        Nothing is shifted out if the array matches what was last
+        latched."""
+        assert len(pins) == self.n_pins
+        if not isinstance(pins, bitarray.bitarray):
+            pins = bitarray.bitarray(pins, endian="little")
+
+        if self._batch_depth > 0:
+            self._pending = pins
+            return
+
+        if self._latched_valid and pins == self._latched:
+            self.n_sends_skipped += 1
+            return
+
+        self._transport.send(pins)
+        self._latched[:] = pins
+        self._latched_valid = True
+        self.n_sends += 1
+        if self.trace is not None:
+            self.trace.record(gpio_trace.TESTER, gpio_trace.SEND, pins, self.n_pins)
+
+    def recv(self, lowest_pin: int = 0) -> bitarray.bitarray:
+        """Receive the inputs.
+
+        The highest pin is shifted in first, so only the inputs from
+        lowest_pin up need be clocked in; the rest of the image keeps
+        its old contents. The image returned is reused, and will be
+        overwritten by the next call."""
+        assert lowest_pin >= 0 and lowest_pin < self.n_pins
+        self.n_recvs += 1
+
+        # Load the data
+        GPIO.output(self._load_in, GPIO.LOW)
+        GPIO.output(self._load_in, GPIO.HIGH)
 
-        return result
+        # Clock in as much as is needed
+        n_bits = self.n_pins - lowest_pin
+        if n_bits == self.n_pins:
+            n_bits = None
+        clocked = self._transport.recv(self._inputs, n_bits)
+        self.clocks_saved = self.n_pins - clocked
+        self.n_clocks_saved += self.clocks_saved
+        if self.trace is not None:
+            self.trace.record(gpio_trace.TESTER, gpio_trace.RECV, self._inputs, clocked)
+        return self._inputs
 
     def enable_outputs(self, output_banks: List[bool]):
         """Control output enabling by bank of 8 pins."""
         PINS_PER_595 = 8
         assert len(output_banks) == self.n_pins / PINS_PER_595
 
-        # Recall that the 595 has active low output enable
-        for i in range(len(output_banks)):
-            GPIO.output(self._enable_out[i], not output_banks[i])
+        # Recall that the 595 has active low output enable, and
+        # set them all with one call
+        GPIO.output(self._enable_out, [not enabled for enabled in output_banks])
@@ -0,0 +1,323 @@
+"""Static timing analysis of the boards, from their schematics.
+
+Each gate (see gate_sim.py) becomes a set of arcs from its input nets
+to its output nets, with the part's propagation delay from DELAYS.
+The registers (74HC574) start new paths at their clock and output
+enable pins, and end them at their data pins, which need the setup
+time before the clock. The longest path from a change on the cycle
+bus to the end of a path is then the shortest time a stage of the
+compute cycle can safely last:
+
+    python timing.py
+
+reports the critical path of the whole machine, and through the ALU
+for each instruction class (with only that class's boards plugged
+into the ALU carrier), and with --calibration writes the stage time
+to a settle calibration file (see settle.py) for the memory server.
+
+The analysis is conservative: every path counts, whether or not the
+logic can ever make it switch, and where transceivers could drive
+either way, loops are cut where the search first meets them.
+"""
+
+import argparse
+import collections
+import json
+import os
+import re
+
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence
+
+from gate_sim import CARD_BOARDS, MODELS, POWER_LEVELS, machine
+from kicad_netlist import Component, Netlist
+
+# Maximum propagation delays (ns) at VCC = 4.5 V and 25 C, from the
+# data sheets, by part number: the delay from any input, then the
+# delays from particular input pins, or (input, output) pin pairs
+DELAYS: Dict[str, tuple] = {
+    "00": (18, {}),
+    "04": (19, {}),
+    "08": (18, {}),
+    "14": (25, {}),
+    "85": (63, {"2": 44, "3": 44, "4": 44}),
+    "86": (24, {}),
+    "125": (25, {"1": 30, "4": 30, "10": 30, "13": 30}),
+    "138": (38, {"4": 36, "5": 36, "6": 36}),
+    "245": (22, {"1": 38, "19": 38}),
+    # Into the carry out (pin 9) is a little quicker than into a sum
+    "283": (
+        53,
+        {(p, "9"): 46 for p in ["2", "3", "5", "6", "7", "11", "12", "14", "15"]},
+    ),
+    "540": (22, {"1": 38, "19": 38}),
+    "4245": (7, {"2": 10, "22": 10}),
+}
+
+# Delays (ns) from the clock and output enable of the registers to
+# their outputs, and the setup time of their data inputs
+REGISTERS = {
+    "574": dict(
+        clock="11",
+        enable="1",
+        data=[str(p) for p in range(2, 10)],
+        outputs=[str(p) for p in range(19, 11, -1)],
+        clock_to_output=38,
+        enable_to_output=38,
+        setup=15,
+    ),
+}
+
+# Faster logic families, relative to HC and HCT
+FAMILY_SCALE = {"AHC": 0.5, "AHCT": 0.5}
+
+# Allowance over the 25 C figures, for temperature, loading, and the
+# wiring between the boards
+MARGIN = 1.5
+
+# The nets the Pi drives to step through the compute cycle
+STAGE_NETS = [f"Cycle{i}" for i in range(5)] + ["CLOCK", "RESET"]
+
+# The boards in the ALU carrier's sockets, for each instruction class
+ALU_CLASSES = {
+    "add/sub": ["J3001", "J3002"],
+    "compare": ["J4001"],
+    "nand/xor": ["J5001", "J5002"],
+    "barrel": ["J6001", "J6002"],
+}
+
+_PART = re.compile(r"^(?:SN)?74([A-Z]*)(\d+)[A-Z]*$")
+
+
+class Arc(NamedTuple):
+    source: str
+    target: str
+    delay: float
+    reference: str
+
+
+class Step(NamedTuple):
+    net: str
+    # The part the path goes through to get to the net
+    reference: str
+    arrival: float
+
+
+class Path(NamedTuple):
+    # Including the setup time, where the path ends at a register
+    delay: float
+    steps: List[Step]
+
+    def lines(self) -> List[str]:
+        lines = [f"{self.delay:7.1f} ns"]
+        for step in self.steps:
+            lines.append(f"{step.arrival:7.1f} ns  {step.net}  ({step.reference})")
+        return lines
+
+
+def _delay(number: str, family: str, in_pin: str, out_pin: str) -> float:
+    default, overrides = DELAYS[number]
+    delay = overrides.get((in_pin, out_pin), overrides.get(in_pin, default))
+    return delay * FAMILY_SCALE.get(family, 1.0)
+
+
+def _one_way(component: Component, number: str) -> Dict[str, bool]:
+    """For transceivers whose direction is fixed, which pins only
+    ever drive (True) or are driven (False)."""
+    direction = {"245": "1", "4245": "2"}.get(number)
+    if direction is None or component.pins.get(direction) not in POWER_LEVELS:
+        return dict()
+    elements = MODELS[number](component)
+    n = len(elements[0].output_pins) // 2
+    a_pins = elements[0].output_pins[:n]
+    a_to_b = POWER_LEVELS[component.pins[direction]] == 1
+    return {p: (p in a_pins) == a_to_b for p in elements[0].output_pins}
+
+
+def arcs(netlist: Netlist, include: Optional[Iterable[str]] = None) -> List[Arc]:
+    """The timing arcs of the parts (with references starting with
+    one of include, if given)."""
+    prefixes = tuple(include) if include is not None else None
+    result = []
+    for component in netlist.components.values():
+        if prefixes is not None and not component.reference.startswith(prefixes):
+            continue
+        match = _PART.match(component.value)
+        if match is None:
+            continue
+        family, number = match.groups()
+        if number in REGISTERS:
+            r = REGISTERS[number]
+            for out in r["outputs"]:
+                for pin, delay in [
+                    (r["clock"], r["clock_to_output"]),
+                    (r["enable"], r["enable_to_output"]),
+                ]:
+                    if pin in component.pins and out in component.pins:
+                        result.append(
+                            Arc(
+                                component.pins[pin],
+                                component.pins[out],
+                                delay * FAMILY_SCALE.get(family, 1.0),
+                                component.reference,
+                            )
+                        )
+            continue
+        if number not in DELAYS or number not in MODELS:
+            continue
+        drives = _one_way(component, number)
+        for element in MODELS[number](component):
+            for in_pin, source in zip(element.input_pins, element.inputs):
+                if not drives.get(in_pin, True):
+                    continue
+                for out_pin, target in zip(element.output_pins, element.outputs):
+                    if out_pin == in_pin or drives.get(out_pin, False):
+                        continue
+                    delay = _delay(number, family, in_pin, out_pin)
+                    result.append(Arc(source, target, delay, component.reference))
+    return result
+
+
+def setup_times(netlist: Netlist) -> Dict[str, float]:
+    """The setup time needed on each net feeding a register's data input."""
+    result: Dict[str, float] = dict()
+    for component in netlist.components.values():
+        match = _PART.match(component.value)
+        if match is None or match.group(2) not in REGISTERS:
+            continue
+        r = REGISTERS[match.group(2)]
+        for pin in r["data"]:
+            net = component.pins.get(pin)
+            if net is not None and net not in POWER_LEVELS:
+                result[net] = max(result.get(net, 0.0), r["setup"])
+    return result
+
+
+def critical_path(
+    arc_list: Sequence[Arc],
+    sources: Iterable[str],
+    sinks: Mapping[str, float],
+) -> Optional[Path]:
+    """The longest path from any of the sources to any of the sinks
+    (each with the time needed there after the path), or None."""
+    into: Dict[str, List[Arc]] = collections.defaultdict(list)
+    for arc in arc_list:
+        into[arc.target].append(arc)
+    sources = set(sources)
+
+    # Latest arrival at each net, and the arc it came through
+    arrival: Dict[str, float] = dict()
+    via: Dict[str, Optional[Arc]] = dict()
+    on_stack = set()
+
+    def visit(start: str):
+        stack = [(start, iter(into[start]))]
+        on_stack.add(start)
+        while stack:
+            net, pending = stack[-1]
+            for arc in pending:
+                if arc.source not in arrival and arc.source not in on_stack:
+                    on_stack.add(arc.source)
+                    stack.append((arc.source, iter(into[arc.source])))
+                    break
+            else:
+                stack.pop()
+                on_stack.discard(net)
+                best, best_arc = (0.0, None) if net in sources else (None, None)
+                for arc in into[net]:
+                    t = arrival.get(arc.source)
+                    if t is not None and (best is None or t + arc.delay > best):
+                        best, best_arc = t + arc.delay, arc
+                arrival[net] = best
+                via[net] = best_arc
+
+    for net in sinks:
+        if net not in arrival:
+            visit(net)
+
+    ends = [
+        (arrival[n] + extra, n) for n, extra in sinks.items() if arrival[n] is not None
+    ]
+    if not ends:
+        return None
+    delay, net = max(ends)
+    steps = []
+    while True:
+        arc = via[net]
+        steps.append(Step(net, arc.reference if arc else "", arrival[net]))
+        if arc is None:
+            break
+        net = arc.source
+    return Path(delay, steps[::-1])
+
+
+class Report(NamedTuple):
+    # The critical path of the whole machine, and for each ALU class
+    machine: Path
+    classes: Dict[str, Path]
+
+    @property
+    def stage_time(self) -> float:
+        """The shortest safe time (ns) for each stage of the cycle."""
+        return MARGIN * self.machine.delay
+
+    def lines(self) -> List[str]:
+        lines = ["Machine:"] + self.machine.lines()
+        for name, path in self.classes.items():
+            lines += ["", f"ALU {name}:"] + path.lines()
+        lines += [
+            "",
+            f"Minimum stage time {self.stage_time:.1f} ns with {MARGIN}x margin,"
+            f" {5 * self.stage_time:.1f} ns for the five stage cycle",
+        ]
+        return lines
+
+
+def _bus_nets(netlist: Netlist, buses: str) -> List[str]:
+    return [net for net in netlist.nets if re.match(f"^[{buses}]\\d+$", net)]
+
+
+def analyse(netlist: Optional[Netlist] = None) -> Report:
+    """Analyse the machine (or another netlist with the same cards)."""
+    if netlist is None:
+        netlist = machine()
+    sinks: Dict[str, float] = {net: 0.0 for net in _bus_nets(netlist, "ABC")}
+    for net, setup in setup_times(netlist).items():
+        sinks[net] = max(sinks.get(net, 0.0), setup)
+    worst = critical_path(arcs(netlist), STAGE_NETS, sinks)
+
+    # From the ALU's inputs to C, with the boards of the other classes
+    # left out
+    alu_arcs = arcs(netlist, include=["ALU Carrier/"])
+    alu_sources = _bus_nets(netlist, "ABI") + STAGE_NETS
+    alu_sinks = {net: 0.0 for net in _bus_nets(netlist, "C")}
+    sockets = [s for s, _, _ in CARD_BOARDS["ALU Carrier"]]
+    classes = dict()
+    for name, used in ALU_CLASSES.items():
+        others = tuple(f"ALU Carrier/{s}/" for s in sockets if s not in used)
+        class_arcs = [a for a in alu_arcs if not a.reference.startswith(others)]
+        classes[name] = critical_path(class_arcs, alu_sources, alu_sinks)
+    return Report(worst, classes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--calibration",
+        help="settle calibration file to add the stage time to (see settle.py)",
+    )
+    args = parser.parse_args()
+
+    report = analyse()
+    print("\n".join(report.lines()))
+    if args.calibration:
+        minimums = dict()
+        if os.path.exists(args.calibration):
+            with open(args.calibration) as f:
+                minimums = json.load(f)
+        minimums["Backplane.Stage"] = report.stage_time * 1e-9
+        with open(args.calibration, "w") as f:
+            json.dump(minimums, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+"""Plan compact sets of test vectors, with a report of what they cover.
+
+Crossing every interesting value of A with every one of B costs
+thousands of hardware transactions per operation. Most faults only
+need a few bits (or a few factors) to be set the right way at once,
+so a much smaller set can exercise the same things:
+
+* walking ones and zeros, which isolate each bit of each operand
+* carry (and borrow) chains of every length, for the adder
+* t-wise covering arrays, in which every combination of values for
+  every t of the factors (such as the bits of A and B) appears
+
+Each plan comes with a CoverageReport, which counts the fault
+conditions the vectors exercise (such as each full adder cell seeing
+all eight of its input combinations). Comparing the report and size
+of a plan with those of the full cross product shows what is traded
+for the shorter run.
+
+The hardware tests use planned vectors of strength 3 by default. The
+SLOTHPU_VECTORS environment variable selects another strength, or
+"full" for the original cross products. Reports made while planning
+are listed at the end of the session by conftest.py.
+"""
+
+import itertools
+import os
+
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+import golden_model
+from constants import N_BITS
+
+VECTORS_ENV = "SLOTHPU_VECTORS"
+FULL = "full"
+DEFAULT_STRENGTH = 3
+
+# Random candidate rows scored for each row of a covering array
+N_CANDIDATES = 32
+
+# Rows marked as covered at once, when measuring coverage
+COVER_BLOCK = 256
+
+# The strengths of bit interaction always reported
+REPORT_STRENGTHS = (2, 3)
+
+ADDER_OPS = ("add", "sub")
+
+Pairs = List[Tuple[int, int]]
+
+
+def selection() -> str:
+    """'full', or the strength of covering array to plan with."""
+    value = os.environ.get(VECTORS_ENV, str(DEFAULT_STRENGTH)).strip().lower()
+    if value != FULL and not value.isdigit():
+        raise ValueError(f"{VECTORS_ENV} should be '{FULL}' or a strength")
+    return value
+
+
+def strength() -> Optional[int]:
+    """The selected covering array strength (None for the full sets)."""
+    value = selection()
+    return None if value == FULL else int(value)
+
+
+def _mask(n_bits: int) -> int:
+    return (1 << n_bits) - 1
+
+
+def walking_ones(n_bits: int = N_BITS) -> List[int]:
+    return [1 << i for i in range(n_bits)]
+
+
+def walking_zeros(n_bits: int = N_BITS) -> List[int]:
+    return [_mask(n_bits) ^ (1 << i) for i in range(n_bits)]
+
+
+def walking_pairs(n_bits: int = N_BITS) -> Pairs:
+    """A walking one in each operand against a walking zero in the other.
+
+    Every bit of each operand is seen alone, against the opposite
+    value everywhere else."""
+    ones, zeros = walking_ones(n_bits), walking_zeros(n_bits)
+    return list(zip(ones, zeros)) + list(zip(zeros, ones))
+
+
+def carry_chains(n_bits: int = N_BITS) -> Pairs:
+    """Operands for A + B which ripple a carry through each length.
+
+    A carry is started at each bit and runs out of the top, and one
+    is started at bit 0 and runs for each length."""
+    mask = _mask(n_bits)
+    pairs = [(mask & ~((1 << s) - 1), 1 << s) for s in range(n_bits)]
+    pairs += [((1 << n) - 1, 1) for n in range(1, n_bits)]
+    return pairs
+
+
+def adder_cell_pairs(n_bits: int = N_BITS, subtract: bool = False) -> Pairs:
+    """Operands giving every full adder all eight of its input combinations.
+
+    The classic set for a ripple carry adder: each vector gives every
+    cell the same combination, or alternates two which pass the
+    carry on (bit 0 only sees its fixed carry in). A subtractor adds
+    the complement of the second operand with a carry in, so the
+    second operand is complemented here too."""
+    mask = _mask(n_bits)
+    alternate = sum(1 << i for i in range(0, n_bits, 2))
+    pairs = [
+        (0, 0),
+        (mask, mask),
+        (mask, 0),
+        (0, mask),
+        (alternate, alternate),
+        (mask ^ alternate, mask ^ alternate),
+    ]
+    if subtract:
+        # Bit 0 kills the carry in, so the rest propagate a zero
+        pairs += [(mask ^ 1, 0), (0, mask ^ 1)]
+        return [(A, mask ^ B) for A, B in pairs]
+    # Bit 0 generates a carry, which the rest propagate
+    return pairs + [(mask, 1), (1, mask)]
+
+
+def borrow_chains(n_bits: int = N_BITS) -> Pairs:
+    """Operands for A - B which ripple a borrow through each length."""
+    pairs = [(0, 1 << s) for s in range(n_bits)]
+    pairs += [(1 << n, 1) for n in range(1, n_bits)]
+    return pairs
+
+
+def magnitude_pairs(n_bits: int = N_BITS) -> Pairs:
+    """Operands which differ in a single bit, each way round.
+
+    For a comparator, the single bit decides the result, with all
+    the bits below it both zero and one."""
+    pairs = []
+    for base in (0, _mask(n_bits)):
+        for i in range(n_bits):
+            pairs.append((base, base ^ (1 << i)))
+            pairs.append((base ^ (1 << i), base))
+        pairs.append((base, base))
+    return pairs
+
+
+class _Tuples:
+    """The t-wise combinations of factor levels, and which are covered."""
+
+    def __init__(self, levels: Sequence[int], t: int):
+        self.levels = np.asarray(levels, dtype=np.int64)
+        t = min(t, len(levels))
+        self.subsets = np.array(
+            list(itertools.combinations(range(len(levels)), t)), dtype=np.int64
+        ).reshape(-1, t)
+        sizes = self.levels[self.subsets]
+        # Mixed radix strides, so each combination has an index
+        self.strides = np.cumprod(sizes[:, ::-1], axis=1)[:, ::-1] // sizes
+        self.n_combinations = sizes.prod(axis=1)
+        width = int(self.n_combinations.max()) if len(self.subsets) else 0
+        self.uncovered = (
+            np.arange(width)[np.newaxis, :] < self.n_combinations[:, np.newaxis]
+        )
+        self.total = int(self.n_combinations.sum())
+
+    def _indices(self, rows: np.ndarray) -> np.ndarray:
+        return (rows[:, self.subsets] * self.strides).sum(axis=-1)
+
+    def gain(self, rows: np.ndarray) -> np.ndarray:
+        """The number of uncovered combinations each row would cover."""
+        index = self._indices(rows)
+        return self.uncovered[np.arange(len(self.subsets)), index].sum(axis=-1)
+
+    def cover(self, rows: np.ndarray):
+        subsets = np.arange(len(self.subsets))[np.newaxis, :]
+        # A block of rows at a time, to bound the memory used
+        for start in range(0, len(rows), COVER_BLOCK):
+            index = self._indices(rows[start : start + COVER_BLOCK])
+            self.uncovered[subsets, index] = False
+
+    @property
+    def n_uncovered(self) -> int:
+        return int(self.uncovered.sum())
+
+
+def covering_array(
+    levels: Sequence[int],
+    t: int = 2,
+    seed: int = 0,
+    initial: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Rows in which every t-wise combination of factor levels appears.
+
+    levels gives the number of levels of each factor (2 for a bit).
+    Rows are added greedily: each starts from an uncovered combination,
+    and the best of some random candidates is then improved one factor
+    at a time. Rows in initial count as already chosen (and are not
+    part of the result)."""
+    rng = np.random.default_rng(seed)
+    levels = np.asarray(levels, dtype=np.int64)
+    tuples = _Tuples(levels, t)
+    if initial is not None and len(initial):
+        tuples.cover(np.asarray(initial, dtype=np.int64))
+
+    rows = []
+    while tuples.n_uncovered:
+        candidates = rng.integers(0, levels, size=(N_CANDIDATES, len(levels)))
+        # Make sure each candidate covers something new
+        subset_ids, combos = np.nonzero(tuples.uncovered)
+        picks = rng.integers(0, len(subset_ids), size=N_CANDIDATES)
+        for candidate, pick in zip(candidates, picks):
+            subset = tuples.subsets[subset_ids[pick]]
+            candidate[subset] = (
+                combos[pick] // tuples.strides[subset_ids[pick]]
+            ) % levels[subset]
+        row = candidates[np.argmax(tuples.gain(candidates))]
+
+        best = tuples.gain(row[np.newaxis, :])[0]
+        for factor in rng.permutation(len(levels)):
+            options = np.repeat(row[np.newaxis, :], levels[factor], axis=0)
+            options[:, factor] = np.arange(levels[factor])
+            gains = tuples.gain(options)
+            if gains.max() > best:
+                row, best = options[np.argmax(gains)], gains.max()
+        tuples.cover(row[np.newaxis, :])
+        rows.append(row)
+    return np.array(rows, dtype=np.int64).reshape(-1, len(levels))
+
+
+def _to_bits(values: Iterable[int], n_bits: int) -> np.ndarray:
+    values = np.asarray(list(values), dtype=np.int64)
+    return (values[:, np.newaxis] >> np.arange(n_bits)) & 1
+
+
+def _from_bits(bits: np.ndarray) -> List[int]:
+    return [int(v) for v in (bits << np.arange(bits.shape[1])).sum(axis=1)]
+
+
+def covering_pairs(
+    t: int, n_bits: int = N_BITS, seed: int = 0, initial: Pairs = ()
+) -> Pairs:
+    """Operand pairs covering every t-wise combination of the bits of A and B."""
+    if t <= 0:
+        return []
+    start = None
+    if initial:
+        A, B = zip(*initial)
+        start = np.hstack([_to_bits(A, n_bits), _to_bits(B, n_bits)])
+    rows = covering_array([2] * (2 * n_bits), t, seed, start)
+    return list(zip(_from_bits(rows[:, :n_bits]), _from_bits(rows[:, n_bits:])))
+
+
+def _unique(pairs: Iterable[Tuple[int, int]]) -> Pairs:
+    return list(dict.fromkeys(pairs))
+
+
+def plan_operands(op: str, t: int, n_bits: int = N_BITS, seed: int = 0) -> Pairs:
+    """A compact set of (A, B) pairs for an ALU operation.
+
+    The structured patterns for the operation come first, and a
+    covering array of strength t fills in what they leave out."""
+    mask = _mask(n_bits)
+    pairs = [(0, 0), (mask, mask), (0, mask), (mask, 0)]
+    pairs += walking_pairs(n_bits)
+    if op == "add":
+        pairs += adder_cell_pairs(n_bits) + carry_chains(n_bits)
+    elif op == "sub":
+        pairs += adder_cell_pairs(n_bits, subtract=True) + borrow_chains(n_bits)
+    elif op == "compare":
+        pairs += magnitude_pairs(n_bits)
+    pairs = _unique(pairs)
+    return pairs + covering_pairs(t, n_bits, seed, pairs)
+
+
+def plan_rotations(
+    shifts: Sequence[int], t: int, n_bits: int = N_BITS, seed: int = 0
+) -> Pairs:
+    """(A, B) pairs for the barrel shifter, with each of the shifts.
+
+    Every shift is tried with all zeros and ones (so each path
+    through the shifter carries both values), a single one and a
+    single zero (so each shift can be told from the others), and a
+    covering array over the bits of A."""
+    mask = _mask(n_bits)
+    values = [0, mask, 1, mask ^ 1]
+    start = _to_bits(values, n_bits)
+    if t > 0:
+        values += _from_bits(covering_array([2] * n_bits, t, seed, start))
+    return [(A, B) for A in values for B in shifts]
+
+
+def port_pairs(n_registers: int) -> Pairs:
+    """(A, B) register selects for a file with two read ports.
+
+    Each register is read on both ports, with the same register on
+    the other port and with its complement, which between them put
+    every pair of select bits through all four combinations."""
+    return [(i, i) for i in range(n_registers)] + [
+        (i, n_registers - 1 - i) for i in range(n_registers)
+    ]
+
+
+def write_levels(n_bits: int, n_registers: int, n_offsets: int) -> List[int]:
+    """Factor levels for a register write: the value bits, register and offset."""
+    return [2] * n_bits + [n_registers, n_offsets]
+
+
+def plan_writes(
+    t: int, n_bits: int, n_registers: int, offsets: Sequence[int], seed: int = 0
+) -> List[Tuple[int, int, int]]:
+    """(value, register, offset) cases for register writes.
+
+    The offset picks the background values in the other registers.
+    The cases cover every t-wise combination of the value bits, the
+    register and the offset."""
+    rows = covering_array(write_levels(n_bits, n_registers, len(offsets)), t, seed)
+    values = _from_bits(rows[:, :n_bits])
+    return [
+        (value, int(reg), offsets[o])
+        for value, reg, o in zip(values, rows[:, n_bits], rows[:, n_bits + 1])
+    ]
+
+
+def cross(A_values: Sequence[int], B_values: Sequence[int]) -> Pairs:
+    return [(A, B) for A in A_values for B in B_values]
+
+
+class Coverage(NamedTuple):
+    name: str
+    covered: int
+    total: int
+
+    @property
+    def fraction(self) -> float:
+        return self.covered / self.total if self.total else 1.0
+
+
+class CoverageReport(NamedTuple):
+    name: str
+    n_vectors: int
+    items: List[Coverage]
+
+    def get(self, name: str) -> Coverage:
+        return next(c for c in self.items if c.name == name)
+
+    def lines(self) -> List[str]:
+        lines = [f"{self.name}: {self.n_vectors} vectors"]
+        for c in self.items:
+            lines.append(
+                f"    {c.name:24s} {c.covered:7d} / {c.total:7d}"
+                f" {100 * c.fraction:7.2f} %"
+            )
+        return lines
+
+
+def tway_coverage(
+    rows: np.ndarray, levels: Sequence[int], t: int, name: Optional[str] = None
+) -> Coverage:
+    """How many of the t-wise combinations of factor levels the rows hold."""
+    tuples = _Tuples(levels, t)
+    if len(rows):
+        tuples.cover(np.asarray(rows, dtype=np.int64))
+    return Coverage(
+        name or f"{t}-wise", tuples.total - tuples.n_uncovered, tuples.total
+    )
+
+
+def _seen(items: np.ndarray, total: int, name: str) -> Coverage:
+    """Coverage of the distinct non-negative item numbers given."""
+    items = np.asarray(items).ravel()
+    return Coverage(name, len(np.unique(items[items >= 0])), total)
+
+
+def _carries(A: np.ndarray, B: np.ndarray, carry_in: int, n_bits: int) -> np.ndarray:
+    """The carry into each bit, and out of the top, as rows of bits."""
+    carries = (A + B + carry_in) ^ A ^ B
+    return (carries[:, np.newaxis] >> np.arange(n_bits + 1)) & 1
+
+
+def _adder_cells(A: np.ndarray, B: np.ndarray, carry_in: int, n_bits: int) -> Coverage:
+    """Input combinations (a, b, carry in) seen by each full adder.
+
+    The carry into bit 0 is fixed, so it can only see four."""
+    bit = np.arange(n_bits)
+    a, b = [(x[:, np.newaxis] >> bit) & 1 for x in (A, B)]
+    c = _carries(A, B, carry_in, n_bits)[:, :n_bits]
+    return _seen(bit * 8 + a * 4 + b * 2 + c, 8 * n_bits - 4, "adder cells")
+
+
+def _carry_chains(A: np.ndarray, B: np.ndarray, carry_in: int, n_bits: int) -> Coverage:
+    """Lengths of the runs of bits a carry rippled through (up to n_bits)."""
+    carries = _carries(A, B, carry_in, n_bits)
+    run = np.zeros(len(A), dtype=np.int64)
+    lengths = []
+    for i in range(n_bits + 2):
+        if i <= n_bits:
+            set_ = carries[:, i] == 1
+        else:
+            set_ = np.zeros(len(A), dtype=bool)
+        # A run is counted where it ends
+        lengths.append(np.where(~set_ & (run > 0), np.minimum(run, n_bits) - 1, -1))
+        run = np.where(set_, run + 1, 0)
+    return _seen(np.array(lengths), n_bits, "carry chain lengths")
+
+
+def _comparisons(A: np.ndarray, B: np.ndarray, n_bits: int) -> Coverage:
+    """The deciding bit (the highest which differs) each way round, or equal."""
+    diff = A ^ B
+    top = np.where(diff > 0, np.floor(np.log2(np.maximum(diff, 1))), -1).astype(int)
+    item = np.where(top < 0, 2 * n_bits, 2 * top + (A > B))
+    return _seen(item, 2 * n_bits + 1, "deciding bits")
+
+
+def _bit_values(values: np.ndarray, n_bits: int, name: str) -> Coverage:
+    bits = (values[:, np.newaxis] >> np.arange(n_bits)) & 1
+    return _seen(2 * np.arange(n_bits) + bits, 2 * n_bits, name)
+
+
+def _rotation_paths(A: np.ndarray, B: np.ndarray, n_bits: int) -> Coverage:
+    """(shift, bit of A, value) combinations, for each path through the shifter."""
+    bit = np.arange(n_bits)
+    values = (A[:, np.newaxis] >> bit) & 1
+    shift = (B % n_bits)[:, np.newaxis]
+    return _seen(
+        (shift * n_bits + bit) * 2 + values, 2 * n_bits * n_bits, "rotation paths"
+    )
+
+
+def operand_coverage(
+    name: str,
+    op: str,
+    pairs: Pairs,
+    n_bits: int = N_BITS,
+    strengths: Sequence[int] = REPORT_STRENGTHS,
+) -> CoverageReport:
+    """What a set of (A, B) pairs exercises, for the given ALU operation."""
+    A = np.array([a for a, _ in pairs], dtype=np.int64)
+    B = np.array([b for _, b in pairs], dtype=np.int64)
+    bits = np.hstack([_to_bits(A, n_bits), _to_bits(B, n_bits)])
+
+    items = [tway_coverage(bits, [2] * (2 * n_bits), 1, "operand bits")]
+    items += [tway_coverage(bits, [2] * (2 * n_bits), t) for t in strengths]
+    if op in ADDER_OPS:
+        # The subtractor adds the complement of B, with a carry in
+        B_in, carry_in = (B, 0) if op == "add" else (_mask(n_bits) ^ B, 1)
+        items.append(_adder_cells(A, B_in, carry_in, n_bits))
+        items.append(_carry_chains(A, B_in, carry_in, n_bits))
+    if op == "compare":
+        items.append(_comparisons(A, B, n_bits))
+    elif op == "barrel":
+        items.append(_rotation_paths(A, B, n_bits))
+    if op != "compare":
+        results = golden_model.evaluate(op, A, B, n_bits).astype(np.int64)
+        items.append(_bit_values(results, n_bits, "result bits"))
+    return CoverageReport(name, len(pairs), items)
+
+
+def register_coverage(
+    name: str,
+    writes: Sequence[Tuple[int, int, int]],
+    reads: Pairs,
+    n_bits: int,
+    n_registers: int,
+    offsets: Sequence[int],
+    strengths: Sequence[int] = REPORT_STRENGTHS,
+) -> CoverageReport:
+    """What a set of register writes, each followed by the reads, exercises."""
+    levels = write_levels(n_bits, n_registers, len(offsets))
+    rows = np.hstack(
+        [
+            _to_bits([v for v, _, _ in writes], n_bits),
+            np.array([[r, offsets.index(o)] for _, r, o in writes]).reshape(-1, 2),
+        ]
+    )
+    items = [tway_coverage(rows, levels, t, f"{t}-wise writes") for t in strengths]
+
+    n_sel = (n_registers - 1).bit_length()
+    selects = np.hstack(
+        [_to_bits([a for a, _ in reads], n_sel), _to_bits([b for _, b in reads], n_sel)]
+    )
+    items.append(tway_coverage(selects, [2] * (2 * n_sel), 2, "2-wise read selects"))
+    ports = np.array([[a, n_registers + b] for a, b in reads])
+    items.append(_seen(ports, 2 * n_registers, "port registers"))
+    return CoverageReport(f"{name} ({len(reads)} reads per write)", len(writes), items)
+
+
+# Reports of the plans made this session
+REPORTS: List[CoverageReport] = []
+
+
+def record(report: CoverageReport) -> CoverageReport:
+    REPORTS.append(report)
+    return report
+
+
+def summary() -> List[str]:
+    lines = []
+    for report in REPORTS:
+        lines += report.lines()
+    return lines